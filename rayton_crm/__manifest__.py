@@ -1,6 +1,6 @@
 {
     'name': 'Rayton: CRM',
-    'version': '17.0.1.0.0',
+    'version': '17.0.1.8.0',
     'summary': 'Кастомна CRM логіка для Rayton — ліди, нагоди, передача, телефонія',
     'category': 'CRM',
     'author': 'Rayton',
@@ -10,6 +10,7 @@
         'data/mail_activity_types.xml',
         'data/ringostat_employee_phones.xml',
         'security/ir.model.access.csv',
+        'data/cron.xml',
         'views/res_partner_views.xml',
         'views/crm_lead_views.xml',
         'views/manager_queue_views.xml',
@@ -19,6 +20,13 @@
         'wizard/kpi_period_wizard_views.xml',
         'views/rayton_manager_kpi_views.xml',
         'views/rayton_ringostat_call_views.xml',
+        'views/rayton_ringostat_call_daily_views.xml',
+        'views/rayton_ringostat_call_archive_views.xml',
+        'wizard/ringostat_rollup_wizard_views.xml',
+        'views/rayton_ringostat_event_views.xml',
+        'views/rayton_ringostat_employee_views.xml',
+        'views/rayton_pipedrive_event_views.xml',
+        'views/rayton_pipedrive_mapping_views.xml',
         'views/menus.xml',
     ],
     'installable': True,
@@ -1,2 +1,3 @@
 from . import pipedrive_webhook
 from . import ringostat_webhook
+from . import metrics
@@ -0,0 +1,39 @@
+"""
+Метрики HTTP-ендпоінтів інтеграцій (див. tools/http_metrics.py).
+
+Endpoints:
+  GET  /rayton/metrics[?recent=50]  — знімок метрик
+  POST /rayton/metrics/reset        — знімок і обнулення (потрібен csrf_token)
+Доступ: лише адміністратор (base.group_system).
+
+Статистика ведеться в пам'яті процесу — при кількох воркерах кожен запит
+може потрапити на інший процес (поле pid у відповіді).
+"""
+from odoo import http
+from odoo.http import request
+
+from ..tools.http_metrics import METRICS
+
+
+class RaytonMetricsController(http.Controller):
+
+    @http.route('/rayton/metrics', type='http', auth='user', methods=['GET'])
+    def metrics(self, recent=0, **kwargs):
+        if not request.env.user.has_group('base.group_system'):
+            return request.make_response('Forbidden', status=403)
+        return request.make_json_response(self._snapshot(recent))
+
+    @http.route('/rayton/metrics/reset', type='http', auth='user', methods=['POST'], csrf=True)
+    def metrics_reset(self, recent=0, **kwargs):
+        # Окремий POST з перевіркою CSRF: GET не має змінювати стан — його
+        # може виконати чужа сторінка, prefetch браузера чи краулер
+        if not request.env.user.has_group('base.group_system'):
+            return request.make_response('Forbidden', status=403)
+        data = self._snapshot(recent)
+        METRICS.reset()
+        return request.make_json_response(data)
+
+    def _snapshot(self, recent):
+        data = METRICS.snapshot(recent=min(int(recent or 0), 2000))
+        data['pipedrive_queue'] = request.env['rayton.pipedrive.event'].sudo()._concurrency_stats()
+        return data
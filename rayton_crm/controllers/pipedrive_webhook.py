@@ -4,6 +4,9 @@ Pipedrive → Odoo webhook синхронізація.
 Endpoint: POST /pipedrive/webhook
 Auth: HTTP Basic (user/password зберігаються в ir.config_parameter)
 
+Endpoint лише зберігає payload у rayton.pipedrive.event і одразу відповідає 200;
+обробники _on_deal / _on_activity / ... викликає cron-воркер черги.
+
 Налаштування в Odoo (одноразово через shell):
   env['ir.config_parameter'].set_param('pipedrive.webhook.user', 'pipedrive')
   env['ir.config_parameter'].set_param('pipedrive.webhook.password', 'СЕКРЕТНИЙ_ТОКЕН')
@@ -14,11 +17,12 @@ Auth: HTTP Basic (user/password зберігаються в ir.config_parameter)
 """
 import base64
 import logging
-import re
 
-from odoo import http
+from odoo import fields, http
 from odoo.http import request
 
+from ..tools.phone import normalize_phone
+
 _logger = logging.getLogger(__name__)
 
 # --- Маппінги (дублюються з import-скриптів) ---
@@ -70,7 +74,9 @@ CREDIT_SPECIALIST_MAP = {
     'Олександр Коростіль': 'коростіль',
 }
 
-# Pipedrive option IDs для custom fields (отримані через API /dealFields)
+# Pipedrive option IDs для custom fields (отримані через API /dealFields).
+# Актуальні значення — в rayton.pipedrive.mapping (action_sync_metadata);
+# словники нижче лишаються запасним варіантом, якщо маппінг ще не заповнено.
 # label (set) → project_type
 LABEL_OPTION_MAP = {
     137: 'uze',
@@ -150,13 +156,14 @@ ACTIVITY_NAME_MAP = {
 }
 
 
-def _normalize_phone(p):
-    d = re.sub(r'[^0-9]', '', str(p).strip())
-    if len(d) == 10 and d.startswith('0'):
-        d = '380' + d[1:]
-    if d.startswith('380') and len(d) == 12:
-        return d
-    return None
+def _parse_pd_datetime(value):
+    """'2024-05-01 10:11:12' (v1) або '2024-05-01T10:11:12Z' (v2) → datetime (UTC)."""
+    if not value:
+        return False
+    try:
+        return fields.Datetime.to_datetime(str(value)[:19].replace('T', ' '))
+    except ValueError:
+        return False
 
 
 class PipedriveWebhook(http.Controller):
@@ -173,7 +180,7 @@ class PipedriveWebhook(http.Controller):
         csrf=False,
     )
     def handle(self, **kw):
-        """Приймає webhook від Pipedrive, диспетчеризує по типу події."""
+        """Приймає webhook від Pipedrive і ставить подію в чергу на обробку."""
         if not self._check_auth():
             _logger.warning('Pipedrive webhook: невірна авторизація')
             return {'status': 'unauthorized'}
@@ -182,6 +189,16 @@ class PipedriveWebhook(http.Controller):
         if not data:
             return {'status': 'empty'}
 
+        # Лише зберігаємо подію — обробка в cron (rayton.pipedrive.event),
+        # щоб HTTP-воркер звільнявся за мілісекунди навіть під час масових правок
+        event = request.env['rayton.pipedrive.event'].sudo()._enqueue(data)
+        _logger.info('Pipedrive webhook: %s.%s id=%s → черга (event %s)',
+                     event.entity, event.action, event.entity_id, event.id)
+        return {'status': 'ok'}
+
+    @staticmethod
+    def _parse_event(data):
+        """Розбирає payload v1/v2 → (obj, action_norm, action, current, previous)."""
         meta = data.get('meta', {})
 
         # Pipedrive v2: meta.entity + data['data'] + action: change/create/delete
@@ -195,26 +212,37 @@ class PipedriveWebhook(http.Controller):
         # v2: поточні дані в data['data'], v1: в data['current']
         current  = data.get('data') or data.get('current') or {}
         previous = data.get('previous') or {}
-
-        _logger.info('Pipedrive webhook: %s.%s (raw=%s) id=%s',
-                     obj, action_norm, action, meta.get('entity_id') or meta.get('id'))
-
-        try:
-            env = request.env(user=request.env.ref('base.user_admin').id)
-
-            if obj == 'deal':
-                self._on_deal(env, action_norm, current, previous)
-            elif obj == 'activity':
-                self._on_activity(env, action_norm, current)
-            elif obj == 'person':
-                self._on_person(env, action_norm, current)
-            elif obj == 'organization':
-                self._on_organization(env, action_norm, current)
-
-        except Exception as e:
-            _logger.error('Pipedrive webhook error (%s.%s): %s', obj, action, e, exc_info=True)
-
-        return {'status': 'ok'}
+        return obj, action_norm, action, current, previous
+
+    @staticmethod
+    def _lock_key(obj, current):
+        """Об'єкт Odoo, який змінює подія → (тип, Pipedrive ID) для advisory lock.
+
+        Активність пишеться в чаттер угоди, тому блокується по deal_id —
+        так deal.updated і activity.added однієї угоди не обробляються паралельно.
+        """
+        if obj == 'activity':
+            for kind, key in (('deal', 'deal_id'), ('person', 'person_id'), ('organization', 'org_id')):
+                value = current.get(key)
+                if isinstance(value, dict):
+                    value = value.get('value') or value.get('id')
+                if isinstance(value, int) and value:
+                    return kind, value
+        pd_id = current.get('id')
+        if obj and isinstance(pd_id, int) and pd_id:
+            return obj, pd_id
+        return None
+
+    def _dispatch(self, env, obj, action, current, previous):
+        """Викликає обробник за типом об'єкта. Використовується воркером черги."""
+        if obj == 'deal':
+            self._on_deal(env, action, current, previous)
+        elif obj == 'activity':
+            self._on_activity(env, action, current)
+        elif obj == 'person':
+            self._on_person(env, action, current)
+        elif obj == 'organization':
+            self._on_organization(env, action, current)
 
     # ------------------------------------------------------------------ #
     #  Auth                                                                #
@@ -244,26 +272,43 @@ class PipedriveWebhook(http.Controller):
         if not pd_id:
             return
 
-        lead = env['crm.lead'].search([('pipedrive_deal_id', '=', pd_id)], limit=1)
+        # active_test=False: програні (архівні) нагоди теж шукаємо, інакше
+        # подія по програній угоді створить дубль
+        lead = env['crm.lead'].with_context(active_test=False).search(
+            [('pipedrive_deal_id', '=', pd_id)], limit=1
+        )
 
         if not lead and action == 'deleted':
             return
 
+        # Події можуть приходити не по порядку — старіші за вже застосовану ігноруємо
+        update_time = _parse_pd_datetime(current.get('update_time'))
+        if lead and update_time and lead.pipedrive_update_time \
+                and update_time < lead.pipedrive_update_time:
+            _logger.info('Pipedrive: застаріла подія угоди %s (%s < %s), пропущено',
+                         pd_id, update_time, lead.pipedrive_update_time)
+            return
+
         vals = self._build_deal_vals(env, current)
 
         if not lead:
             if action not in ('added', 'updated'):
                 return
             vals['pipedrive_deal_id'] = pd_id
+            vals['pipedrive_update_time'] = update_time
             vals['type'] = 'opportunity'
             lead = env['crm.lead'].create(vals)
             _logger.info('Pipedrive: створено нагоду id=%s "%s"', lead.id, lead.name)
         else:
-            # Не перезаписуємо поля якщо вони вже заповнені в Odoo і не змінились в Pipedrive
-            if not vals:
-                return
-            lead.write(vals)
-            _logger.info('Pipedrive: оновлено нагоду id=%s', lead.id)
+            # Пишемо лише поля, що реально змінились — без зайвого трекінгу і перерахунків
+            vals = lead._pipedrive_changed_vals(vals)
+            if vals:
+                if update_time:
+                    vals['pipedrive_update_time'] = update_time
+                lead.write(vals)
+                _logger.info('Pipedrive: оновлено нагоду id=%s поля=%s', lead.id, sorted(vals))
+            elif update_time and update_time != lead.pipedrive_update_time:
+                lead._pipedrive_touch(update_time)
 
         # Статус won/lost
         status = current.get('status')
@@ -281,28 +326,41 @@ class PipedriveWebhook(http.Controller):
         if title:
             vals['name'] = title
 
-        # Команда і стейдж
-        pipeline = (current.get('pipeline_id') or {})
-        pipeline_name = pipeline.get('name', '') if isinstance(pipeline, dict) else ''
-        team = self._get_team(env, pipeline_name)
-        if team:
-            vals['team_id'] = team.id
+        # Команда і стейдж: спершу маппінг по числовому ID, далі — по назві
+        pipeline = current.get('pipeline_id') or {}
+        mapped = self._map_pd_id(env, 'pipeline',
+                                 pipeline.get('id') if isinstance(pipeline, dict) else pipeline)
+        if mapped and mapped[0]:
+            vals['team_id'] = mapped[0]
+        else:
+            pipeline_name = pipeline.get('name', '') if isinstance(pipeline, dict) else ''
+            team = self._get_team(env, pipeline_name)
+            if team:
+                vals['team_id'] = team.id
 
         stage_data = current.get('stage_id')
-        if isinstance(stage_data, dict):
-            stage_name = stage_data.get('name', '')
-        elif isinstance(stage_data, int):
-            stage_name = ''
+        mapped = self._map_pd_id(env, 'stage',
+                                 stage_data.get('id') if isinstance(stage_data, dict) else stage_data)
+        if mapped and mapped[0]:
+            vals['stage_id'] = mapped[0]
         else:
-            stage_name = str(stage_data) if stage_data else ''
-        if stage_name:
-            stage = self._get_or_find_stage(env, stage_name)
-            if stage:
-                vals['stage_id'] = stage.id
-
-        # Власник
-        owner = current.get('user_id')
-        if isinstance(owner, dict):
+            if isinstance(stage_data, dict):
+                stage_name = stage_data.get('name', '')
+            elif isinstance(stage_data, int):
+                stage_name = ''
+            else:
+                stage_name = str(stage_data) if stage_data else ''
+            if stage_name:
+                stage = self._get_or_find_stage(env, stage_name)
+                if stage:
+                    vals['stage_id'] = stage.id
+
+        # Власник (v1: user_id {id, name}, v2: owner_id int)
+        owner = current.get('user_id') or current.get('owner_id')
+        mapped = self._map_pd_id(env, 'user', owner.get('id') if isinstance(owner, dict) else owner)
+        if mapped and mapped[0]:
+            vals['user_id'] = mapped[0]
+        elif isinstance(owner, dict):
             owner_name = owner.get('name', '')
             uid = self._find_user(env, owner_name)
             if uid:
@@ -343,11 +401,11 @@ class PipedriveWebhook(http.Controller):
             if isinstance(label_val, list):
                 first = label_val[0] if label_val else None
                 if isinstance(first, int):
-                    ptype = LABEL_OPTION_MAP.get(first)
+                    ptype = self._map_option(env, label_key, first, LABEL_OPTION_MAP)
                 elif first:
                     ptype = PROJECT_TYPE_MAP.get(str(first))
             elif isinstance(label_val, int):
-                ptype = LABEL_OPTION_MAP.get(label_val)
+                ptype = self._map_option(env, label_key, label_val, LABEL_OPTION_MAP)
             elif label_val:
                 ptype = PROJECT_TYPE_MAP.get(str(label_val))
             if ptype:
@@ -358,7 +416,7 @@ class PipedriveWebhook(http.Controller):
         if financing_key and financing_key in current:
             fin_val = current[financing_key]
             if isinstance(fin_val, int):
-                ftype = FINANCING_OPTION_MAP.get(fin_val)
+                ftype = self._map_option(env, financing_key, fin_val, FINANCING_OPTION_MAP)
             else:
                 ftype = FINANCING_MAP.get(str(fin_val), False)
             if ftype:
@@ -368,7 +426,10 @@ class PipedriveWebhook(http.Controller):
         credit_key = cfg.get_param('pipedrive.field.credit_specialist', '')
         if credit_key and credit_key in current:
             cs_val = current.get(credit_key)
-            if isinstance(cs_val, int):
+            mapped = self._map_pd_id(env, 'option', cs_val, credit_key)
+            if mapped and mapped[0]:
+                vals['credit_specialist_id'] = mapped[0]
+            elif isinstance(cs_val, int):
                 surname = CREDIT_SPECIALIST_OPTION_MAP.get(cs_val)
                 if surname:
                     user = env['res.users'].search([('name', 'ilike', surname)], limit=1)
@@ -408,13 +469,10 @@ class PipedriveWebhook(http.Controller):
         if not pd_act_id:
             return
 
-        # Перевіряємо чи вже імпортовано
-        ext_name = 'pipedrive_act_%d' % pd_act_id
-        existing = env['ir.model.data'].sudo().search([
-            ('module', '=', '__import__'),
-            ('model', '=', 'mail.message'),
-            ('name', '=', ext_name),
-        ], limit=1)
+        # Перевіряємо чи вже імпортовано (унікальний індекс на pipedrive_activity_id)
+        existing = env['mail.message'].sudo().search(
+            [('pipedrive_activity_id', '=', pd_act_id)], limit=1
+        )
         if existing:
             return  # вже є
 
@@ -424,7 +482,9 @@ class PipedriveWebhook(http.Controller):
 
         deal_id = current.get('deal_id')
         if deal_id:
-            lead = env['crm.lead'].search([('pipedrive_deal_id', '=', deal_id)], limit=1)
+            lead = env['crm.lead'].with_context(active_test=False).search(
+                [('pipedrive_deal_id', '=', deal_id)], limit=1
+            )
             if lead:
                 res_model = 'crm.lead'
                 res_id = lead.id
@@ -443,10 +503,19 @@ class PipedriveWebhook(http.Controller):
             _logger.debug('Pipedrive activity %s: no target found', pd_act_id)
             return
 
-        # Автор
+        # Автор (v1: user_id int + owner_name, старі payload-и: user_id {id, name})
         assigned = current.get('user_id', {})
-        assigned_name = assigned.get('name', '') if isinstance(assigned, dict) else ''
-        author_pid = self._get_author_pid(env, assigned_name)
+        if isinstance(assigned, dict):
+            assigned_name = assigned.get('name', '')
+            assigned_pd_id = assigned.get('id')
+        else:
+            assigned_name = current.get('owner_name') or ''
+            assigned_pd_id = assigned
+        mapped = self._map_pd_id(env, 'user', assigned_pd_id)
+        if mapped and mapped[0]:
+            author_pid = env['res.users'].browse(mapped[0]).partner_id.id
+        else:
+            author_pid = self._get_author_pid(env, assigned_name)
 
         # Тип активності — шукаємо спочатку по key_string (v2), потім по display name (v1/subject)
         type_key = str(current.get('type') or '')
@@ -509,13 +578,7 @@ class PipedriveWebhook(http.Controller):
             'message_type':          'comment',
             'subtype_id':            mt_activities,
             'mail_activity_type_id': activity_type.id if activity_type else False,
-        })
-
-        env['ir.model.data'].sudo().create({
-            'module': '__import__',
-            'model':  'mail.message',
-            'name':   ext_name,
-            'res_id': msg.id,
+            'pipedrive_activity_id': pd_act_id,
         })
 
         _logger.info('Pipedrive activity %s → message %s (%s)', pd_act_id, msg.id, res_model)
@@ -535,7 +598,9 @@ class PipedriveWebhook(http.Controller):
         if not partner:
             return
 
-        # Оновлюємо email
+        # Усі зміни партнера збираємо в один write, телефони — в один create
+        partner_vals = {}
+
         emails = current.get('email') or []
         if isinstance(emails, list) and emails:
             first_email = next(
@@ -543,32 +608,36 @@ class PipedriveWebhook(http.Controller):
                 None
             )
             if first_email and first_email != partner.email:
-                partner.write({'email': first_email})
+                partner_vals['email'] = first_email
+
+        if action == 'updated':
+            name = current.get('name')
+            if name and name != partner.name:
+                partner_vals['name'] = name
 
         # Додаємо нові телефони (не видаляємо існуючі)
         phones = current.get('phone') or []
+        phone_vals = []
         if isinstance(phones, list):
             existing_phones = set(partner.phone_ids.mapped('phone'))
             has_primary = bool(existing_phones)
-            new_added = 0
             for ph_obj in phones:
                 raw = ph_obj.get('value', '') if isinstance(ph_obj, dict) else str(ph_obj)
-                norm = _normalize_phone(raw)
+                norm = normalize_phone(raw)
                 if norm and norm not in existing_phones:
-                    env['res.partner.phone'].create({
+                    phone_vals.append({
                         'partner_id': partner.id,
                         'phone':      norm,
                         'phone_type': 'work',
-                        'is_primary': not has_primary and new_added == 0,
-                        'sequence':   10 + new_added,
+                        'is_primary': not has_primary and not phone_vals,
+                        'sequence':   10 + len(phone_vals),
                     })
                     existing_phones.add(norm)
-                    new_added += 1
 
-        if action == 'updated':
-            name = current.get('name')
-            if name and name != partner.name:
-                partner.write({'name': name})
+        if phone_vals:
+            env['res.partner.phone'].create(phone_vals)
+        if partner_vals:
+            partner.write(partner_vals)
 
     # ------------------------------------------------------------------ #
     #  Organization                                                        #
@@ -579,16 +648,8 @@ class PipedriveWebhook(http.Controller):
         if not pd_org_id:
             return
 
-        imd = env['ir.model.data'].sudo().search([
-            ('module', '=', '__import__'),
-            ('model', '=', 'res.partner'),
-            ('name', '=', 'pipedrive_org_%d' % pd_org_id),
-        ], limit=1)
-        if not imd:
-            return
-
-        partner = env['res.partner'].browse(imd.res_id)
-        if not partner.exists():
+        partner = self._find_org(env, pd_org_id)
+        if not partner:
             return
 
         name = current.get('name')
@@ -600,6 +661,19 @@ class PipedriveWebhook(http.Controller):
     #  Helpers                                                             #
     # ------------------------------------------------------------------ #
 
+    def _map_pd_id(self, env, kind, pd_id, field_key=''):
+        """Pipedrive ID → (target_id, value) з rayton.pipedrive.mapping або None."""
+        if not pd_id or not isinstance(pd_id, int):
+            return None
+        return env['rayton.pipedrive.mapping']._lookup(kind, pd_id, field_key)
+
+    def _map_option(self, env, field_key, option_id, fallback_map):
+        """Option ID custom field → значення selection; fallback на вшиті словники."""
+        mapped = self._map_pd_id(env, 'option', option_id, field_key)
+        if mapped and mapped[1]:
+            return mapped[1]
+        return fallback_map.get(option_id)
+
     def _get_team(self, env, pipeline_name):
         if not pipeline_name:
             return env['crm.team'].search([('name', 'ilike', 'Оператор')], limit=1)
@@ -638,14 +712,10 @@ class PipedriveWebhook(http.Controller):
         return False
 
     def _find_org(self, env, pd_org_id):
-        imd = env['ir.model.data'].sudo().search([
-            ('module', '=', '__import__'),
-            ('model', '=', 'res.partner'),
-            ('name', '=', 'pipedrive_org_%d' % int(pd_org_id)),
-        ], limit=1)
-        if imd:
-            return env['res.partner'].browse(imd.res_id)
-        return False
+        partner = env['res.partner'].with_context(active_test=False).search(
+            [('pipedrive_org_id', '=', int(pd_org_id))], limit=1
+        )
+        return partner or False
 
     def _get_author_pid(self, env, username):
         if not username:
@@ -4,6 +4,9 @@ Ringostat → Odoo webhook.
 Endpoint: POST /ringostat/webhook?token=TOKEN
 Auth: secret token в query-параметрі ?token=
 
+Payload лише ставиться в чергу rayton.ringostat.event (з ключем ідемпотентності)
+і одразу повертається 200 — обробка в cron. Повтор того ж дзвінка — no-op.
+
 Налаштування в Odoo (одноразово через shell або Settings → Technical → Parameters):
   env['ir.config_parameter'].set_param('ringostat.webhook.token', 'СЕКРЕТНИЙ_ТОКЕН')
 
@@ -41,6 +44,8 @@ class RingostatWebhookController(http.Controller):
         try:
             body = request.httprequest.get_data(as_text=True)
             payload = json.loads(body)
+            if not isinstance(payload, dict):
+                raise ValueError('payload is not an object')
         except Exception as exc:
             _logger.error('Ringostat webhook: JSON parse error: %s', exc)
             return request.make_response('Bad Request', status=400)
@@ -53,11 +58,10 @@ class RingostatWebhookController(http.Controller):
             payload.get('call_status'),
         )
 
-        # ── Save ──────────────────────────────────────────────────────────── #
-        try:
-            request.env['rayton.ringostat.call'].sudo().create_from_webhook(payload)
-        except Exception as exc:
-            _logger.exception('Ringostat webhook: failed to save call: %s', exc)
-            return request.make_response('Internal Server Error', status=500)
+        # ── Queue ─────────────────────────────────────────────────────────── #
+        # 500 лише якщо не вдалось навіть зберегти payload — тоді ретрай n8n доречний
+        key, is_new = request.env['rayton.ringostat.event'].sudo()._enqueue(payload)
+        if not is_new:
+            _logger.info('Ringostat webhook: повторна доставка %s, пропущено', key)
 
         return request.make_response('OK', status=200)
@@ -0,0 +1,24 @@
+"""
+Backfill res_partner.pipedrive_org_id з xmlid-ів '__import__.pipedrive_org_<id>'.
+
+Один UPDATE ... FROM замість проходу по записах — на сотнях тисяч партнерів
+займає секунди. xmlid-и в ir.model.data не видаляємо: на них ще можуть
+посилатися сторонні імпорти.
+"""
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    cr.execute("""
+        UPDATE res_partner p
+        SET pipedrive_org_id = substring(d.name FROM '^pipedrive_org_([0-9]+)$')::int
+        FROM ir_model_data d
+        WHERE d.module = '__import__'
+          AND d.model = 'res.partner'
+          AND d.name ~ '^pipedrive_org_[0-9]+$'
+          AND d.res_id = p.id
+          AND p.pipedrive_org_id IS NULL
+    """)
+    _logger.info('rayton_crm: pipedrive_org_id заповнено для %d партнерів', cr.rowcount)
@@ -0,0 +1,59 @@
+"""
+Backfill mail_message.pipedrive_activity_id / pipedrive_note_id з xmlid-ів
+'__import__.pipedrive_act_<id>' / 'pipedrive_note_<id>' і видалення цих xmlid-ів.
+
+Після міграції перевірка дублів — один пошук по частковому унікальному індексу,
+а сотні тисяч рядків ir_model_data більше не потрібні.
+"""
+import logging
+
+_logger = logging.getLogger(__name__)
+
+PREFIXES = [
+    ('pipedrive_activity_id', 'pipedrive_act_'),
+    ('pipedrive_note_id',     'pipedrive_note_'),
+]
+
+
+def migrate(cr, version):
+    for column, prefix in PREFIXES:
+        pattern = '^%s([0-9]+)$' % prefix
+        cr.execute(f"""
+            UPDATE mail_message m
+            SET {column} = substring(d.name FROM %(pattern)s)::int
+            FROM ir_model_data d
+            WHERE d.module = '__import__'
+              AND d.model = 'mail.message'
+              AND d.name ~ %(pattern)s
+              AND d.res_id = m.id
+              AND m.{column} IS NULL
+        """, {'pattern': pattern})
+        _logger.info('rayton_crm: %s заповнено для %d повідомлень', column, cr.rowcount)
+
+        # Ретайрим xmlid-и, значення яких вже перенесено в колонку
+        cr.execute(f"""
+            DELETE FROM ir_model_data d
+            USING mail_message m
+            WHERE d.module = '__import__'
+              AND d.model = 'mail.message'
+              AND d.name ~ %(pattern)s
+              AND d.res_id = m.id
+              AND m.{column} = substring(d.name FROM %(pattern)s)::int
+        """, {'pattern': pattern})
+        _logger.info('rayton_crm: видалено %d xmlid-ів %s*', cr.rowcount, prefix)
+
+        # Дублі не дадуть побудувати mail_message_{column}_uniq (init моделі
+        # лише попередить) — показуємо їх одразу. 0 — «немає ID», як в індексі.
+        cr.execute(f"""
+            SELECT {column}, count(*)
+            FROM mail_message
+            WHERE {column} IS NOT NULL AND {column} != 0
+            GROUP BY {column}
+            HAVING count(*) > 1
+            ORDER BY {column}
+            LIMIT 20
+        """)
+        duplicates = cr.fetchall()
+        if duplicates:
+            _logger.warning('rayton_crm: %s має дублі (перші: %s) — злийте повідомлення '
+                            'і оновіть модуль', column, ', '.join('%s×%s' % d for d in duplicates))
@@ -0,0 +1,32 @@
+"""
+Початкове заповнення rayton_ringostat_employee з історії дзвінків.
+
+Для кожного імені співробітника Ringostat береться користувач, якого
+найчастіше проставляв старий пошук по прізвищу. Імена без користувача
+потрапляють у стан "На перевірці" — їх треба зіставити вручну.
+"""
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    cr.execute(r"""
+        WITH calls AS (
+            SELECT lower(regexp_replace(btrim(employee), '\s+', ' ', 'g')) AS name_key,
+                   regexp_replace(btrim(employee), '\s+', ' ', 'g') AS name,
+                   user_id
+            FROM rayton_ringostat_call
+            WHERE COALESCE(btrim(employee), '') != ''
+        )
+        INSERT INTO rayton_ringostat_employee
+            (name, name_key, user_id, state, create_uid, create_date, write_uid, write_date)
+        SELECT min(name), name_key,
+               mode() WITHIN GROUP (ORDER BY user_id),
+               CASE WHEN count(user_id) > 0 THEN 'auto' ELSE 'review' END,
+               1, now() AT TIME ZONE 'UTC', 1, now() AT TIME ZONE 'UTC'
+        FROM calls
+        GROUP BY name_key
+        ON CONFLICT (name_key) DO NOTHING
+    """)
+    _logger.info('rayton_crm: додано %d співробітників Ringostat', cr.rowcount)
@@ -0,0 +1,18 @@
+"""
+Початкове заповнення денного зведення дзвінків rayton_ringostat_call_daily.
+
+Один INSERT ... SELECT ... GROUP BY по всій історії; далі зведення
+ведеться інкрементально при створенні / зміні дзвінків.
+"""
+import logging
+
+from odoo import SUPERUSER_ID, api
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    rows = env['rayton.ringostat.call.daily']._rebuild()
+    cr.execute("ANALYZE rayton_ringostat_call_daily")
+    _logger.info('rayton_crm: зведення дзвінків Ringostat — %d рядків', rows)
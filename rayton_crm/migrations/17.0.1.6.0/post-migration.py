@@ -0,0 +1,22 @@
+"""
+Постановка в чергу архівації записів дзвінків за останні DAYS днів.
+
+Старіші посилання Ringostat найімовірніше вже не діють — їх можна
+поставити в чергу вручну кнопкою "Завантажити запис в архів".
+"""
+import logging
+
+_logger = logging.getLogger(__name__)
+
+DAYS = 30
+
+
+def migrate(cr, version):
+    cr.execute("""
+        UPDATE rayton_ringostat_call
+        SET recording_state = 'pending'
+        WHERE recording_state = 'none'
+          AND (COALESCE(recording_url, '') != '' OR COALESCE(recording_wav, '') != '')
+          AND call_date >= (now() AT TIME ZONE 'UTC') - %s * interval '1 day'
+    """, [DAYS])
+    _logger.info('rayton_crm: %d записів дзвінків поставлено в чергу архівації', cr.rowcount)
@@ -0,0 +1,32 @@
+"""
+КПІ менеджерів: один рядок на (менеджер, місяць) замість одного на менеджера.
+
+Наявні рядки отримують period_start з period_label ('MM.YYYY'), а якщо його
+немає — місяць дати розрахунку. Рядки за минулі місяці одразу закриваються.
+Унікальний індекс (user_id, period_start) створює init() моделі.
+"""
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    cr.execute("""
+        ALTER TABLE rayton_manager_kpi
+            ADD COLUMN IF NOT EXISTS period_start date,
+            ADD COLUMN IF NOT EXISTS is_closed boolean
+    """)
+    cr.execute("""
+        UPDATE rayton_manager_kpi
+        SET period_start = CASE
+                WHEN period_label ~ '^\\d{2}\\.\\d{4}$' THEN to_date('01.' || period_label, 'DD.MM.YYYY')
+                ELSE date_trunc('month', COALESCE(computed_at, create_date, now()))::date
+            END
+        WHERE period_start IS NULL
+    """)
+    cr.execute("""
+        UPDATE rayton_manager_kpi
+        SET is_closed = period_start < date_trunc('month', now())::date
+        WHERE is_closed IS NULL
+    """)
+    _logger.info('rayton_crm: КПІ — period_start заповнено для %d рядків', cr.rowcount)
@@ -0,0 +1,16 @@
+"""
+Перебудова mail_message_pipedrive_*_uniq з умовою `!= 0`.
+
+Integer зберігає False як 0, тож старий індекс (лише `IS NOT NULL`) не давав
+записати друге повідомлення з pipedrive_activity_id = 0. Старі індекси
+видаляються тут, нові init() моделі будує конкурентно після оновлення.
+"""
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    for column in ('pipedrive_activity_id', 'pipedrive_note_id'):
+        cr.execute(f'DROP INDEX IF EXISTS mail_message_{column}_uniq')
+    _logger.info('rayton_crm: індекси mail_message_pipedrive_*_uniq будуть перебудовані')
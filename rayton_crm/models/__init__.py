@@ -1,10 +1,20 @@
 from . import res_partner_phone
 from . import res_partner
+from . import mail_message
 from . import res_country_state
 from . import manager_queue
 from . import lead_transfer
 from . import crm_stage
 from . import crm_lead
 from . import rayton_manager_kpi
+from . import rayton_manager_kpi_request
+from . import rayton_manager_kpi_dirty
 from . import rayton_ringostat_call
+from . import rayton_ringostat_call_daily
+from . import rayton_ringostat_call_archive
 from . import rayton_ringostat_excluded_phone
+from . import rayton_ringostat_event
+from . import rayton_ringostat_employee
+from . import rayton_pipedrive_event
+from . import rayton_pipedrive_mapping
+from . import ir_http
@@ -1,6 +1,13 @@
+import logging
+
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
+from ..tools.pg_index import ensure_index_concurrently, index_state
+from .rayton_manager_kpi import KPI_LEAD_FIELDS
+
+_logger = logging.getLogger(__name__)
+
 FINANCING_TYPE = [
     ('own', 'Власні'),
     ('credit', 'Кредитні'),
@@ -54,15 +61,81 @@ class CrmLead(models.Model):
     advance_planned_date = fields.Date(string='Планова дата авансу')
     advance_actual_date = fields.Date(string='Фактична дата авансу')
     loss_reason_text = fields.Char(string='Причина програшу')
-    pipedrive_deal_id = fields.Integer(string='Pipedrive Deal ID', index=True)
+    pipedrive_deal_id = fields.Integer(string='Pipedrive Deal ID', index=True, copy=False)
     project_number = fields.Char(string='Номер проекту')
     pipedrive_next_activity_date = fields.Date(string='Наст. активність (PD)')
+    pipedrive_update_time = fields.Datetime(
+        string='Остання зміна в Pipedrive', readonly=True, copy=False,
+        help='update_time останньої застосованої події Pipedrive — старіші події ігноруються',
+    )
+    ringostat_phone_suffix = fields.Char(
+        string='Номер Ringostat (авто)', size=9, index=True, readonly=True, copy=False,
+        help='Лід створено автоматично на дзвінок з невідомого номера — повторні дзвінки '
+             'з цього номера приєднуються до нього',
+    )
 
     # Кредитний спеціаліст угоди (заповнюється з імпорту або вручну)
     credit_specialist_id = fields.Many2one(
         'res.users', string='Кредитний спеціаліст',
     )
 
+    def init(self):
+        super().init()
+        # Воронка менеджера (КПІ, черга менеджерів): активні нагоди по user_id
+        ensure_index_concurrently(
+            self._cr, 'crm_lead_user_opportunity_idx', 'crm_lead',
+            "(user_id, stage_id) WHERE active AND type = 'opportunity'",
+        )
+        # Одна угода Pipedrive — одна нагода: захист від дублів при паралельних
+        # подіях deal.added. Якщо дублі вже є в базі — індекс не створюємо,
+        # а лише попереджаємо (їх треба злити вручну, потім оновити модуль).
+        cr = self._cr
+        if index_state(cr, 'crm_lead_pipedrive_deal_id_uniq'):
+            return
+        cr.execute("""
+            SELECT pipedrive_deal_id, count(*)
+            FROM crm_lead
+            WHERE pipedrive_deal_id IS NOT NULL AND pipedrive_deal_id != 0
+            GROUP BY pipedrive_deal_id
+            HAVING count(*) > 1
+            ORDER BY pipedrive_deal_id
+        """)
+        duplicates = cr.fetchall()
+        if duplicates:
+            _logger.warning(
+                'crm_lead_pipedrive_deal_id_uniq не створено: %d угод Pipedrive мають '
+                'кілька нагод (перші: %s)',
+                len(duplicates), ', '.join('%s×%s' % d for d in duplicates[:20]),
+            )
+            return
+        ensure_index_concurrently(
+            cr, 'crm_lead_pipedrive_deal_id_uniq', 'crm_lead',
+            '(pipedrive_deal_id) WHERE pipedrive_deal_id IS NOT NULL AND pipedrive_deal_id != 0',
+            unique=True,
+        )
+
+    # ── КПІ менеджерів (інкрементально) ─────────────────────────────────── #
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        leads = super().create(vals_list)
+        self.env['rayton.manager.kpi']._mark_dirty(user_ids=leads.user_id.ids)
+        return leads
+
+    def write(self, vals):
+        if not KPI_LEAD_FIELDS.intersection(vals):
+            return super().write(vals)
+        # І попередній, і новий менеджер (якщо нагоду передали)
+        user_ids = set(self.user_id.ids)
+        res = super().write(vals)
+        user_ids.update(self.user_id.ids)
+        self.env['rayton.manager.kpi']._mark_dirty(user_ids=user_ids)
+        return res
+
+    def unlink(self):
+        self.env['rayton.manager.kpi']._mark_dirty(user_ids=self.user_id.ids)
+        return super().unlink()
+
     def _compute_is_with_manager(self):
         for lead in self:
             lead.is_with_manager = lead.type == 'opportunity'
@@ -71,6 +144,35 @@ class CrmLead(models.Model):
         for lead in self:
             lead.transfer_count = len(lead.transfer_ids)
 
+    def _pipedrive_changed_vals(self, vals):
+        """Лише ті значення `vals`, що відрізняються від збережених.
+
+        Перед порівнянням значення нормалізуються полем (округлення, розбір
+        дат, id many2one) — payload Pipedrive, що повторює поточний стан,
+        дає порожній словник.
+        """
+        self.ensure_one()
+        changed = {}
+        for fname, value in vals.items():
+            field = self._fields[fname]
+            new_value = field.convert_to_record(field.convert_to_cache(value, self), self)
+            if new_value != self[fname]:
+                changed[fname] = value
+        return changed
+
+    def _pipedrive_touch(self, update_time):
+        """Зберегти update_time Pipedrive без ORM write.
+
+        Для подій без реальних змін: без повідомлення трекінгу, без зміни
+        write_date і без перерахунку залежних збережених полів.
+        """
+        self.flush_recordset(['pipedrive_update_time'])
+        self.env.cr.execute(
+            "UPDATE crm_lead SET pipedrive_update_time = %s WHERE id = ANY(%s)",
+            [update_time, self.ids],
+        )
+        self.invalidate_recordset(['pipedrive_update_time'])
+
     def action_transfer_to_manager(self):
         self.ensure_one()
         if not self.partner_id:
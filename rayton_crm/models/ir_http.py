@@ -0,0 +1,55 @@
+import logging
+import time
+
+from odoo import models
+from odoo.http import request
+
+from ..tools import http_metrics
+
+_logger = logging.getLogger(__name__)
+
+
+class IrHttp(models.AbstractModel):
+    _inherit = 'ir.http'
+
+    @classmethod
+    def _dispatch(cls, endpoint):
+        """Заміряти ендпоінти інтеграцій, перелічені в tools.http_metrics.
+
+        Інші маршрути проходять без змін. Тривалість, кількість SQL-запитів і
+        результат пишуться в кільцевий буфер процесу (/rayton/metrics);
+        запити, повільніші за rayton.metrics.slow_ms, ще й логуються з ID
+        payload-а — щоб знайти саму подію в черзі / чаттері.
+        """
+        path = request.httprequest.path
+        if not http_metrics.is_instrumented(path):
+            return super()._dispatch(endpoint)
+
+        cr = request.env.cr
+        sql_before = cr.sql_log_count
+        started = time.perf_counter()
+        status, error = 200, False
+        try:
+            result = super()._dispatch(endpoint)
+            status = getattr(result, 'status_code', 200)
+            # type='json' маршрути повідомляють про помилку в тілі відповіді
+            error = status >= 500 or (isinstance(result, dict) and result.get('status') == 'error')
+            return result
+        except Exception:
+            status, error = 500, True
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            cls._record_metrics(path, elapsed_ms, cr.sql_log_count - sql_before, status, error)
+
+    @classmethod
+    def _record_metrics(cls, path, elapsed_ms, sql_count, status, error):
+        try:
+            slow_ms = int(request.env['ir.config_parameter'].sudo().get_param('rayton.metrics.slow_ms', 1000))
+        except Exception:
+            slow_ms = 1000  # транзакція могла впасти разом з обробником
+        event, payload_id = http_metrics.describe(path, request.httprequest)
+        http_metrics.METRICS.record(path, event, elapsed_ms, sql_count, status, error, payload_id, slow_ms)
+        if elapsed_ms >= slow_ms:
+            _logger.warning('Повільний запит %s [%s] payload_id=%s: %.0f мс, %d SQL, статус %s',
+                            path, event, payload_id, elapsed_ms, sql_count, status)
@@ -0,0 +1,88 @@
+import logging
+
+from odoo import api, fields, models
+
+from ..tools.pg_index import ensure_index_concurrently, index_state
+from .rayton_manager_kpi import KPI_MESSAGE_FIELDS
+
+_logger = logging.getLogger(__name__)
+
+
+class MailMessage(models.Model):
+    _inherit = 'mail.message'
+
+    # ID активностей / нотаток, імпортованих з Pipedrive — для перевірки дублів.
+    # Замінюють xmlid-и '__import__.pipedrive_act_<id>' / 'pipedrive_note_<id>'
+    # в ir.model.data (див. міграцію 17.0.1.2.0).
+    pipedrive_activity_id = fields.Integer('Pipedrive Activity ID', readonly=True, copy=False)
+    pipedrive_note_id = fields.Integer('Pipedrive Note ID', readonly=True, copy=False)
+
+    def init(self):
+        # Частковий унікальний індекс: переважна більшість повідомлень — не з Pipedrive.
+        # Integer зберігає False як 0, тож 0 — «немає ID» і в індекс не потрапляє
+        # (як crm_lead_pipedrive_deal_id_uniq). Якщо дублі вже є — лише попереджаємо.
+        cr = self._cr
+        for column in ('pipedrive_activity_id', 'pipedrive_note_id'):
+            name = f'mail_message_{column}_uniq'
+            if index_state(cr, name):
+                continue
+            cr.execute(f"""
+                SELECT {column}, count(*)
+                FROM mail_message
+                WHERE {column} IS NOT NULL AND {column} != 0
+                GROUP BY {column}
+                HAVING count(*) > 1
+                ORDER BY {column}
+            """)
+            duplicates = cr.fetchall()
+            if duplicates:
+                _logger.warning(
+                    '%s не створено: %d ID Pipedrive мають кілька повідомлень (перші: %s)',
+                    name, len(duplicates), ', '.join('%s×%s' % d for d in duplicates[:20]),
+                )
+                continue
+            ensure_index_concurrently(
+                cr, name, 'mail_message',
+                f'({column}) WHERE {column} IS NOT NULL AND {column} != 0', unique=True,
+            )
+        # КПІ: активності нагод за місяць (res_id, тип, дата). Частковий —
+        # лише повідомлення нагод з типом активності, тобто мала частина таблиці.
+        # Стрічка чаттера (model, res_id) покрита індексами самого mail.
+        ensure_index_concurrently(
+            self._cr, 'mail_message_crm_lead_activity_idx', 'mail_message',
+            "(res_id, mail_activity_type_id, date) "
+            "WHERE model = 'crm.lead' AND mail_activity_type_id IS NOT NULL",
+        )
+
+    # ── КПІ менеджерів (інкрементально) ─────────────────────────────────── #
+
+    def _kpi_lead_ids(self):
+        """Нагоди, в яких ці повідомлення є активностями (рахуються в КПІ)."""
+        return [m.res_id for m in self if m.model == 'crm.lead' and m.mail_activity_type_id]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        messages = super().create(vals_list)
+        lead_ids = [
+            vals.get('res_id') for vals in vals_list
+            if vals.get('model') == 'crm.lead' and vals.get('mail_activity_type_id')
+        ]
+        if lead_ids:
+            self.env['rayton.manager.kpi']._mark_dirty(lead_ids=lead_ids)
+        return messages
+
+    def write(self, vals):
+        if not KPI_MESSAGE_FIELDS.intersection(vals):
+            return super().write(vals)
+        lead_ids = self._kpi_lead_ids()
+        res = super().write(vals)
+        lead_ids += self._kpi_lead_ids()
+        if lead_ids:
+            self.env['rayton.manager.kpi']._mark_dirty(lead_ids=lead_ids)
+        return res
+
+    def unlink(self):
+        lead_ids = self._kpi_lead_ids()
+        if lead_ids:
+            self.env['rayton.manager.kpi']._mark_dirty(lead_ids=lead_ids)
+        return super().unlink()
@@ -1,19 +1,154 @@
-from datetime import date
+import logging
+import time
+from datetime import date, timedelta
 
 from dateutil.relativedelta import relativedelta
-
-from odoo import api, fields, models
+from psycopg2.extras import execute_values
+
+from odoo import api, fields, models, tools
+
+_logger = logging.getLogger(__name__)
+
+# Advisory lock: одночасно виконується лише один перерахунок КПІ
+REFRESH_LOCK = 'rayton.manager.kpi.refresh'
+# Дані старші за стільки хвилин вважаються неактуальними (cron — кожні 10 хв)
+STALE_MINUTES = 20
+
+# Поля нагоди і повідомлення, від яких залежать КПІ — лише їх запис позначає
+# менеджера до перерахунку
+KPI_LEAD_FIELDS = {
+    'user_id', 'stage_id', 'active', 'type', 'partner_id',
+    'project_number', 'advance_planned_date', 'project_type',
+    'power_ses_kw', 'capacity_uze_kwh', 'pipedrive_next_activity_date',
+}
+KPI_MESSAGE_FIELDS = {'model', 'res_id', 'mail_activity_type_id', 'date', 'author_id'}
+
+
+# Один прохід по всіх менеджерах: кожна таблиця читається раз з GROUP BY user_id.
+# Місяць — напівінтервал [first_day, next_month): останній день місяця
+# враховується повністю (раніше `date <= last_day` відсікав його після 00:00)
+KPI_SQL = """
+    WITH leads AS (
+        SELECT l.id, l.user_id, l.partner_id, l.project_number, l.advance_planned_date,
+               l.project_type, l.power_ses_kw, l.capacity_uze_kwh,
+               l.pipedrive_next_activity_date
+        FROM crm_lead l
+        JOIN crm_stage s ON s.id = l.stage_id
+        WHERE l.user_id = ANY(%(managers)s)
+          AND l.active
+          AND NOT s.is_won
+          AND s.is_manager_pipeline
+          AND l.type = 'opportunity'
+    ),
+    lead_stats AS (
+        SELECT
+            user_id,
+            COUNT(*) AS lead_count,
+            -- 2b: заплановані — є наступна активність в Pipedrive
+            COUNT(*) FILTER (WHERE pipedrive_next_activity_date IS NOT NULL) AS leads_with_planned,
+            -- 2c: прострочені завдання (next_activity_date в минулому = прострочено)
+            COUNT(*) FILTER (WHERE pipedrive_next_activity_date < %(today)s) AS overdue_count,
+            -- 3a: ЛПР/ЛВР — партнер має дочірній контакт з заповненою посадою
+            COUNT(*) FILTER (WHERE EXISTS (
+                SELECT 1 FROM res_partner c
+                WHERE c.parent_id = leads.partner_id
+                  AND c.function IS NOT NULL AND c.function != ''
+            )) AS leads_with_lpr,
+            -- 3b–3e: заповнення картки
+            COUNT(*) FILTER (WHERE project_number IS NOT NULL AND project_number != '')
+                AS leads_with_project_num,
+            COUNT(*) FILTER (WHERE advance_planned_date IS NOT NULL) AS leads_with_advance,
+            COUNT(*) FILTER (WHERE project_type IS NOT NULL) AS leads_with_product,
+            COUNT(*) FILTER (WHERE power_ses_kw > 0 OR capacity_uze_kwh > 0) AS leads_with_power
+        FROM leads
+        GROUP BY user_id
+    ),
+    msg_stats AS (
+        SELECT
+            leads.user_id,
+            -- 2a: дзвінки/зустрічі цього місяця
+            COUNT(DISTINCT mm.res_id) FILTER (WHERE mm.mail_activity_type_id = ANY(%(comm)s))
+                AS leads_with_comm,
+            -- 2d: дзвінків через телефонію Ringostat (Вихідний + Вхідний)
+            COUNT(*) FILTER (WHERE mm.mail_activity_type_id = ANY(%(auto)s)) AS comm_auto,
+            -- 2e: ручних дзвінків створених самим менеджером
+            COUNT(*) FILTER (WHERE mm.mail_activity_type_id = %(manual)s
+                               AND mm.author_id = u.partner_id) AS comm_manual,
+            -- 4: зустрічі цього місяця
+            COUNT(*) FILTER (WHERE mm.mail_activity_type_id = ANY(%(meeting)s)) AS meeting_count
+        FROM mail_message mm
+        JOIN leads ON leads.id = mm.res_id
+        JOIN res_users u ON u.id = leads.user_id
+        WHERE mm.model = 'crm.lead'
+          AND mm.mail_activity_type_id = ANY(%(comm)s || %(auto)s || %(meeting)s || %(manual)s)
+          AND mm.date >= %(first_day)s AND mm.date < %(next_month)s
+        GROUP BY leads.user_id
+    ),
+    rs_stats AS (
+        -- RS: Ringostat дзвінки за місяць (з денного зведення rayton.ringostat.call.daily)
+        SELECT
+            user_id,
+            SUM(call_count) AS rs_total,
+            SUM(call_count) FILTER (WHERE call_status = 'ANSWERED') AS rs_answered,
+            -- без статусу (NULL у дзвінку → '' у зведенні) — теж пропущений
+            SUM(call_count) FILTER (WHERE call_status NOT IN ('ANSWERED', 'BUSY')) AS rs_missed,
+            SUM(call_count) FILTER (WHERE call_status = 'BUSY') AS rs_busy,
+            SUM(total_seconds) FILTER (WHERE call_status = 'ANSWERED') / 60 AS rs_minutes
+        FROM rayton_ringostat_call_daily
+        WHERE user_id = ANY(%(managers)s)
+          AND day >= %(first_day)s AND day < %(next_month)s
+        GROUP BY user_id
+    )
+    SELECT
+        ls.user_id, ls.lead_count,
+        COALESCE(ms.leads_with_comm, 0), ls.leads_with_planned, ls.overdue_count,
+        ls.leads_with_lpr, ls.leads_with_project_num, ls.leads_with_advance,
+        ls.leads_with_product, ls.leads_with_power,
+        COALESCE(ms.meeting_count, 0), COALESCE(ms.comm_auto, 0), COALESCE(ms.comm_manual, 0),
+        COALESCE(rs.rs_total, 0), COALESCE(rs.rs_answered, 0), COALESCE(rs.rs_missed, 0),
+        COALESCE(rs.rs_busy, 0), COALESCE(rs.rs_minutes, 0)
+    FROM lead_stats ls
+    LEFT JOIN msg_stats ms ON ms.user_id = ls.user_id
+    LEFT JOIN rs_stats rs ON rs.user_id = ls.user_id
+"""
+
+KPI_COLUMNS = (
+    'user_id', 'lead_count',
+    'leads_with_comm', 'leads_with_planned', 'overdue_count',
+    'leads_with_lpr', 'leads_with_project_num', 'leads_with_advance',
+    'leads_with_product', 'leads_with_power',
+    'meeting_count', 'comm_auto', 'comm_manual',
+    'rs_total', 'rs_answered', 'rs_missed', 'rs_busy', 'rs_minutes',
+)
 
 
 class RaytonManagerKpi(models.Model):
+    """Знімок КПІ менеджера за місяць: один рядок на (user_id, period_start).
+
+    Поточний місяць перераховується у фоні; перший розрахунок після
+    завершення місяця закриває його (is_closed) — далі рядок не змінюється,
+    і історія та порівняння місяць до місяця читають лише збережені знімки.
+
+    В інкрементальному режимі (rayton.kpi.incremental, за замовчуванням
+    увімкнено) запис нагоди чи активності лише додає рядок у журнал
+    rayton.manager.kpi.dirty; cron щохвилини перераховує поточний місяць
+    для зачеплених менеджерів. Повний перерахунок лишається звіркою раз на
+    rayton.kpi.reconcile_minutes: він ловить те, що журнал не бачить
+    (контакти ЛПР, прострочені на нову дату, зміни повз ORM).
+    """
     _name = 'rayton.manager.kpi'
     _description = 'КПІ Менеджера з продажу'
     _rec_name = 'user_id'
-    _order = 'lead_count desc'
+    _order = 'period_start desc, lead_count desc'
 
     user_id = fields.Many2one('res.users', string='Менеджер', required=True, ondelete='cascade')
+    period_start = fields.Date('Місяць (початок)', required=True, index=True, readonly=True)
     period_label = fields.Char('Місяць', readonly=True)
+    is_closed = fields.Boolean('Місяць закрито', readonly=True,
+                               help='Знімок за завершений місяць — більше не перераховується')
     computed_at = fields.Datetime('Оновлено', readonly=True)
+    freshness = fields.Char('Актуальність', compute='_compute_freshness')
+    is_stale = fields.Boolean('Неактуально', compute='_compute_freshness')
 
     # ── KPI 1: воронка ──────────────────────────────────────────────────── #
     lead_count = fields.Integer('Клієнтів у воронці', readonly=True)
@@ -55,6 +190,20 @@ class RaytonManagerKpi(models.Model):
     power_pct       = fields.Float('% потужність',          digits=(5, 1), compute='_compute_pct')
     meeting_pct     = fields.Float('% план зустрічей (20)', digits=(5, 1), compute='_compute_pct')
 
+    def init(self):
+        # Один рядок на (менеджер, місяць) — ключ для пакетного upsert у _upsert_kpi_rows
+        self._cr.execute("DROP INDEX IF EXISTS rayton_manager_kpi_user_id_uniq")
+        self._cr.execute("""
+            DELETE FROM rayton_manager_kpi k
+            USING rayton_manager_kpi newer
+            WHERE newer.user_id = k.user_id AND newer.period_start = k.period_start
+              AND newer.id > k.id
+        """)
+        self._cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS rayton_manager_kpi_user_period_uniq
+            ON rayton_manager_kpi (user_id, period_start)
+        """)
+
     @api.depends(
         'lead_count', 'leads_with_comm', 'leads_with_planned',
         'leads_with_lpr', 'leads_with_project_num', 'leads_with_advance',
@@ -72,217 +221,329 @@ class RaytonManagerKpi(models.Model):
             r.power_pct       = round(100.0 * r.leads_with_power / b, 1)
             r.meeting_pct     = round(100.0 * r.meeting_count / 20, 1)
 
+    def _compute_freshness(self):
+        now = fields.Datetime.now()
+        stale_minutes = self._stale_minutes()
+        for r in self:
+            if not r.computed_at:
+                r.freshness, r.is_stale = 'ще не розраховано', True
+                continue
+            minutes = int((now - r.computed_at).total_seconds() // 60)
+            if minutes < 1:
+                r.freshness = 'щойно'
+            elif minutes < 60:
+                r.freshness = f'{minutes} хв тому'
+            else:
+                r.freshness = f'{minutes // 60} год {minutes % 60} хв тому'
+            r.is_stale = minutes >= stale_minutes
+
+    # ── Фоновий перерахунок ─────────────────────────────────────────────── #
+
+    @api.model
+    def _cron_refresh_kpi(self):
+        """Перерахувати всі запитані місяці (кнопка / майстер періоду) і поточний.
+
+        В інкрементальному режимі поточний місяць звіряється повним
+        перерахунком лише коли останній старший за rayton.kpi.reconcile_minutes.
+
+        Також один раз закриває попередній місяць: перший перерахунок після
+        його завершення зберігається як незмінний знімок (прострочені — на
+        останній день місяця). Закритий місяць запам'ятовується в
+        rayton.kpi.closed_period, тож місяць без жодного рядка не
+        перераховується на кожному запуску.
+        """
+        cfg = self.env['ir.config_parameter'].sudo()
+        requests = self.env['rayton.manager.kpi.request'].sudo().search([])
+        periods = set(requests.mapped('period_start'))
+        for period in sorted(periods):
+            if not self._refresh_locked(period):
+                return  # інший перерахунок ще йде — запити лишаються в черзі
+        requests.unlink()
+        current = date.today().replace(day=1)
+        if current not in periods and self._reconcile_due():
+            self._refresh_locked(current)
+
+        prev_start = date.today().replace(day=1) - relativedelta(months=1)
+        if cfg.get_param('rayton.kpi.closed_period') != fields.Date.to_string(prev_start):
+            if self._refresh_locked(prev_start):
+                cfg.set_param('rayton.kpi.closed_period', fields.Date.to_string(prev_start))
+
+    @api.model
+    def _refresh_locked(self, period_date=None):
+        """Виконати action_refresh_all, якщо lock не тримає інший перерахунок.
+
+        Повертає False (нічого не роблячи), коли перерахунок уже виконується.
+        """
+        self.env.cr.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s))", [REFRESH_LOCK])
+        if not self.env.cr.fetchone()[0]:
+            _logger.info('КПІ: перерахунок вже виконується — пропущено')
+            return False
+        started = time.perf_counter()
+        self.action_refresh_all(period_date)
+        _logger.info('КПІ: перераховано за %s за %.2f с', period_date or 'поточний місяць',
+                     time.perf_counter() - started)
+        return True
+
+    @api.model
+    def action_request_refresh(self, period_date=None):
+        """Поставити фоновий перерахунок (за потреби — іншого місяця) і одразу повернутись."""
+        period_date = fields.Date.to_date(period_date) if period_date else date.today()
+        self.env['rayton.manager.kpi.request'].sudo().create({'period_start': period_date.replace(day=1)})
+        self.env.ref('rayton_crm.ir_cron_kpi_refresh').sudo()._trigger()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title':   'КПІ Менеджерів',
+                'message': 'Перерахунок запущено у фоні — оновіть сторінку за хвилину.',
+                'type':    'info',
+                'sticky':  False,
+            },
+        }
+
     # ── Розрахунок ──────────────────────────────────────────────────────── #
 
     def action_refresh_all(self, period_date=None):
-        if period_date:
-            if isinstance(period_date, str):
-                from datetime import datetime as dt
-                today = dt.strptime(period_date, '%Y-%m-%d').date()
-            else:
-                today = period_date
-        else:
-            today = date.today()
+        """Розрахувати і зберегти знімок місяця, що містить period_date.
+
+        Закритий місяць, для якого знімок уже є, не чіпається; контекст
+        force_kpi_recompute=True перераховує його примусово.
+        """
+        today          = fields.Date.to_date(period_date) if period_date else date.today()
         first_day      = today.replace(day=1)
         last_day       = first_day + relativedelta(months=1) - relativedelta(days=1)
-        next_mo_start  = first_day + relativedelta(months=1)
-        next_mo_end    = next_mo_start + relativedelta(months=1) - relativedelta(days=1)
-        period_label   = first_day.strftime('%m.%Y')
+        closed         = first_day < date.today().replace(day=1)
+        force          = self.env.context.get('force_kpi_recompute')
+
+        if closed and not force and self.search_count([
+            ('period_start', '=', first_day), ('is_closed', '=', True),
+        ]):
+            return {'type': 'ir.actions.client', 'tag': 'reload'}
+        if closed:
+            today = last_day  # прострочені — на кінець закритого місяця
+
+        managers = self._kpi_managers()
+
+        # Видалити записи відкритого місяця для юзерів яких більше немає в списку
+        # менеджерів (закриті місяці — історія, їх не чіпаємо)
+        self.search([
+            ('user_id', 'not in', managers.ids),
+            ('period_start', '=', first_day),
+            ('is_closed', '=', False),
+        ]).unlink()
+
+        rows = self._compute_kpi_rows(managers.ids, self._kpi_params(first_day, today))
+        if force:
+            self.search([('period_start', '=', first_day)]).write({'is_closed': False})
+        self._upsert_kpi_rows(rows, first_day, closed)
+
+        return {'type': 'ir.actions.client', 'tag': 'reload'}
+
+    @api.model
+    def _kpi_managers(self):
+        manager_group  = self.env.ref('rayton_crm.group_manager')
+        kc_head_group  = self.env.ref('rayton_crm.group_kc_head')
+        return (manager_group.users - kc_head_group.users).filtered(
+            lambda u: u.active and not u.share and u.id != 1
+        )
 
+    @api.model
+    @tools.ormcache()
+    def _get_kpi_activity_type_ids(self):
+        """Кортежі id типів (comm, meeting, auto) і id типу ручного дзвінка — з ormcache реєстру."""
+        ActivityType = self.env['mail.activity.type'].sudo()
         # Типи активностей: дзвінки + зустрічі (без Недозвону)
-        comm_types = self.env['mail.activity.type'].search([('name', 'in', [
+        comm_types = ActivityType.search([('name', 'in', [
             'Телефонний дзвінок Клієнту', 'Вихідний дзвінок', 'Вхідний дзвінок',
             'Онлайн-зустріч', 'Офлайн-зустріч',
         ])])
-        meeting_types = self.env['mail.activity.type'].search([('name', 'in', [
+        meeting_types = ActivityType.search([('name', 'in', [
             'Онлайн-зустріч', 'Офлайн-зустріч',
         ])])
         # Розбивка дзвінків: Ringostat (авто) vs ручні
-        auto_call_types = self.env['mail.activity.type'].search([('name', 'in', [
+        auto_call_types = ActivityType.search([('name', 'in', [
             'Вихідний дзвінок', 'Вхідний дзвінок',
         ])])
-        manual_call_type = self.env['mail.activity.type'].search([
+        manual_call_type = ActivityType.search([
             ('name', '=', 'Телефонний дзвінок Клієнту'),
         ], limit=1)
-        comm_type_ids      = comm_types.ids or [0]
-        meeting_type_ids   = meeting_types.ids or [0]
-        auto_call_type_ids = auto_call_types.ids or [0]
-        manual_call_type_id = manual_call_type.id if manual_call_type else 0
-
-        manager_group  = self.env.ref('rayton_crm.group_manager')
-        kc_head_group  = self.env.ref('rayton_crm.group_kc_head')
-        managers = (manager_group.users - kc_head_group.users).filtered(
-            lambda u: u.active and not u.share and u.id != 1
+        return (
+            tuple(comm_types.ids or [0]),
+            tuple(meeting_types.ids or [0]),
+            tuple(auto_call_types.ids or [0]),
+            manual_call_type.id or 0,
         )
 
-        # Видалити записи для юзерів яких більше немає в списку менеджерів
-        self.search([('user_id', 'not in', managers.ids)]).unlink()
-
-        for manager in managers:
-            leads = self.env['crm.lead'].search([
-                ('user_id', '=', manager.id),
-                ('active', '=', True),
-                ('stage_id.is_won', '=', False),
-                ('stage_id.is_manager_pipeline', '=', True),
-                ('type', '=', 'opportunity'),
-            ])
-            lead_ids = leads.ids
-            if not lead_ids:
-                continue
-
-            cr = self.env.cr
-
-            # 2a: дзвінки/зустрічі цього місяця
-            cr.execute("""
-                SELECT COUNT(DISTINCT res_id)
-                FROM mail_message
-                WHERE model = 'crm.lead'
-                  AND res_id = ANY(%s)
-                  AND mail_activity_type_id = ANY(%s)
-                  AND date >= %s AND date <= %s
-            """, [lead_ids, comm_type_ids, first_day, last_day])
-            leads_with_comm = cr.fetchone()[0]
-
-            # 2b: заплановані — є наступна активність в Pipedrive
-            cr.execute("""
-                SELECT COUNT(*)
-                FROM crm_lead
-                WHERE id = ANY(%s)
-                  AND pipedrive_next_activity_date IS NOT NULL
-            """, [lead_ids])
-            leads_with_planned = cr.fetchone()[0]
-
-            # 2c: прострочені завдання (next_activity_date в минулому = прострочено)
-            cr.execute("""
-                SELECT COUNT(*)
-                FROM crm_lead
-                WHERE id = ANY(%s)
-                  AND pipedrive_next_activity_date IS NOT NULL
-                  AND pipedrive_next_activity_date < %s
-            """, [lead_ids, today])
-            overdue_count = cr.fetchone()[0]
-
-            # 3a: ЛПР/ЛВР — партнер має дочірній контакт з заповненою посадою
-            cr.execute("""
-                SELECT COUNT(DISTINCT l.id)
-                FROM crm_lead l
-                JOIN res_partner c ON c.parent_id = l.partner_id
-                WHERE l.id = ANY(%s)
-                  AND c.function IS NOT NULL AND c.function != ''
-            """, [lead_ids])
-            leads_with_lpr = cr.fetchone()[0]
-
-            # 3b–3e: заповнення картки (один запит)
-            cr.execute("""
-                SELECT
-                    COUNT(CASE WHEN project_number IS NOT NULL AND project_number != '' THEN 1 END),
-                    COUNT(CASE WHEN advance_planned_date IS NOT NULL THEN 1 END),
-                    COUNT(CASE WHEN project_type IS NOT NULL THEN 1 END),
-                    COUNT(CASE WHEN power_ses_kw > 0 OR capacity_uze_kwh > 0 THEN 1 END)
-                FROM crm_lead
-                WHERE id = ANY(%s)
-            """, [lead_ids])
-            row = cr.fetchone()
-            leads_with_project_num = row[0]
-            leads_with_advance     = row[1]
-            leads_with_product     = row[2]
-            leads_with_power       = row[3]
-
-            # 2d: дзвінків через телефонію Ringostat (Вихідний + Вхідний)
-            cr.execute("""
-                SELECT COUNT(*)
-                FROM mail_message
-                WHERE model = 'crm.lead'
-                  AND res_id = ANY(%s)
-                  AND mail_activity_type_id = ANY(%s)
-                  AND date >= %s AND date <= %s
-            """, [lead_ids, auto_call_type_ids, first_day, last_day])
-            comm_auto = cr.fetchone()[0]
-
-            # 2e: ручних дзвінків створених самим менеджером
-            cr.execute("""
-                SELECT COUNT(mm.id)
-                FROM mail_message mm
-                JOIN res_users u ON u.partner_id = mm.author_id
-                WHERE mm.model = 'crm.lead'
-                  AND mm.res_id = ANY(%s)
-                  AND mm.mail_activity_type_id = %s
-                  AND u.id = %s
-                  AND mm.date >= %s AND mm.date <= %s
-            """, [lead_ids, manual_call_type_id, manager.id, first_day, last_day])
-            comm_manual = cr.fetchone()[0]
-
-            # 4: зустрічі цього місяця
-            cr.execute("""
-                SELECT COUNT(*)
-                FROM mail_message
-                WHERE model = 'crm.lead'
-                  AND res_id = ANY(%s)
-                  AND mail_activity_type_id = ANY(%s)
-                  AND date >= %s AND date <= %s
-            """, [lead_ids, meeting_type_ids, first_day, last_day])
-            meeting_count = cr.fetchone()[0]
-
-            # RS: Ringostat дзвінки за місяць (з rayton.ringostat.call)
-            cr.execute("""
-                SELECT
-                    COUNT(*),
-                    COUNT(CASE WHEN call_status = 'ANSWERED' THEN 1 END),
-                    COUNT(CASE WHEN call_status NOT IN ('ANSWERED', 'BUSY') THEN 1 END),
-                    COUNT(CASE WHEN call_status = 'BUSY' THEN 1 END),
-                    COALESCE(
-                        SUM(CASE WHEN call_status = 'ANSWERED' THEN call_duration ELSE 0 END) / 60,
-                        0
-                    )
-                FROM rayton_ringostat_call
-                WHERE user_id = %s
-                  AND call_date >= %s AND call_date <= %s
-            """, [manager.id, first_day, last_day])
-            rs_row      = cr.fetchone()
-            rs_total    = rs_row[0] or 0
-            rs_answered = rs_row[1] or 0
-            rs_missed   = rs_row[2] or 0
-            rs_busy     = rs_row[3] or 0
-            rs_minutes  = rs_row[4] or 0
-
-            vals = {
-                'lead_count':             len(lead_ids),
-                'leads_with_comm':        leads_with_comm,
-                'leads_with_planned':     leads_with_planned,
-                'overdue_count':          overdue_count,
-                'leads_with_lpr':         leads_with_lpr,
-                'leads_with_project_num': leads_with_project_num,
-                'leads_with_advance':     leads_with_advance,
-                'leads_with_product':     leads_with_product,
-                'leads_with_power':       leads_with_power,
-                'meeting_count':          meeting_count,
-                'comm_total':             comm_auto + comm_manual,
-                'comm_auto':              comm_auto,
-                'comm_manual':            comm_manual,
-                'rs_total':               rs_total,
-                'rs_answered':            rs_answered,
-                'rs_missed':              rs_missed,
-                'rs_busy':                rs_busy,
-                'rs_minutes':             rs_minutes,
-                'period_label':           period_label,
-                'computed_at':            fields.Datetime.now(),
-            }
-
-            existing = self.search([('user_id', '=', manager.id)], limit=1)
-            if existing:
-                existing.write(vals)
-            else:
-                vals['user_id'] = manager.id
-                self.create(vals)
-
-        return {'type': 'ir.actions.client', 'tag': 'reload'}
+    @api.model
+    def _kpi_params(self, first_day, today):
+        """Параметри KPI_SQL для місяця, що починається з first_day."""
+        comm, meeting, auto, manual = self._get_kpi_activity_type_ids()
+        return {
+            'first_day':  first_day,
+            'next_month': first_day + relativedelta(months=1),
+            'today':      today,
+            'comm':       list(comm),
+            'meeting':    list(meeting),
+            'auto':       list(auto),
+            'manual':     manual,
+        }
 
+    @api.model
+    def _compute_kpi_rows(self, manager_ids, params):
+        """Словник значень КПІ для кожного менеджера з відкритими нагодами.
+
+        Кількість запитів не залежить від кількості менеджерів; менеджери
+        без нагод пропускаються, як і раніше.
+        """
+        if not manager_ids:
+            return []
+        self.env['crm.lead'].flush_model()
+        self.env['mail.message'].flush_model()
+        self.env.cr.execute(KPI_SQL, dict(params, managers=list(manager_ids)))
+        rows = []
+        for values in self.env.cr.fetchall():
+            row = dict(zip(KPI_COLUMNS, values))
+            row['comm_total'] = row['comm_auto'] + row['comm_manual']
+            rows.append(row)
+        return rows
+
+    @api.model
+    def _upsert_kpi_rows(self, rows, period_start, closed=False):
+        """Вставити або оновити рядки місяця одним INSERT .. ON CONFLICT.
+
+        Рядки вже закритого місяця ніколи не перезаписуються.
+        """
+        if not rows:
+            return
+        extra = ['period_start', 'period_label', 'is_closed', 'computed_at']
+        columns = list(KPI_COLUMNS) + ['comm_total'] + extra
+        now = fields.Datetime.now()
+        period_label = period_start.strftime('%m.%Y')
+        values = [
+            tuple(row[c] for c in columns[:-len(extra)])
+            + (period_start, period_label, closed, now, self.env.uid, now, self.env.uid, now)
+            for row in rows
+        ]
+        updates = ', '.join('%s = EXCLUDED.%s' % (c, c) for c in columns[1:] + ['write_uid', 'write_date']
+                            if c != 'period_start')
+        query = """
+            INSERT INTO rayton_manager_kpi (%s, create_uid, create_date, write_uid, write_date)
+            VALUES %%s
+            ON CONFLICT (user_id, period_start) DO UPDATE SET %s
+            WHERE NOT rayton_manager_kpi.is_closed
+        """ % (', '.join(columns), updates)
+        execute_values(self.env.cr._obj, query, values)
+        self.invalidate_model()
+
+    # ── Інкрементальне ведення ──────────────────────────────────────────── #
+
+    @api.model
+    def _incremental_enabled(self):
+        return bool(int(self.env['ir.config_parameter'].sudo().get_param('rayton.kpi.incremental', 1)))
+
+    @api.model
+    def _stale_minutes(self):
+        """Вік, після якого рядки позначаються неактуальними: пізніше за очікуваний повний перерахунок."""
+        if not self._incremental_enabled():
+            return STALE_MINUTES
+        cfg = self.env['ir.config_parameter'].sudo()
+        return int(cfg.get_param('rayton.kpi.reconcile_minutes', 60)) + STALE_MINUTES
+
+    @api.model
+    def _reconcile_due(self):
+        """True, коли поточному місяцю потрібен повний перерахунок з cron."""
+        if not self._incremental_enabled():
+            return True
+        cfg = self.env['ir.config_parameter'].sudo()
+        minutes = int(cfg.get_param('rayton.kpi.reconcile_minutes', 60))
+        self.env.cr.execute(
+            "SELECT min(computed_at) FROM rayton_manager_kpi WHERE period_start = %s",
+            [date.today().replace(day=1)])
+        oldest = self.env.cr.fetchone()[0]
+        return not oldest or oldest < fields.Datetime.now() - timedelta(minutes=minutes)
+
+    @api.model
+    def _mark_dirty(self, user_ids=(), lead_ids=()):
+        """Позначити менеджерів (або нагоди — менеджера знайде cron) до перерахунку.
+
+        Лише INSERT у журнал: знімки КПІ в транзакції того, хто пише, не змінюються.
+        """
+        user_ids, lead_ids = [u for u in user_ids if u], [l for l in lead_ids if l]
+        if not (user_ids or lead_ids) or not self._incremental_enabled():
+            return
+        self.env.cr.execute("""
+            INSERT INTO rayton_manager_kpi_dirty (user_id, lead_id)
+            SELECT u, NULL FROM unnest(%s::int[]) u
+            UNION ALL
+            SELECT NULL, l FROM unnest(%s::int[]) l
+        """, [user_ids, lead_ids])
+
+    @api.model
+    def _cron_fold_dirty(self):
+        self.env.cr.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s))", [REFRESH_LOCK])
+        if self.env.cr.fetchone()[0]:
+            self._fold_dirty()
+
+    @api.model
+    def _fold_dirty(self):
+        """Перерахувати поточний місяць для менеджерів із журналу і очистити його.
+
+        Повертає кількість перерахованих менеджерів. Рядки, вставлені після
+        початку транзакції, не видно — вони лишаються до наступного запуску.
+        """
+        cr = self.env.cr
+        cr.execute("DELETE FROM rayton_manager_kpi_dirty RETURNING user_id, lead_id")
+        logged = cr.fetchall()
+        user_ids = {user_id for user_id, _lead in logged if user_id}
+        lead_ids = [lead_id for _user, lead_id in logged if lead_id]
+        if lead_ids:
+            self.env['crm.lead'].flush_model(['user_id'])
+            cr.execute("SELECT DISTINCT user_id FROM crm_lead WHERE id = ANY(%s) AND user_id IS NOT NULL",
+                       [lead_ids])
+            user_ids.update(r[0] for r in cr.fetchall())
+        manager_ids = [u for u in self._kpi_managers().ids if u in user_ids]
+        if not manager_ids:
+            return 0
+        today = date.today()
+        first_day = today.replace(day=1)
+        rows = self._compute_kpi_rows(manager_ids, self._kpi_params(first_day, today))
+        self._upsert_kpi_rows(rows, first_day)
+        return len(manager_ids)
+
+    @api.model
     def action_open_kpi(self):
-        self.action_refresh_all()
-        return {
+        """Одразу відкрити збережені рядки поточного місяця; якщо неактуальні — розбудити cron."""
+        period_start = date.today().replace(day=1)
+        self.env.cr.execute(
+            "SELECT max(computed_at) FROM rayton_manager_kpi WHERE period_start = %s", [period_start])
+        last = self.env.cr.fetchone()[0]
+        if not last or last < fields.Datetime.now() - timedelta(minutes=self._stale_minutes()):
+            self.env.ref('rayton_crm.ir_cron_kpi_refresh').sudo()._trigger()
+        return self._action_open_period()
+
+    @api.model
+    def _action_open_period(self, period_start=None):
+        """Вікно зі збереженими знімками.
+
+        Без period_start поточний місяць обрано фільтром пошуку, який можна
+        зняти, — порівняння місяць до місяця (фільтр "Порівняти", pivot,
+        graph) читає збережені рядки без жодного перерахунку.
+        """
+        action = {
             'type': 'ir.actions.act_window',
             'name': 'КПІ Менеджерів',
             'res_model': 'rayton.manager.kpi',
-            'view_mode': 'tree',
-            'view_id': self.env.ref('rayton_crm.view_rayton_manager_kpi_tree').id,
+            'view_mode': 'tree,pivot,graph',
+            'views': [
+                (self.env.ref('rayton_crm.view_rayton_manager_kpi_tree').id, 'tree'),
+                (self.env.ref('rayton_crm.view_rayton_manager_kpi_pivot').id, 'pivot'),
+                (self.env.ref('rayton_crm.view_rayton_manager_kpi_graph').id, 'graph'),
+            ],
+            'search_view_id': self.env.ref('rayton_crm.view_rayton_manager_kpi_search').id,
+            'context': {'search_default_filter_period': 1},
         }
+        if period_start:
+            action['name'] = 'КПІ Менеджерів — %s' % period_start.strftime('%m.%Y')
+            action['domain'] = [('period_start', '=', period_start)]
+            action['context'] = {}
+        return action
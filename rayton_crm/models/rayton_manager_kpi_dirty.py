@@ -0,0 +1,19 @@
+from odoo import fields, models
+
+
+class RaytonManagerKpiDirty(models.Model):
+    """Журнал змін для інкрементального КПІ: хто з менеджерів потребує перерахунку.
+
+    Лише додавання: запис нагоди чи активності вставляє сюди рядок (user_id
+    або lead_id) і не чіпає знімки rayton.manager.kpi — транзакція
+    користувача не чекає на гарячий рядок менеджера і не отримує помилок
+    серіалізації. Cron раз на хвилину забирає журнал і перераховує
+    поточний місяць лише для зачеплених менеджерів.
+    """
+    _name = 'rayton.manager.kpi.dirty'
+    _description = 'КПІ — зміни до перерахунку'
+    _log_access = False
+
+    # Без зовнішніх ключів: вставка дешева, видалені записи не заважають
+    user_id = fields.Integer('Менеджер', readonly=True)
+    lead_id = fields.Integer('Нагода', readonly=True)
@@ -0,0 +1,16 @@
+from odoo import fields, models
+
+
+class RaytonManagerKpiRequest(models.Model):
+    """Черга запитів на перерахунок КПІ за місяць (кнопка "Оновити", wizard).
+
+    Кожен запит — окремий рядок: два користувачі, що одночасно вибрали різні
+    місяці, не перезаписують один одного і не змагаються за один рядок.
+    Cron rayton.manager.kpi перераховує всі місяці з черги і видаляє
+    оброблені запити.
+    """
+    _name = 'rayton.manager.kpi.request'
+    _description = 'КПІ — запит на перерахунок'
+    _order = 'id'
+
+    period_start = fields.Date('Місяць (початок)', required=True, readonly=True)
@@ -0,0 +1,446 @@
+import json
+import logging
+import random
+import time
+from datetime import timedelta
+
+from psycopg2 import errorcodes
+
+from odoo import api, fields, models
+from odoo.exceptions import UserError
+
+from ..controllers.pipedrive_webhook import PipedriveWebhook
+from ..tools.pipedrive_client import PipedriveApiError, PipedriveClient
+
+_logger = logging.getLogger(__name__)
+
+# Помилки конкурентного доступу: подію достатньо повторити в новій транзакції
+CONCURRENCY_PGCODES = {
+    errorcodes.SERIALIZATION_FAILURE,
+    errorcodes.DEADLOCK_DETECTED,
+    errorcodes.UNIQUE_VIOLATION,
+    errorcodes.LOCK_NOT_AVAILABLE,
+}
+
+# Лічильники для моніторингу (в межах процесу воркера), див. _concurrency_stats()
+CONCURRENCY_STATS = {
+    'lock_waits':        0,  # advisory lock об'єкта тримав інший воркер
+    'conflicts':         0,  # serialization failure / unique violation / deadlock
+    'retries':           0,  # повтори після конфлікту
+    'retries_exhausted': 0,  # конфлікт і після всіх повторів → звичайний backoff
+}
+
+# Черга ділиться на шарди за entity_id % QUEUE_SHARDS; кожен шард — окремий
+# ir.cron (ir_cron_pipedrive_event_queue, ..._1, ..._2, ...). Odoo не запускає
+# один cron паралельно сам із собою, тож лише так черга обробляється кількома
+# воркерами одночасно (потрібно max_cron_threads >= кількості шардів).
+QUEUE_SHARDS = 4
+
+# Об'єкти, які дотягує дельта-синхронізація (/recents?items=...)
+SYNC_ENTITIES = ('deal', 'person', 'organization', 'activity')
+
+
+class RaytonPipedriveEvent(models.Model):
+    """Staging-черга webhook-подій Pipedrive.
+
+    Контролер лише зберігає сирий payload і одразу відповідає 200.
+    Cron забирає події пакетами і викликає ті самі обробники
+    PipedriveWebhook (_on_deal, _on_activity, ...), з лічильником спроб
+    і станом помилки для подій, які не вдалося обробити.
+
+    Події одного об'єкта (entity, entity_id), що прийшли пачкою, згортаються:
+    обробляється лише найновіша, решта отримує стан "merged".
+
+    Шарди (QUEUE_SHARDS) обробляються паралельно окремими cron-ами. Угода і
+    її активності можуть потрапити в різні шарди — їх серіалізує advisory
+    lock по об'єкту Odoo (_lock_key).
+
+    Дельта-синхронізація (_sync_delta) кладе в ту ж чергу об'єкти, змінені
+    в Pipedrive після курсора — так пропущені під час простою webhook-и
+    доганяються тими самими обробниками.
+    """
+    _name = 'rayton.pipedrive.event'
+    _description = 'Подія Pipedrive (черга webhook)'
+    _order = 'id desc'
+    _rec_name = 'entity'
+
+    source = fields.Selection([
+        ('webhook', 'Webhook'),
+        ('sync',    'Синхронізація'),
+    ], string='Джерело', default='webhook', required=True, readonly=True)
+    entity = fields.Char("Об'єкт", readonly=True, index=True)
+    action = fields.Char('Дія', readonly=True)
+    entity_id = fields.Integer('Pipedrive ID', readonly=True, index=True)
+    payload = fields.Text('Payload (JSON)', required=True, readonly=True)
+    state = fields.Selection([
+        ('pending', 'Очікує'),
+        ('done',    'Оброблено'),
+        ('merged',  'Згорнуто'),
+        ('error',   'Помилка'),
+    ], string='Стан', default='pending', required=True, index=True)
+    merged_into_id = fields.Many2one(
+        'rayton.pipedrive.event', 'Згорнуто в', readonly=True, ondelete='set null',
+    )
+    merged_count = fields.Integer('Згорнуто подій', readonly=True,
+                                  help='Скільки старіших подій цього об\'єкта замінила ця подія')
+    attempts = fields.Integer('Спроб', default=0, readonly=True)
+    next_attempt_at = fields.Datetime('Наступна спроба', readonly=True)
+    processed_at = fields.Datetime('Оброблено о', readonly=True)
+    last_error = fields.Text('Остання помилка', readonly=True)
+
+    # ── Прийом ───────────────────────────────────────────────────────────── #
+
+    @api.model
+    def _enqueue(self, data):
+        """Зберегти сирий payload webhook-а і розбудити cron черги."""
+        event = self.create(self._prepare_event_vals(data))
+        self._trigger_queue([event._shard()])
+        return event
+
+    @api.model
+    def _prepare_event_vals(self, data, source='webhook'):
+        obj, action, _raw_action, current, _previous = PipedriveWebhook._parse_event(data)
+        meta = data.get('meta', {})
+        entity_id = current.get('id') or meta.get('entity_id') or meta.get('id')
+        return {
+            'source':    source,
+            'entity':    obj or '',
+            'action':    action,
+            'entity_id': entity_id if isinstance(entity_id, int) else 0,
+            'payload':   json.dumps(data, ensure_ascii=False),
+        }
+
+    def _shard(self):
+        self.ensure_one()
+        return (self.entity_id if self.entity_id > 0 else self.id) % QUEUE_SHARDS
+
+    @api.model
+    def _queue_cron(self, shard):
+        xmlid = 'rayton_crm.ir_cron_pipedrive_event_queue' + ('_%d' % shard if shard else '')
+        return self.env.ref(xmlid, raise_if_not_found=False)
+
+    @api.model
+    def _trigger_queue(self, shards=None, delay=True):
+        """Розбудити cron-и черги для `shards` (за замовчуванням — усі шарди)."""
+        # Будимо cron після вікна згортання — щоб пачка встигла зібратись
+        at = fields.Datetime.now() + timedelta(seconds=self._coalesce_window()[0]) if delay else None
+        for shard in (range(QUEUE_SHARDS) if shards is None else shards):
+            cron = self._queue_cron(shard)
+            if cron:
+                cron._trigger(at)
+
+    @api.model
+    def _coalesce_window(self):
+        """(window, max_delay) у секундах для згортання пачок подій.
+
+        Ключ (entity, id) обробляється, коли протягом `window` секунд по ньому
+        не прийшло нових подій, але не пізніше `max_delay` секунд від
+        найстарішої події в черзі — безперервний потік не відкладає його назавжди.
+        """
+        cfg = self.env['ir.config_parameter'].sudo()
+        window = int(cfg.get_param('pipedrive.queue.coalesce_seconds', 10))
+        max_delay = int(cfg.get_param('pipedrive.queue.coalesce_max_seconds', 120))
+        return window, max(window, max_delay)
+
+    # ── Обробка ──────────────────────────────────────────────────────────── #
+
+    @api.model
+    def _cron_process_queue(self, shard=0):
+        self._process_pending(auto_commit=True, shard=shard)
+
+    @api.model
+    def _process_pending(self, limit=None, auto_commit=False, shard=None):
+        """Обробити одну пачку подій шарда `shard` (None — усіх), згорнутих по (entity, id).
+
+        Події групуються по об'єкту Pipedrive: з кожної групи обробляється
+        лише найновіша, старіші позначаються як згорнуті в неї. Події без ID
+        не згортаються. Кожна подія блокується FOR UPDATE SKIP LOCKED
+        безпосередньо перед обробкою. У кожного шарда свій cron, тож шарди
+        обробляються паралельно.
+
+        Повертає (оброблено, згорнуто).
+        """
+        cfg = self.env['ir.config_parameter'].sudo()
+        limit = limit or int(cfg.get_param('pipedrive.queue.batch_size', 200))
+        window, max_delay = self._coalesce_window()
+        now = fields.Datetime.now()
+
+        self.env.cr.execute("""
+            SELECT (array_agg(id ORDER BY id DESC))[1],
+                   array_agg(id ORDER BY id DESC)
+            FROM rayton_pipedrive_event
+            WHERE state = 'pending'
+              AND (%(shard)s IS NULL
+                   OR mod(CASE WHEN entity_id > 0 THEN entity_id ELSE id END, %(shards)s) = %(shard)s)
+            GROUP BY entity, CASE WHEN entity_id > 0 THEN entity_id ELSE -id END
+            HAVING (max(create_date) <= %(cutoff)s OR min(create_date) <= %(hard_cutoff)s)
+               AND COALESCE((array_agg(next_attempt_at ORDER BY id DESC))[1], %(now)s) <= %(now)s
+            ORDER BY min(id)
+            LIMIT %(limit)s
+        """, {
+            'now':         now,
+            'cutoff':      now - timedelta(seconds=window),
+            'hard_cutoff': now - timedelta(seconds=max_delay),
+            'limit':       limit,
+            'shard':       shard,
+            'shards':      QUEUE_SHARDS,
+        })
+        groups = self.env.cr.fetchall()
+
+        collapsed = 0
+        for survivor_id, group_ids in groups:
+            collapsed += self.browse(survivor_id)._process(
+                merged_ids=group_ids[1:], auto_commit=auto_commit,
+            )
+
+        if groups:
+            _logger.info('Pipedrive queue [шард %s]: оброблено %d подій, згорнуто ще %d; конкурентність: %s',
+                         'всі' if shard is None else shard, len(groups), collapsed,
+                         self._concurrency_stats())
+        if len(groups) == limit:
+            # Черга ще не порожня — одразу плануємо наступний прохід
+            self._trigger_queue(None if shard is None else [shard], delay=False)
+        if not shard:
+            self._gc_done_events()
+        return len(groups), collapsed
+
+    def _process(self, merged_ids=(), auto_commit=False):
+        """Обробити подію; старіші події з `merged_ids` згортаються в неї.
+
+        Об'єкт Odoo, який змінює подія, захищений advisory lock Postgres
+        (див. PipedriveWebhook._lock_key): одну угоду два воркери одночасно
+        не обробляють, різні — обробляються паралельно. З cron (auto_commit)
+        lock сесійний, і після його отримання транзакція починається заново —
+        обробник бачить усе, що закомітив попередній власник lock. Інакше
+        lock транзакційний, а конфлікти ловлять унікальні індекси і _mark_failed.
+
+        Повертає кількість подій, реально позначених як згорнуті.
+        """
+        self.ensure_one()
+        cr = self.env.cr
+        lock = self._lock_key()
+        session_lock = bool(lock and auto_commit)
+        if lock:
+            self._advisory_lock(lock, session=session_lock)
+            if session_lock:
+                cr.commit()  # новий знімок бази вже після отримання lock
+        try:
+            return self._process_locked(merged_ids, auto_commit)
+        except Exception:
+            if session_lock:
+                cr.rollback()
+            raise
+        finally:
+            if session_lock:
+                cr.execute("SELECT pg_advisory_unlock(hashtext(%s), %s)", lock)
+
+    def _process_locked(self, merged_ids, auto_commit):
+        cr = self.env.cr
+        cfg = self.env['ir.config_parameter'].sudo()
+        max_retries = int(cfg.get_param('pipedrive.queue.conflict_retries', 3)) if auto_commit else 0
+
+        for attempt in range(max_retries + 1):
+            if attempt:
+                # Повтор після конфлікту: з нуля, в новій транзакції, з паузою
+                cr.rollback()
+                CONCURRENCY_STATS['retries'] += 1
+                time.sleep(min(0.1 * 2 ** attempt, 2.0) * random.uniform(0.5, 1.5))
+
+            cr.execute("""
+                SELECT id FROM rayton_pipedrive_event
+                WHERE id = %s AND state = 'pending'
+                FOR UPDATE SKIP LOCKED
+            """, [self.id])
+            if not cr.fetchone():
+                return 0  # вже оброблено або взято іншим воркером
+
+            collapsed = 0
+            if merged_ids:
+                cr.execute("""
+                    UPDATE rayton_pipedrive_event
+                    SET state = 'merged', merged_into_id = %s, processed_at = %s
+                    WHERE id IN (
+                        SELECT id FROM rayton_pipedrive_event
+                        WHERE id = ANY(%s) AND state = 'pending'
+                        FOR UPDATE SKIP LOCKED
+                    )
+                """, [self.id, fields.Datetime.now(), list(merged_ids)])
+                collapsed = cr.rowcount
+                self.invalidate_model(['state', 'merged_into_id', 'processed_at'])
+
+            try:
+                with cr.savepoint():
+                    self._dispatch()
+            except Exception as e:
+                if getattr(e, 'pgcode', None) in CONCURRENCY_PGCODES:
+                    CONCURRENCY_STATS['conflicts'] += 1
+                    if attempt < max_retries:
+                        _logger.info('Pipedrive event %s: конфлікт (%s), повтор %d/%d',
+                                     self.id, e.pgcode, attempt + 1, max_retries)
+                        continue
+                    if max_retries:
+                        CONCURRENCY_STATS['retries_exhausted'] += 1
+                self._mark_failed(e)
+            else:
+                self.write({
+                    'state':        'done',
+                    'attempts':     self.attempts + 1,
+                    'processed_at': fields.Datetime.now(),
+                    'last_error':   False,
+                })
+            break
+
+        if collapsed:
+            self.merged_count += collapsed
+        if auto_commit:
+            cr.commit()
+        return collapsed
+
+    def _lock_key(self):
+        """Ключ advisory lock події (простір імен, id) або None."""
+        self.ensure_one()
+        obj, _action, _raw_action, current, _previous = \
+            PipedriveWebhook._parse_event(json.loads(self.payload))
+        key = PipedriveWebhook._lock_key(obj, current)
+        return ('rayton.pipedrive.%s' % key[0], key[1]) if key else None
+
+    def _advisory_lock(self, lock, session=False):
+        """Взяти advisory lock; рахує випадки, коли його тримав інший воркер."""
+        cr = self.env.cr
+        if session:
+            try_sql = "SELECT pg_try_advisory_lock(hashtext(%s), %s)"
+            wait_sql = "SELECT pg_advisory_lock(hashtext(%s), %s)"
+        else:
+            try_sql = "SELECT pg_try_advisory_xact_lock(hashtext(%s), %s)"
+            wait_sql = "SELECT pg_advisory_xact_lock(hashtext(%s), %s)"
+        cr.execute(try_sql, lock)
+        if not cr.fetchone()[0]:
+            CONCURRENCY_STATS['lock_waits'] += 1
+            cr.execute(wait_sql, lock)
+
+    @api.model
+    def _concurrency_stats(self):
+        """Копія лічильників конкурентності цього процесу воркера."""
+        return dict(CONCURRENCY_STATS)
+
+    def _dispatch(self):
+        self.ensure_one()
+        data = json.loads(self.payload)
+        obj, action, _raw_action, current, previous = PipedriveWebhook._parse_event(data)
+        env = self.env(user=self.env.ref('base.user_admin').id)
+        PipedriveWebhook()._dispatch(env, obj, action, current, previous)
+
+    def _mark_failed(self, error):
+        self.ensure_one()
+        cfg = self.env['ir.config_parameter'].sudo()
+        max_attempts = int(cfg.get_param('pipedrive.queue.max_attempts', 5))
+        attempts = self.attempts + 1
+        _logger.error('Pipedrive event %s (%s.%s id=%s) спроба %d/%d: %s',
+                      self.id, self.entity, self.action, self.entity_id,
+                      attempts, max_attempts, error, exc_info=True)
+        vals = {'attempts': attempts, 'last_error': str(error)}
+        if attempts >= max_attempts:
+            vals['state'] = 'error'
+        else:
+            # Експоненційна пауза: 2, 4, 8, 16 хв
+            vals['next_attempt_at'] = fields.Datetime.now() + timedelta(minutes=2 ** attempts)
+        self.write(vals)
+
+    @api.model
+    def _gc_done_events(self):
+        """Видалити оброблені і згорнуті події, старші за pipedrive.queue.keep_days."""
+        cfg = self.env['ir.config_parameter'].sudo()
+        keep_days = int(cfg.get_param('pipedrive.queue.keep_days', 14))
+        self.env.cr.execute("""
+            DELETE FROM rayton_pipedrive_event
+            WHERE state IN ('done', 'merged') AND processed_at < %s
+        """, [fields.Datetime.now() - timedelta(days=keep_days)])
+
+    # ── Дельта-синхронізація ─────────────────────────────────────────────── #
+
+    @api.model
+    def _cron_sync_delta(self):
+        try:
+            self._sync_delta(auto_commit=True)
+        except PipedriveApiError as e:
+            _logger.warning('Pipedrive delta sync: %s', e)
+
+    @api.model
+    def _sync_delta(self, entities=SYNC_ENTITIES, auto_commit=False):
+        """Поставити в чергу всі об'єкти, змінені в Pipedrive після збереженого курсора.
+
+        Використовує /recents?since_timestamp=..&items=<entity> — читаються
+        лише змінені записи. Кожен тип об'єкта має свій курсор у параметрі
+        pipedrive.sync.since.<entity>; він зсувається після кожної сторінки,
+        тож перерваний запуск продовжується з того ж місця. Об'єкти, які
+        webhook уже застосував, нічого не коштують: черга їх згортає, а
+        обробники пропускають застарілі й незмінені дані.
+
+        Повертає {entity: кількість подій у черзі}.
+        """
+        client = PipedriveClient.from_env(self.env)
+        started = time.monotonic()
+        counts = {entity: self._sync_entity(client, entity, auto_commit) for entity in entities}
+        if any(counts.values()):
+            self._trigger_queue()
+        _logger.info('Pipedrive delta sync: %s за %.1f с (%d запитів API, пауз лімітера %.1f с)',
+                     counts, time.monotonic() - started,
+                     client.requests_made, client.throttled_seconds)
+        return counts
+
+    @api.model
+    def _sync_entity(self, client, entity, auto_commit=False):
+        cfg = self.env['ir.config_parameter'].sudo()
+        param = 'pipedrive.sync.since.%s' % entity
+        since = cfg.get_param(param)
+        if not since:
+            # Перший запуск: не тягнемо всю історію, лише останні N годин
+            hours = int(cfg.get_param('pipedrive.sync.initial_hours', 24))
+            since = fields.Datetime.to_string(fields.Datetime.now() - timedelta(hours=hours))
+
+        cursor = since
+        total = 0
+        for page in client.iter_pages('recents', {'since_timestamp': since, 'items': entity}):
+            vals_list = []
+            for item in page.get('data') or []:
+                current = item.get('data')
+                if item.get('item') != entity or not isinstance(current, dict) or not current.get('id'):
+                    continue
+                vals_list.append(self._prepare_event_vals({
+                    'meta':    {'object': entity, 'action': 'updated', 'id': current['id']},
+                    'current': current,
+                }, source='sync'))
+                cursor = max(cursor, current.get('update_time') or cursor)
+            last = (page.get('additional_data') or {}).get('last_timestamp_on_page')
+            cursor = max(cursor, last or cursor)
+
+            self.create(vals_list)
+            total += len(vals_list)
+            # since_timestamp включний — межовий об'єкт прийде ще раз і буде no-op
+            cfg.set_param(param, cursor)
+            if auto_commit:
+                self.env.cr.commit()
+        return total
+
+    # ── Кнопки ───────────────────────────────────────────────────────────── #
+
+    def action_retry(self):
+        self.write({
+            'state':           'pending',
+            'attempts':        0,
+            'next_attempt_at': False,
+            'last_error':      False,
+        })
+        self._trigger_queue({event._shard() for event in self}, delay=False)
+
+    @api.model
+    def action_sync_delta(self):
+        try:
+            self._sync_delta()
+        except PipedriveApiError as e:
+            raise UserError(str(e))
+        return {'type': 'ir.actions.client', 'tag': 'reload'}
+
+    def action_process_now(self):
+        for event in self.filtered(lambda e: e.state == 'pending'):
+            event._process()
@@ -0,0 +1,191 @@
+import logging
+
+from odoo import api, fields, models, tools
+from odoo.exceptions import UserError
+from odoo.tools.sql import create_unique_index
+
+from ..controllers.pipedrive_webhook import (
+    PipedriveWebhook,
+    CREDIT_SPECIALIST_OPTION_MAP,
+    FINANCING_MAP,
+    FINANCING_OPTION_MAP,
+    LABEL_OPTION_MAP,
+    PROJECT_TYPE_MAP,
+)
+from ..tools.pipedrive_client import PipedriveClient, PipedriveApiError
+
+_logger = logging.getLogger(__name__)
+
+MAPPING_KINDS = [
+    ('stage',    'Стадія'),
+    ('pipeline', 'Воронка'),
+    ('user',     'Користувач'),
+    ('option',   'Опція поля'),
+]
+
+# Поля, від яких залежить результат _lookup(). Зміна інших (name) кеш не скидає:
+# registry.clear_cache() очищає весь ormcache всіх воркерів, не лише _lookup
+LOOKUP_FIELDS = {'kind', 'pd_id', 'field_key', 'stage_id', 'team_id', 'user_id', 'value'}
+
+
+class RaytonPipedriveMapping(models.Model):
+    """Відповідність числових ID Pipedrive → записи Odoo.
+
+    Заповнюється командою action_sync_metadata() з /stages, /pipelines,
+    /users і /dealFields. Вебхук резолвить ID через _lookup() — один
+    пошук по унікальному індексу (kind, field_key, pd_id), далі з ormcache.
+    """
+    _name = 'rayton.pipedrive.mapping'
+    _description = 'Маппінг Pipedrive ID'
+    _order = 'kind, field_key, pd_id'
+
+    kind = fields.Selection(MAPPING_KINDS, string='Тип', required=True)
+    pd_id = fields.Integer('Pipedrive ID', required=True)
+    field_key = fields.Char('Ключ поля', help='Для опцій: ключ custom field у Pipedrive')
+    name = fields.Char('Назва в Pipedrive')
+
+    stage_id = fields.Many2one('crm.stage', 'Стадія', ondelete='set null')
+    team_id = fields.Many2one('crm.team', 'Команда', ondelete='set null')
+    user_id = fields.Many2one('res.users', 'Користувач', ondelete='set null')
+    value = fields.Char('Значення', help='Для опцій: ключ selection в Odoo (напр. ses, credit)')
+
+    def init(self):
+        create_unique_index(
+            self._cr, 'rayton_pipedrive_mapping_key_uniq', self._table,
+            ['kind', "COALESCE(field_key, '')", 'pd_id'],
+        )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._clear_lookup_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if LOOKUP_FIELDS.intersection(vals):
+            self._clear_lookup_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self._clear_lookup_cache()
+        return res
+
+    @api.model
+    def _clear_lookup_cache(self):
+        # action_sync_metadata створює/оновлює десятки рядків — кеш скидається
+        # один раз у кінці синхронізації, а не на кожен рядок
+        if not self.env.context.get('pipedrive_mapping_defer_cache'):
+            self.env.registry.clear_cache()
+
+    # ── Резолвінг ────────────────────────────────────────────────────────── #
+
+    @api.model
+    @tools.ormcache('kind', 'pd_id', 'field_key')
+    def _lookup(self, kind, pd_id, field_key=''):
+        """(target_id, value) для Pipedrive ID або None, якщо відповідності немає.
+
+        target_id — id crm.stage / crm.team / res.users залежно від kind;
+        для опцій — id користувача (кредитного спеціаліста), якщо є.
+        """
+        self.env.cr.execute("""
+            SELECT stage_id, team_id, user_id, value
+            FROM rayton_pipedrive_mapping
+            WHERE kind = %s AND COALESCE(field_key, '') = %s AND pd_id = %s
+        """, [kind, field_key or '', pd_id])
+        row = self.env.cr.fetchone()
+        if not row:
+            return None
+        stage_id, team_id, user_id, value = row
+        target = {'stage': stage_id, 'pipeline': team_id}.get(kind, user_id)
+        return target or False, value or False
+
+    # ── Синхронізація ────────────────────────────────────────────────────── #
+
+    @api.model
+    def _cron_sync_metadata(self):
+        try:
+            self.action_sync_metadata()
+        except PipedriveApiError as e:
+            _logger.warning('Pipedrive metadata sync: %s', e)
+
+    @api.model
+    def action_sync_metadata(self):
+        """Заповнити маппінг з ендпоінтів метаданих Pipedrive.
+
+        Вже задані відповідності не перезаписуються — ручні правки
+        адміністратора переживають наступну синхронізацію; автоматично
+        зіставляються лише порожні.
+        """
+        try:
+            client = PipedriveClient.from_env(self.env)
+        except PipedriveApiError as e:
+            raise UserError(str(e))
+        webhook = PipedriveWebhook()
+        env = self.env
+        self = self.with_context(pipedrive_mapping_defer_cache=True)
+
+        existing = {(m.kind, m.field_key or '', m.pd_id): m for m in self.search([])}
+        counts = {'created': 0, 'updated': 0, 'targets': 0}
+
+        def upsert(kind, pd_id, name, field_key='', **targets):
+            rec = existing.get((kind, field_key, pd_id))
+            if not rec:
+                vals = {'kind': kind, 'pd_id': pd_id, 'name': name, 'field_key': field_key or False}
+                vals.update({k: v for k, v in targets.items() if v})
+                existing[(kind, field_key, pd_id)] = self.create(vals)
+                counts['created'] += 1
+                return
+            vals = {} if rec.name == name else {'name': name}
+            vals.update({k: v for k, v in targets.items() if v and not rec[k]})
+            if vals:
+                rec.write(vals)
+                counts['updated'] += 1
+                counts['targets'] += bool(LOOKUP_FIELDS.intersection(vals))
+
+        for st in client.iter_all('stages'):
+            stage = (
+                env['crm.stage'].search([('name', '=', st['name'])], limit=1)
+                or webhook._get_or_find_stage(env, st['name'])
+            )
+            upsert('stage', st['id'], '%s / %s' % (st.get('pipeline_name') or '', st['name']),
+                   stage_id=stage.id if stage else False)
+
+        for pl in client.iter_all('pipelines'):
+            team = webhook._get_team(env, pl['name'])
+            upsert('pipeline', pl['id'], pl['name'], team_id=team.id if team else False)
+
+        for usr in client.iter_all('users'):
+            uid = webhook._find_user(env, usr.get('name'))
+            if not uid and usr.get('email'):
+                uid = env['res.users'].search([('login', '=ilike', usr['email'])], limit=1).id
+            upsert('user', usr['id'], usr.get('name'), user_id=uid)
+
+        cfg = env['ir.config_parameter'].sudo()
+        label_key = cfg.get_param('pipedrive.field.label', 'label')
+        financing_key = cfg.get_param('pipedrive.field.financing_type', '')
+        credit_key = cfg.get_param('pipedrive.field.credit_specialist', '')
+        for fld in client.iter_all('dealFields'):
+            key = fld.get('key')
+            if key not in (label_key, financing_key, credit_key) or not key:
+                continue
+            for opt in fld.get('options') or []:
+                label = str(opt.get('label') or '')
+                if key == label_key:
+                    upsert('option', opt['id'], label, field_key=key,
+                           value=PROJECT_TYPE_MAP.get(label) or LABEL_OPTION_MAP.get(opt['id']))
+                elif key == financing_key:
+                    upsert('option', opt['id'], label, field_key=key,
+                           value=FINANCING_MAP.get(label) or FINANCING_OPTION_MAP.get(opt['id']))
+                else:
+                    uid = webhook._find_credit_specialist(env, label)
+                    surname = CREDIT_SPECIALIST_OPTION_MAP.get(opt['id'])
+                    if not uid and surname:
+                        uid = env['res.users'].search([('name', 'ilike', surname)], limit=1).id
+                    upsert('option', opt['id'], label, field_key=key, user_id=uid)
+
+        if counts['created'] or counts['targets']:
+            self.env.registry.clear_cache()
+        _logger.info('Pipedrive metadata sync: створено %(created)d, оновлено %(updated)d', counts)
+        return {'type': 'ir.actions.client', 'tag': 'reload'}
@@ -1,13 +1,27 @@
 import logging
-from datetime import datetime
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
-from odoo import api, fields, models, _
+from markupsafe import Markup, escape
+
+from odoo import api, fields, models, tools, _
+
+from ..tools.pg_index import ensure_index_concurrently
+from ..tools.phone import phone_suffix
+from ..tools.recording_download import CHUNK_SIZE, RecordingGone, download
+from .rayton_ringostat_call_daily import ROLLUP_FIELDS
 
 _logger = logging.getLogger(__name__)
 
 # Статуси що вважаються успішними (є розмова)
 ANSWERED_STATUSES = {'ANSWERED', 'PROPER'}
 
+# Простір імен advisory lock на номер телефону (другий ключ — суфікс 9 цифр)
+PHONE_LOCK = 'rayton.ringostat.phone'
+
 # Текстові підписи статусів Ringostat
 STATUS_LABELS = {
     'ANSWERED':  'Відповіли',
@@ -42,38 +56,134 @@ class RaytonRingostatCall(models.Model):
 
     user_id = fields.Many2one(
         'res.users', 'Користувач Odoo', index=True,
-        help='Автоматично зіставлено з employee по прізвищу',
+        help='Зіставлено з employee через таблицю "Співробітники Ringostat"',
     )
     lead_id = fields.Many2one(
         'crm.lead', 'Нагода / Лід CRM',
         help='Перший знайдений або щойно створений лід',
     )
+    idempotency_key = fields.Char(
+        'Ключ webhook', readonly=True, copy=False,
+        help='Ключ події rayton.ringostat.event — повторна доставка дзвінка нічого не створює',
+    )
+    chatter_message_ids = fields.Many2many(
+        'mail.message', 'rayton_ringostat_call_message_rel', 'call_id', 'message_id',
+        string='Повідомлення в чаттері', readonly=True, copy=False,
+        help='Повідомлення про дзвінок — після архівації в них підміняється посилання на запис',
+    )
+
+    # ── Архів запису (локальна копія в ir.attachment) ── #
+    recording_state = fields.Selection([
+        ('none',    'Немає запису'),
+        ('pending', 'Очікує'),
+        ('done',    'В архіві'),
+        ('missing', 'Недоступний'),
+        ('error',   'Помилка'),
+        ('expired', 'Видалено (термін)'),
+    ], string='Архів запису', default='none', required=True, index=True, readonly=True, copy=False)
+    recording_attachment_id = fields.Many2one(
+        'ir.attachment', 'Запис (локальна копія)', readonly=True, copy=False, ondelete='set null',
+    )
+    recording_attempts = fields.Integer('Спроб завантаження', readonly=True, copy=False)
+    recording_next_attempt_at = fields.Datetime('Наступна спроба', readonly=True, copy=False)
+    recording_error = fields.Char('Помилка завантаження', readonly=True, copy=False)
+
+    def init(self):
+        self._cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS rayton_ringostat_call_idempotency_key_uniq
+            ON rayton_ringostat_call (idempotency_key)
+            WHERE idempotency_key IS NOT NULL
+        """)
+        # Дзвінки користувача за період, новіші першими (списки, перепризначення)
+        ensure_index_concurrently(
+            self._cr, 'rayton_ringostat_call_user_date_idx', 'rayton_ringostat_call',
+            '(user_id, call_date DESC)',
+        )
+
+    # ── Денне зведення ───────────────────────────────────────────────────── #
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if 'recording_state' not in vals and (vals.get('recording_url') or vals.get('recording_wav')):
+                vals['recording_state'] = 'pending'
+        records = super().create(vals_list)
+        self.env['rayton.ringostat.call.daily'].sudo()._apply_calls(records.ids)
+        if any(rec.recording_state == 'pending' for rec in records):
+            cron = self.env.ref('rayton_crm.ir_cron_ringostat_recordings', raise_if_not_found=False)
+            if cron:
+                cron._trigger()
+        return records
+
+    def write(self, vals):
+        if not ROLLUP_FIELDS.intersection(vals):
+            return super().write(vals)
+        Daily = self.env['rayton.ringostat.call.daily'].sudo()
+        Daily._apply_calls(self.ids, sign=-1)
+        res = super().write(vals)
+        Daily._apply_calls(self.ids)
+        return res
+
+    def unlink(self):
+        self.env['rayton.ringostat.call.daily'].sudo()._apply_calls(self.ids, sign=-1)
+        return super().unlink()
 
     # ── Пошук ────────────────────────────────────────────────────────────── #
 
     @api.model
     def _match_user(self, employee_name):
-        """Match Ringostat employee name → res.users by last name."""
-        if not employee_name:
-            return self.env['res.users']
-        last_name = employee_name.strip().split()[0]
-        return self.env['res.users'].search([
-            ('partner_id.name', 'ilike', last_name),
+        """Match Ringostat employee name → res.users via rayton.ringostat.employee."""
+        return self.env['rayton.ringostat.employee'].sudo()._resolve_user(employee_name)
+
+    @api.model
+    def _external_phone(self, payload):
+        """Return (call_type, external party phone) of a webhook payload."""
+        call_type_raw = payload.get('call_type', '')
+        call_type = call_type_raw if call_type_raw in ('transitin', 'transitout') else 'transitin'
+        ext_phone = (
+            payload.get('caller_number', '')
+            if call_type == 'transitin'
+            else payload.get('call_destination', '')
+        )
+        return call_type, ext_phone
+
+    @api.model
+    def _phone_lock_key(self, phone_number):
+        """Advisory lock key for a number: (namespace, last 9 digits) or None."""
+        suffix = phone_suffix(phone_number)
+        return (PHONE_LOCK, int(suffix)) if suffix else None
+
+    @api.model
+    def _find_recent_auto_lead(self, phone_number):
+        """Open lead auto-created for this number within ringostat.lead_reuse_hours."""
+        suffix = phone_suffix(phone_number)
+        if not suffix:
+            return self.env['crm.lead']
+        cfg = self.env['ir.config_parameter'].sudo()
+        hours = float(cfg.get_param('ringostat.lead_reuse_hours', 24))
+        return self.env['crm.lead'].sudo().search([
+            ('ringostat_phone_suffix', '=', suffix),
             ('active', '=', True),
-            ('share', '=', False),
-        ], limit=1)
+            ('stage_id.is_won', '=', False),
+            ('create_date', '>=', fields.Datetime.now() - timedelta(hours=hours)),
+        ], order='create_date desc', limit=1)
 
     @api.model
     def _find_partners_by_phone(self, phone_number):
-        """Return all res.partner records matching the given phone (last 9 digits)."""
-        if not phone_number:
-            return self.env['res.partner']
-        digits = ''.join(c for c in phone_number if c.isdigit())
-        if len(digits) < 7:
+        """Return all res.partner records matching the given phone (last 9 digits).
+
+        Short numbers (7-8 digits, e.g. local numbers without the operator
+        code) cannot equal a 9-digit suffix; they keep the substring match
+        on the stored phone instead of falling through to a new lead.
+        """
+        suffix = phone_suffix(phone_number)
+        if not suffix:
             return self.env['res.partner']
-        suffix = digits[-9:]
-        phone_recs = self.env['res.partner.phone'].search([('phone', 'like', suffix)])
-        return phone_recs.mapped('partner_id')
+        if len(suffix) < 9:
+            domain = [('phone', 'like', suffix)]
+        else:
+            domain = [('phone_suffix9', '=', suffix)]
+        return self.env['res.partner.phone'].search(domain).mapped('partner_id')
 
     @api.model
     def _find_leads_for_partners(self, partners):
@@ -113,13 +223,24 @@ class RaytonRingostatCall(models.Model):
         return body
 
     @api.model
-    def _get_activity_type(self, call_type):
+    @tools.ormcache('call_type')
+    def _get_activity_type_id(self, call_type):
+        """Return the id of the call activity type (cached per registry)."""
         at_name = 'Вхідний дзвінок' if call_type == 'transitin' else 'Вихідний дзвінок'
-        return self.env['mail.activity.type'].search([('name', '=', at_name)], limit=1)
+        return self.env['mail.activity.type'].sudo().search([('name', '=', at_name)], limit=1).id
+
+    @api.model
+    @tools.ormcache()
+    def _get_chatter_ids(self):
+        """Return (note subtype id, OdooBot partner id) — cached per registry."""
+        return (
+            self.env['ir.model.data']._xmlid_to_res_id('mail.mt_note'),
+            self.env['ir.model.data']._xmlid_to_res_id('base.partner_root'),
+        )
 
     @api.model
     def _make_message_vals(self, model, res_id, body, author_id,
-                           activity_type, call_date, subtype_id):
+                           activity_type_id, call_date, subtype_id):
         return {
             'model':                 model,
             'res_id':                res_id,
@@ -127,7 +248,7 @@ class RaytonRingostatCall(models.Model):
             'subtype_id':            subtype_id,
             'author_id':             author_id,
             'body':                  body,
-            'mail_activity_type_id': activity_type.id if activity_type else False,
+            'mail_activity_type_id': activity_type_id or False,
             'date':                  call_date,
         }
 
@@ -137,45 +258,34 @@ class RaytonRingostatCall(models.Model):
         """Post a call message to all relevant partner and lead chatters.
 
         Mirrors Pipedrive behavior: the call appears in the contact card,
-        the company card, and every linked open opportunity.
+        the company card, and every linked open opportunity. All messages
+        are created with a single multi-create.
         """
         body = self._build_call_body(call_type, call_status, ext_phone, duration, recording_url)
-        at = self._get_activity_type(call_type)
-        author_id = (
-            user.partner_id.id if user
-            else self.env.ref('base.partner_root').id
-        )
-        subtype_id = self.env.ref('mail.mt_note').id
-        Msg = self.env['mail.message']
-
-        # Post to each contact + their company (deduplicated)
-        posted_partner_ids = set()
-        for partner in partners:
-            targets = [partner]
-            if partner.parent_id:
-                targets.append(partner.parent_id)
-            for p in targets:
-                if p.id in posted_partner_ids:
-                    continue
-                posted_partner_ids.add(p.id)
-                Msg.create(self._make_message_vals(
-                    'res.partner', p.id, body, author_id, at, call_date, subtype_id,
-                ))
-
-        # Post to each open opportunity (deduplicated)
-        posted_lead_ids = set()
-        for lead in leads:
-            if lead.id in posted_lead_ids:
-                continue
-            posted_lead_ids.add(lead.id)
-            Msg.create(self._make_message_vals(
-                'crm.lead', lead.id, body, author_id, at, call_date, subtype_id,
-            ))
+        at_id = self._get_activity_type_id(call_type)
+        subtype_id, root_partner_id = self._get_chatter_ids()
+        author_id = user.partner_id.id if user else root_partner_id
+
+        # Контакти + їхні компанії і відкриті нагоди, без дублів
+        partner_ids = list(dict.fromkeys(
+            partners.ids + partners.mapped('parent_id').ids
+        ))
+        lead_ids = list(dict.fromkeys(leads.ids))
+
+        vals_list = [
+            self._make_message_vals('res.partner', pid, body, author_id, at_id, call_date, subtype_id)
+            for pid in partner_ids
+        ] + [
+            self._make_message_vals('crm.lead', lid, body, author_id, at_id, call_date, subtype_id)
+            for lid in lead_ids
+        ]
+        messages = self.env['mail.message'].create(vals_list)
 
         _logger.info(
             'Ringostat: posted call to %d partner(s) and %d lead(s)',
-            len(posted_partner_ids), len(posted_lead_ids),
+            len(partner_ids), len(lead_ids),
         )
+        return messages
 
     # ── Новий лід для невідомого номера ──────────────────────────────────── #
 
@@ -186,7 +296,7 @@ class RaytonRingostatCall(models.Model):
 
         Creates a minimal res.partner with the phone number and a crm.lead
         (type='lead') assigned to the employee who handled the call, so the
-        operator can qualify or discard it.
+        operator can qualify or discard it. Returns (lead, chatter message).
         """
         # Мінімальний контакт — номер телефону як ім'я (оператор уточнить пізніше)
         partner = self.env['res.partner'].sudo().create({
@@ -213,6 +323,7 @@ class RaytonRingostatCall(models.Model):
         lead = self.env['crm.lead'].sudo().create({
             'name': f'{type_label} {ext_phone}',
             'partner_id': partner.id,
+            'ringostat_phone_suffix': phone_suffix(ext_phone),
             'type': 'opportunity',
             'user_id': user.id if user else False,
             'team_id': kc_team.id if kc_team else False,
@@ -223,43 +334,73 @@ class RaytonRingostatCall(models.Model):
         body = self._build_call_body(call_type, call_status, ext_phone, duration, recording_url)
         body += '<p><em>⚠️ Невідомий номер — потребує кваліфікації</em></p>'
 
-        at = self._get_activity_type(call_type)
-        author_id = (
-            user.partner_id.id if user
-            else self.env.ref('base.partner_root').id
-        )
-        self.env['mail.message'].create(self._make_message_vals(
-            'crm.lead', lead.id, body, author_id, at, call_date,
-            self.env.ref('mail.mt_note').id,
+        subtype_id, root_partner_id = self._get_chatter_ids()
+        author_id = user.partner_id.id if user else root_partner_id
+        message = self.env['mail.message'].create(self._make_message_vals(
+            'crm.lead', lead.id, body, author_id, self._get_activity_type_id(call_type),
+            call_date, subtype_id,
         ))
 
         _logger.info(
             'Ringostat: created new lead id=%s for unknown phone %s, assigned to %s',
             lead.id, ext_phone, user.name if user else '—',
         )
-        return lead
+        return lead, message
 
     # ── Основний метод ───────────────────────────────────────────────────── #
 
     @api.model
-    def create_from_webhook(self, payload):
+    def create_from_webhook(self, payload, idempotency_key=None):
         """Create a call record from a Ringostat webhook payload.
 
         Flow:
-        1. Skip internal (employee-to-employee) calls.
-        2. If external phone is known → post to partner/company/lead chatters.
+        0. Lock the external number (advisory lock). Unless the caller already
+           holds it (context ringostat_phone_locked), the call is handled in a
+           fresh transaction whose first statement takes the lock, and the
+           result is committed there.
+        1. If a call with this idempotency_key exists → return it (replay).
+           Skip internal (employee-to-employee) calls.
+        2. If external phone is known, or an open lead was auto-created for it
+           within ringostat.lead_reuse_hours → post to partner/company/lead chatters.
         3. If external phone is UNKNOWN → create new contact + unprocessed lead
            assigned to the employee who handled the call.
-        """
-        call_type_raw = payload.get('call_type', '')
-        call_type = call_type_raw if call_type_raw in ('transitin', 'transitout') else 'transitin'
 
-        # External party phone
-        ext_phone = (
-            payload.get('caller_number', '')
-            if call_type == 'transitin'
-            else payload.get('call_destination', '')
-        )
+        Without ringostat_phone_locked the call is committed by its own
+        transaction, not the caller's: a later rollback of the caller does not
+        undo it, and a caller whose snapshot predates that commit (REPEATABLE
+        READ, after its first query) cannot read the returned record. Callers
+        that need the call inside their own transaction take the lock as their
+        first statement and pass the context flag, as the queue cron does.
+        """
+        call_type, ext_phone = self._external_phone(payload)
+
+        # Серія дзвінків з одного номера (передзвони, вхідний + наш callback)
+        # обробляється по черзі: інакше кожен створив би свій контакт і лід.
+        # Знімок бази фіксується першим запитом транзакції (REPEATABLE READ),
+        # тож lock має бути саме першим запитом — інакше контакт, закомічений
+        # попереднім дзвінком, залишиться невидимим і після очікування lock
+        lock = self._phone_lock_key(ext_phone)
+        if lock and not self.env.context.get('ringostat_phone_locked'):
+            with self.env.registry.cursor() as cr:
+                cr.execute("SELECT pg_advisory_xact_lock(hashtext(%s), %s)", lock)
+                call = self.with_env(self.env(cr=cr)).with_context(
+                    ringostat_phone_locked=True,
+                ).create_from_webhook(payload, idempotency_key=idempotency_key)
+                call_id = call.id if call else None
+            return self.browse(call_id) if call_id else None
+
+        if idempotency_key:
+            existing = self.search([('idempotency_key', '=', idempotency_key)], limit=1)
+            if existing:
+                _logger.info('Ringostat call %s вже збережено (id=%s), повтор пропущено',
+                             idempotency_key, existing.id)
+                return existing
+            archived = self.env['rayton.ringostat.call.archive'].sudo().search(
+                [('idempotency_key', '=', idempotency_key)], limit=1)
+            if archived:
+                _logger.info('Ringostat call %s вже в архіві (id=%s), повтор пропущено',
+                             idempotency_key, archived.id)
+                return None
 
         # Skip internal employee calls
         if self.env['rayton.ringostat.excluded.phone'].is_internal(ext_phone):
@@ -287,23 +428,25 @@ class RaytonRingostatCall(models.Model):
         employee_name = payload.get('employee', '')
 
         user = self._match_user(employee_name)
+
         partners = self._find_partners_by_phone(ext_phone)
+        auto_lead = self._find_recent_auto_lead(ext_phone)
 
-        if partners:
-            # ── Відомий номер: публікуємо в чаттері ──
-            leads = self._find_leads_for_partners(partners)
+        if partners or auto_lead:
+            # ── Відомий номер (або свіжий автолід на нього): публікуємо в чаттері ──
+            partners = partners or auto_lead.partner_id
+            leads = auto_lead | self._find_leads_for_partners(partners)
             first_lead = leads[:1]
-            self._post_to_chatter(
+            messages = self._post_to_chatter(
                 call_type, call_status, ext_phone, duration, recording_url,
                 call_date, user, partners, leads,
             )
         else:
             # ── Невідомий номер: створюємо контакт + неопрацьований лід ──
-            new_lead = self._create_lead_for_unknown_phone(
+            first_lead, messages = self._create_lead_for_unknown_phone(
                 call_type, call_status, ext_phone, duration,
                 recording_url, call_date, user,
             )
-            first_lead = new_lead
 
         # Зберігаємо сирий запис дзвінка
         vals = {
@@ -321,6 +464,8 @@ class RaytonRingostatCall(models.Model):
             'recording_wav':    payload.get('recording_wav', '') or '',
             'user_id':          user.id if user else False,
             'lead_id':          first_lead.id if first_lead else False,
+            'idempotency_key':  idempotency_key,
+            'chatter_message_ids': [(6, 0, messages.ids)],
         }
         record = self.create(vals)
         _logger.info(
@@ -331,3 +476,220 @@ class RaytonRingostatCall(models.Model):
             bool(partners), first_lead.id if first_lead else '—',
         )
         return record
+
+    # ── Архівація записів ────────────────────────────────────────────────── #
+
+    @api.model
+    def _cron_archive_recordings(self):
+        self._archive_pending_recordings(auto_commit=True)
+        self._gc_recordings()
+
+    @api.model
+    def _archive_pending_recordings(self, limit=None, auto_commit=False):
+        """Download one batch of due recordings into ir.attachment.
+
+        Downloads run in a pool of ringostat.recording.concurrency threads
+        (plain HTTP into *.part files, no database access); storing and
+        relinking the chatter happens afterwards in this thread, one call
+        per savepoint. Returns the number of calls handled.
+        """
+        cfg = self.env['ir.config_parameter'].sudo()
+        limit = limit or int(cfg.get_param('ringostat.recording.batch_size', 20))
+        workers = max(1, int(cfg.get_param('ringostat.recording.concurrency', 4)))
+        timeout = int(cfg.get_param('ringostat.recording.timeout', 60))
+        max_bytes = int(cfg.get_param('ringostat.recording.max_mb', 50)) * 1024 * 1024
+        now = fields.Datetime.now()
+        self.env.cr.execute("""
+            SELECT id FROM rayton_ringostat_call
+            WHERE recording_state = 'pending' AND COALESCE(recording_next_attempt_at, %s) <= %s
+            ORDER BY call_date DESC
+            LIMIT %s
+        """, [now, now, limit])
+        calls = self.browse([r[0] for r in self.env.cr.fetchall()])
+        if not calls:
+            return 0
+
+        jobs = {call: (call.recording_url or call.recording_wav, call._recording_part_path())
+                for call in calls}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {call: pool.submit(download, url, part, timeout, max_bytes)
+                       for call, (url, part) in jobs.items()}
+
+        for call, future in futures.items():
+            error = future.exception()
+            try:
+                with self.env.cr.savepoint():
+                    if error:
+                        call._recording_failed(error)
+                    else:
+                        call._store_recording(*future.result())
+            except Exception as e:
+                call._recording_failed(e)
+            if auto_commit:
+                self.env.cr.commit()
+
+        _logger.info('Ringostat: архівація записів — %d дзвінків, %d з помилкою',
+                     len(calls), sum(1 for f in futures.values() if f.exception()))
+        if len(calls) == limit:
+            self.env.ref('rayton_crm.ir_cron_ringostat_recordings')._trigger()
+        return len(calls)
+
+    def _recording_part_path(self):
+        """Stable path of the partial download, so a retry resumes it."""
+        self.ensure_one()
+        folder = os.path.join(tempfile.gettempdir(), 'rayton_recordings')
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, '%s-%d.part' % (self.env.cr.dbname, self.id))
+
+    def _store_recording(self, checksum, size, mimetype):
+        """Attach the downloaded file (dedup by checksum) and relink the chatter."""
+        self.ensure_one()
+        part_path = self._recording_part_path()
+        Attachment = self.env['ir.attachment'].sudo()
+        attachment = Attachment.search([
+            ('res_model', '=', self._name), ('checksum', '=', checksum),
+        ], limit=1)
+        if not attachment:
+            url = self.recording_url or self.recording_wav
+            ext = os.path.splitext(url.split('?')[0])[1] or '.ogg'
+            vals = {
+                'name':      'ringostat_%s_%d%s' % (self.call_date.strftime('%Y%m%d_%H%M%S'), self.id, ext),
+                'type':      'binary',
+                'res_model': self._name,
+                'res_id':    self.id,
+                'mimetype':  mimetype or ('audio/wav' if ext == '.wav' else 'audio/ogg'),
+            }
+            if Attachment._storage() == 'file':
+                # Файл копіюється у filestore частинами — у пам'яті не буває
+                # більше одного буфера, хоч би скільки записів качалось разом
+                vals.update({
+                    'store_fname': self._copy_to_filestore(part_path, checksum),
+                    'checksum':    checksum,
+                    'file_size':   size,
+                })
+            else:
+                # Вкладення в базі (ir_attachment.location=db) пишуться
+                # лише цілим значенням
+                with open(part_path, 'rb') as f:
+                    vals['raw'] = f.read()
+            attachment = Attachment.create(vals)
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+        self.write({
+            'recording_state':           'done',
+            'recording_attachment_id':   attachment.id,
+            'recording_next_attempt_at': False,
+            'recording_error':           False,
+        })
+        self._relink_chatter(attachment)
+
+    @api.model
+    def _copy_to_filestore(self, path, checksum):
+        """Copy a file into the filestore under its sha1 and return store_fname.
+
+        Same layout as ir.attachment._get_path; the file is first written next
+        to the target and renamed, so a crash never leaves a truncated blob.
+        """
+        Attachment = self.env['ir.attachment']
+        fname = '%s/%s' % (checksum[:2], checksum)
+        full_path = Attachment._full_path(fname)
+        if not os.path.exists(full_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            tmp_path = '%s.%d.tmp' % (full_path, os.getpid())
+            with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            os.replace(tmp_path, full_path)
+        # Як і _file_write: якщо транзакція відкотиться, файл прибере GC
+        Attachment._mark_for_gc(fname)
+        return fname
+
+    def _relink_chatter(self, attachment):
+        """Point the call's chatter messages at the local copy of the recording.
+
+        Calls created before chatter_message_ids existed (e.g. queued by the
+        17.0.1.6.0 migration) have no links; their messages are found among
+        the partner/lead call posts of the same date that quote the remote URL.
+        """
+        self.ensure_one()
+        token = attachment.access_token or attachment.generate_access_token()[0]
+        local_url = '/web/content/%d?access_token=%s' % (attachment.id, token)
+        remote = [u for u in (self.recording_url, self.recording_wav) if u]
+        messages = self.chatter_message_ids.sudo()
+        if not messages and remote:
+            messages = self.env['mail.message'].sudo().search([
+                ('model', 'in', ('res.partner', 'crm.lead')),
+                ('date', '=', self.call_date),
+                ('body', 'ilike', str(escape(remote[0]))),
+            ])
+        for message in messages:
+            body = str(message.body or '')
+            new_body = body
+            for url in remote:
+                new_body = new_body.replace(str(escape(url)), str(escape(local_url)))
+                new_body = new_body.replace(url, str(escape(local_url)))
+            if new_body != body:
+                message.write({'body': Markup(new_body)})
+
+    def _recording_failed(self, error):
+        self.ensure_one()
+        cfg = self.env['ir.config_parameter'].sudo()
+        max_attempts = int(cfg.get_param('ringostat.recording.max_attempts', 6))
+        attempts = self.recording_attempts + 1
+        vals = {'recording_attempts': attempts, 'recording_error': str(error)[:250]}
+        if isinstance(error, RecordingGone) or attempts >= max_attempts:
+            vals['recording_state'] = 'missing' if isinstance(error, RecordingGone) else 'error'
+            part_path = self._recording_part_path()
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        else:
+            # Експоненційна пауза: 2, 4, 8, 16, 32 хв; недокачана частина лишається
+            vals['recording_next_attempt_at'] = fields.Datetime.now() + timedelta(minutes=2 ** attempts)
+        _logger.warning('Ringostat: запис дзвінка %s, спроба %d/%d: %s',
+                        self.id, attempts, max_attempts, error)
+        self.write(vals)
+
+    @api.model
+    def _gc_recordings(self):
+        """Drop local copies older than ringostat.recording.keep_days (0 = keep forever).
+
+        An attachment shared by several calls (same checksum) is deleted only
+        when none of them is still within the retention period. Archived
+        calls (rayton.ringostat.call.archive) are covered too.
+        """
+        cfg = self.env['ir.config_parameter'].sudo()
+        keep_days = int(cfg.get_param('ringostat.recording.keep_days', 365))
+        if not keep_days:
+            return
+        cutoff = fields.Datetime.now() - timedelta(days=keep_days)
+        Archive = self.env['rayton.ringostat.call.archive'].sudo()
+        old = self.search([
+            ('recording_state', '=', 'done'), ('call_date', '<', cutoff),
+        ], limit=1000)
+        old_archived = Archive.search([
+            ('recording_attachment_id', '!=', False), ('call_date', '<', cutoff),
+        ], limit=1000)
+        if not old and not old_archived:
+            return
+        attachments = old.mapped('recording_attachment_id') | old_archived.mapped('recording_attachment_id')
+        still_used = self.search([
+            ('recording_attachment_id', 'in', attachments.ids), ('id', 'not in', old.ids),
+        ]).mapped('recording_attachment_id') | Archive.search([
+            ('recording_attachment_id', 'in', attachments.ids), ('id', 'not in', old_archived.ids),
+        ]).mapped('recording_attachment_id')
+        old.write({'recording_state': 'expired', 'recording_attachment_id': False})
+        old_archived.write({'recording_attachment_id': False})
+        (attachments - still_used).sudo().unlink()
+        _logger.info('Ringostat: видалено %d локальних записів старших за %d днів',
+                     len(attachments - still_used), keep_days)
+
+    # ── Кнопки ───────────────────────────────────────────────────────────── #
+
+    def action_archive_recording(self):
+        self.filtered(lambda c: c.recording_url or c.recording_wav).write({
+            'recording_state':           'pending',
+            'recording_attempts':        0,
+            'recording_next_attempt_at': False,
+            'recording_error':           False,
+        })
+        self.env.ref('rayton_crm.ir_cron_ringostat_recordings')._trigger()
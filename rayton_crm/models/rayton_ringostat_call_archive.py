@@ -0,0 +1,128 @@
+import logging
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# Колонки, що переносяться в архів (id зберігається — вкладення і події лишаються валідними)
+ARCHIVE_COLUMNS = (
+    'id', 'call_type', 'call_date', 'department', 'call_status', 'employee',
+    'internal_number', 'caller_number', 'call_destination', 'call_duration',
+    'user_id', 'lead_id', 'has_recording', 'recording_url', 'recording_wav',
+    'recording_attachment_id', 'idempotency_key',
+)
+
+
+class RaytonRingostatCallArchive(models.Model):
+    """Архів дзвінків Ringostat старших за ringostat.archive.months місяців.
+
+    Щомісячний cron переносить цілі місяці з rayton_ringostat_call пачками
+    (INSERT ... SELECT разом зі зв'язками чаттера, потім DELETE), тож
+    списки, пошук по номеру і вакуум працюють лише з гарячими даними. Денне зведення
+    rayton.ringostat.call.daily не змінюється — КПІ і графіки за старі
+    місяці лишаються як були; самі дзвінки доступні в меню "Архів дзвінків".
+    Дзвінки, чий запис ще завантажується (recording_state = 'pending'),
+    чекають у гарячій таблиці, доки завантаження не завершиться.
+    """
+    _name = 'rayton.ringostat.call.archive'
+    _description = 'Архів дзвінків Ringostat'
+    _order = 'call_date desc'
+    _rec_name = 'employee'
+    _log_access = False
+
+    call_type = fields.Selection([
+        ('transitin',  'Вхідний'),
+        ('transitout', 'Вихідний'),
+    ], string='Тип', readonly=True)
+    call_date        = fields.Datetime('Дата дзвінку', readonly=True)
+    department       = fields.Char('Відділ', readonly=True)
+    call_status      = fields.Char('Статус', readonly=True)
+    employee         = fields.Char('Співробітник (Ringostat)', readonly=True)
+    internal_number  = fields.Char('Внутр. номер', readonly=True)
+    caller_number    = fields.Char('Номер того хто телефонує', readonly=True)
+    call_destination = fields.Char('Номер виклику', readonly=True)
+    call_duration    = fields.Integer('Тривалість, сек', readonly=True)
+    has_recording    = fields.Boolean('Є запис', readonly=True)
+    recording_url    = fields.Char('URL запису (ogg)', readonly=True)
+    recording_wav    = fields.Char('URL запису (wav)', readonly=True)
+    user_id = fields.Many2one('res.users', 'Користувач Odoo', readonly=True, index=True)
+    lead_id = fields.Many2one('crm.lead', 'Нагода / Лід CRM', readonly=True, ondelete='set null')
+    recording_attachment_id = fields.Many2one(
+        'ir.attachment', 'Запис (локальна копія)', readonly=True, ondelete='set null',
+    )
+    idempotency_key = fields.Char('Ключ webhook', readonly=True)
+    chatter_message_ids = fields.Many2many(
+        'mail.message', 'rayton_ringostat_call_archive_message_rel', 'call_id', 'message_id',
+        string='Повідомлення в чаттері', readonly=True,
+    )
+
+    def init(self):
+        # Архів доповнюється по зростанню дати — BRIN у сотні разів менший за btree
+        self._cr.execute("""
+            CREATE INDEX IF NOT EXISTS rayton_ringostat_call_archive_call_date_brin
+            ON rayton_ringostat_call_archive USING brin (call_date)
+        """)
+        self._cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS rayton_ringostat_call_archive_idempotency_key_uniq
+            ON rayton_ringostat_call_archive (idempotency_key)
+            WHERE idempotency_key IS NOT NULL
+        """)
+
+    @api.model
+    def _cron_archive_calls(self):
+        self._archive_calls(auto_commit=True)
+
+    @api.model
+    def _archive_calls(self, months=None, auto_commit=False):
+        """Перенести в архів дзвінки, старші за `months` повних місяців.
+
+        Повертає кількість перенесених дзвінків. months=0 вимикає архівацію.
+        """
+        cfg = self.env['ir.config_parameter'].sudo()
+        if months is None:
+            months = int(cfg.get_param('ringostat.archive.months', 12))
+        if months <= 0:
+            return 0
+        batch = int(cfg.get_param('ringostat.archive.batch_size', 20000))
+        cutoff = date.today().replace(day=1) - relativedelta(months=months)
+        columns = ', '.join(ARCHIVE_COLUMNS)
+
+        self.env['rayton.ringostat.call'].flush_model()
+        cr = self.env.cr
+        total = 0
+        while True:
+            cr.execute("""
+                SELECT id FROM rayton_ringostat_call
+                WHERE call_date < %s AND recording_state != 'pending'
+                ORDER BY call_date
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, [cutoff, batch])
+            ids = [r[0] for r in cr.fetchall()]
+            if ids:
+                # Зв'язки з чаттером копіюються до DELETE: рядки
+                # rayton_ringostat_call_message_rel видаляються каскадно
+                cr.execute("""
+                    INSERT INTO rayton_ringostat_call_archive (%s)
+                    SELECT %s FROM rayton_ringostat_call WHERE id = ANY(%%s)
+                """ % (columns, columns), [ids])
+                cr.execute("""
+                    INSERT INTO rayton_ringostat_call_archive_message_rel (call_id, message_id)
+                    SELECT call_id, message_id FROM rayton_ringostat_call_message_rel
+                    WHERE call_id = ANY(%s)
+                """, [ids])
+                cr.execute("DELETE FROM rayton_ringostat_call WHERE id = ANY(%s)", [ids])
+            moved = len(ids)
+            total += moved
+            if auto_commit:
+                cr.commit()
+            if moved < batch:
+                break
+
+        self.env['rayton.ringostat.call'].invalidate_model()
+        if total:
+            _logger.info('Ringostat: в архів перенесено %d дзвінків до %s', total, cutoff)
+        return total
@@ -0,0 +1,144 @@
+import logging
+
+from odoo import api, fields, models
+
+from ..tools.pg_index import ensure_index_concurrently
+
+_logger = logging.getLogger(__name__)
+
+# Поля дзвінка, зміна яких зсуває його в інший рядок зведення
+ROLLUP_FIELDS = {'user_id', 'call_date', 'call_type', 'call_status', 'call_duration'}
+
+# Ключ рядка зведення (той самий вираз в унікальному індексі і в ON CONFLICT).
+# Дзвінки без статусу (NULL) потрапляють у рядок з call_status = '' разом із
+# порожнім статусом вебхука, тож rs_missed КПІ рахує їх як пропущені
+ROLLUP_KEY = "(COALESCE(user_id, 0)), day, call_type, call_status"
+
+# Гарячі дзвінки + архів (rayton.ringostat.call.archive) — для повної перебудови
+ALL_CALLS = """(
+    SELECT user_id, call_date, call_type, call_status, call_duration FROM rayton_ringostat_call
+    UNION ALL
+    SELECT user_id, call_date, call_type, call_status, call_duration FROM rayton_ringostat_call_archive
+) calls"""
+
+# Агрегація сирих дзвінків у рядки зведення
+ROLLUP_SELECT = """
+    SELECT user_id, call_date::date, call_type, COALESCE(call_status, ''),
+           %(sign)s * count(*), %(sign)s * COALESCE(sum(call_duration), 0),
+           %(sign)s * round(COALESCE(sum(call_duration), 0) / 60.0, 1),
+           %(uid)s, now() AT TIME ZONE 'UTC', %(uid)s, now() AT TIME ZONE 'UTC'
+    FROM {source}
+    WHERE {where}
+    GROUP BY user_id, call_date::date, call_type, COALESCE(call_status, '')
+"""
+
+
+class RaytonRingostatCallDaily(models.Model):
+    """Денне зведення дзвінків Ringostat: (користувач, день, тип, статус).
+
+    Ведеться інкрементально: create/write/unlink дзвінка додає або віднімає
+    його з відповідного рядка одним upsert-ом. КПІ rs_* і графіки читають
+    кілька сотень рядків зведення замість сканування всієї таблиці дзвінків.
+    Якщо дзвінки змінювались повз ORM (скрипти, SQL) — "Перебудувати".
+    """
+    _name = 'rayton.ringostat.call.daily'
+    _description = 'Дзвінки Ringostat — денне зведення'
+    _order = 'day desc, user_id'
+    _rec_name = 'day'
+
+    day = fields.Date('День', required=True, readonly=True, index=True)
+    user_id = fields.Many2one('res.users', 'Користувач Odoo', readonly=True, ondelete='cascade')
+    call_type = fields.Selection([
+        ('transitin',  'Вхідний'),
+        ('transitout', 'Вихідний'),
+    ], string='Тип', required=True, readonly=True)
+    call_status = fields.Char('Статус', required=True, readonly=True, default='')
+    call_count = fields.Integer('Дзвінків', readonly=True, group_operator='sum')
+    total_seconds = fields.Integer('Тривалість, сек', readonly=True, group_operator='sum')
+    total_minutes = fields.Float('Тривалість, хв', digits=(12, 1), readonly=True, group_operator='sum')
+
+    def init(self):
+        self._cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS rayton_ringostat_call_daily_key_uniq
+            ON rayton_ringostat_call_daily (%s)
+        """ % ROLLUP_KEY)
+        # rs_* у КПІ: user_id = ANY(...) AND day за місяць — ключ вище
+        # (COALESCE(user_id, 0), ...) для такого фільтра не підходить
+        ensure_index_concurrently(
+            self._cr, 'rayton_ringostat_call_daily_user_day_idx', 'rayton_ringostat_call_daily',
+            '(user_id, day)',
+        )
+
+    # ── Інкрементальне ведення ───────────────────────────────────────────── #
+
+    @api.model
+    def _apply_calls(self, call_ids, sign=1, table='rayton_ringostat_call'):
+        """Додати (sign=1) або відняти (sign=-1) ці дзвінки у зведенні.
+
+        Читає поточні значення дзвінків, тож віднімати — до зміни, додавати —
+        після. Рядки, в яких не лишилось дзвінків, видаляються. `table` —
+        rayton_ringostat_call_archive для вже заархівованих дзвінків.
+        """
+        if not call_ids:
+            return
+        self.env['rayton.ringostat.call'].flush_model(ROLLUP_FIELDS)
+        cr = self.env.cr
+        cr.execute("""
+            INSERT INTO rayton_ringostat_call_daily
+                (user_id, day, call_type, call_status, call_count, total_seconds, total_minutes,
+                 create_uid, create_date, write_uid, write_date)
+            %s
+            ON CONFLICT (%s) DO UPDATE SET
+                call_count    = rayton_ringostat_call_daily.call_count + EXCLUDED.call_count,
+                total_seconds = rayton_ringostat_call_daily.total_seconds + EXCLUDED.total_seconds,
+                total_minutes = round((rayton_ringostat_call_daily.total_seconds
+                                       + EXCLUDED.total_seconds) / 60.0, 1),
+                write_uid     = EXCLUDED.write_uid,
+                write_date    = EXCLUDED.write_date
+        """ % (ROLLUP_SELECT.format(source=table, where='id = ANY(%(ids)s)'), ROLLUP_KEY),
+            {'ids': list(call_ids), 'sign': sign, 'uid': self.env.uid})
+        if sign < 0:
+            cr.execute("DELETE FROM rayton_ringostat_call_daily WHERE call_count <= 0")
+        self.invalidate_model()
+
+    # ── Перебудова ───────────────────────────────────────────────────────── #
+
+    @api.model
+    def _rebuild(self, date_from=None, date_to=None):
+        """Перерахувати зведення з сирих дзвінків за [date_from, date_to] включно.
+
+        Без дат перебудовується вся таблиця. Архівні дзвінки враховуються —
+        перебудова старого місяця його не втрачає. Таблиця зведення на цей
+        час блокується, щоб upsert-и паралельних дзвінків не вклинились між
+        DELETE і INSERT. Повертає кількість записаних рядків зведення.
+
+        Дзвінки з call_status NULL записуються як '' і в КПІ йдуть у rs_missed.
+        Старий розрахунок із сирих дзвінків (`call_status NOT IN (...)`) NULL
+        пропускав, а '' рахував, тож після переходу на зведення rs_missed
+        більший рівно на кількість дзвінків без статусу.
+        """
+        self.env['rayton.ringostat.call'].flush_model()
+        cr = self.env.cr
+        where, params = ['TRUE'], {'sign': 1, 'uid': self.env.uid}
+        if date_from:
+            where.append('call_date >= %(date_from)s')
+            params['date_from'] = fields.Date.to_date(date_from)
+        if date_to:
+            where.append("call_date < %(date_to)s::date + interval '1 day'")
+            params['date_to'] = fields.Date.to_date(date_to)
+        day_where = ' AND '.join(w.replace('call_date', 'day') for w in where)
+
+        cr.execute("LOCK TABLE rayton_ringostat_call_daily IN EXCLUSIVE MODE")
+        cr.execute("DELETE FROM rayton_ringostat_call_daily WHERE %s" % day_where, params)
+        deleted = cr.rowcount
+        cr.execute("""
+            INSERT INTO rayton_ringostat_call_daily
+                (user_id, day, call_type, call_status, call_count, total_seconds, total_minutes,
+                 create_uid, create_date, write_uid, write_date)
+            %s
+        """ % ROLLUP_SELECT.format(source=ALL_CALLS, where=' AND '.join(where)), params)
+        written = cr.rowcount
+        self.invalidate_model()
+        _logger.info('Ringostat rollup: перебудовано %s — %s, видалено %d, записано %d рядків',
+                     date_from or '…', date_to or '…', deleted, written)
+        return written
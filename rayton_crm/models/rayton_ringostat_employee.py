@@ -0,0 +1,189 @@
+import logging
+
+from odoo import api, fields, models, tools
+
+_logger = logging.getLogger(__name__)
+
+# Та сама нормалізація імені на боці SQL (для rayton_ringostat_call.employee)
+SQL_NAME_KEY = "lower(regexp_replace(btrim(%s), '\\s+', ' ', 'g'))"
+
+
+def _normalize_name(name):
+    """'  Толочко   Сергій ' → 'толочко сергій' — ключ таблиці відповідностей."""
+    return ' '.join((name or '').split()).lower()
+
+
+class RaytonRingostatEmployee(models.Model):
+    """Відповідність "співробітник Ringostat" → користувач Odoo.
+
+    Рядок створюється автоматично при першому дзвінку з новим іменем.
+    Якщо користувача однозначно знайдено (повне ім'я або унікальне
+    прізвище) — стан "Авто", інакше "На перевірці" і адміністратор
+    обирає користувача вручну. Зміна користувача перезаписує user_id
+    у всіх дзвінках цього співробітника, тож КПІ rs_* одразу коректні.
+    Дзвінки резолвлять користувача через _get_user_map() — словник в ormcache.
+    """
+    _name = 'rayton.ringostat.employee'
+    _description = 'Співробітник Ringostat → користувач Odoo'
+    _order = 'state desc, name'
+
+    name = fields.Char('Співробітник (Ringostat)', required=True, readonly=True)
+    name_key = fields.Char('Ключ', required=True, readonly=True)
+    user_id = fields.Many2one(
+        'res.users', 'Користувач Odoo', ondelete='set null',
+        domain=[('share', '=', False)],
+    )
+    state = fields.Selection([
+        ('review', 'На перевірці'),
+        ('auto',   'Авто'),
+        ('manual', 'Вручну'),
+    ], string='Стан', default='review', required=True, index=True)
+    call_count = fields.Integer('Дзвінків', compute='_compute_call_count')
+
+    def init(self):
+        self._cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS rayton_ringostat_employee_name_key_uniq
+            ON rayton_ringostat_employee (name_key)
+        """)
+
+    def _compute_call_count(self):
+        counts = {}
+        if self.ids:
+            self.env.cr.execute("""
+                SELECT e.id, count(c.id)
+                FROM rayton_ringostat_employee e
+                JOIN rayton_ringostat_call c ON %s = e.name_key
+                WHERE e.id = ANY(%%s)
+                GROUP BY e.id
+            """ % (SQL_NAME_KEY % 'c.employee'), [self.ids])
+            counts = dict(self.env.cr.fetchall())
+        for rec in self:
+            rec.call_count = counts.get(rec.id, 0)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            vals.setdefault('name_key', _normalize_name(vals.get('name')))
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        if 'user_id' in vals and 'state' not in vals:
+            vals['state'] = 'manual' if vals['user_id'] else 'review'
+        res = super().write(vals)
+        if 'user_id' in vals:
+            self._apply_to_calls()
+        # registry.clear_cache() скидає весь ormcache всіх воркерів —
+        # лише коли змінилось те, що читає _get_user_map()
+        if {'user_id', 'name_key'}.intersection(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    # ── Резолвінг ────────────────────────────────────────────────────────── #
+
+    @api.model
+    @tools.ormcache()
+    def _get_user_map(self):
+        """{нормалізоване ім'я в Ringostat: id res.users або False}."""
+        self.env.cr.execute("SELECT name_key, user_id FROM rayton_ringostat_employee")
+        return {key: user_id or False for key, user_id in self.env.cr.fetchall()}
+
+    @api.model
+    def _resolve_user(self, employee_name, register=True):
+        """res.users для імені співробітника Ringostat (може бути порожнім).
+
+        Відоме ім'я — пошук у словнику; нове реєструється один раз
+        (авто-зіставлення, якщо однозначне, інакше — на перевірку). З
+        register=False нічого не пишеться: нове ім'я лише зіставляється.
+        """
+        key = _normalize_name(employee_name)
+        if not key:
+            return self.env['res.users']
+        user_map = self._get_user_map()
+        if key not in user_map:
+            user_id = self._register(employee_name, key) if register else self._auto_match(employee_name).id
+        else:
+            user_id = user_map[key]
+        return self.env['res.users'].browse(user_id or ())
+
+    @api.model
+    def _register(self, employee_name, key):
+        user = self._auto_match(employee_name)
+        # ON CONFLICT: два воркери можуть одночасно побачити нове ім'я
+        self.env.cr.execute("""
+            INSERT INTO rayton_ringostat_employee
+                (name, name_key, user_id, state, create_uid, create_date, write_uid, write_date)
+            VALUES (%s, %s, %s, %s, %s, now() AT TIME ZONE 'UTC', %s, now() AT TIME ZONE 'UTC')
+            ON CONFLICT (name_key) DO NOTHING
+        """, [' '.join(employee_name.split()), key, user.id or None,
+              'auto' if user else 'review', self.env.uid, self.env.uid])
+        # rowcount 0 — рядок уже вставив інший воркер, кеш скинув він
+        if self.env.cr.rowcount:
+            self.env.registry.clear_cache()
+        if not user:
+            _logger.warning('Ringostat: співробітника "%s" не зіставлено — додано на перевірку',
+                            employee_name)
+        return user.id
+
+    @api.model
+    def _auto_match(self, employee_name):
+        """Лише однозначний збіг: точне повне ім'я, інакше унікальне прізвище."""
+        Users = self.env['res.users'].sudo().with_context(active_test=True)
+        base = [('share', '=', False)]
+        exact = Users.search(base + [('partner_id.name', '=ilike', ' '.join(employee_name.split()))])
+        if len(exact) == 1:
+            return exact
+        surname = employee_name.strip().split()[0]
+        by_surname = Users.search(base + [('partner_id.name', 'ilike', surname)], limit=2)
+        return by_surname if len(by_surname) == 1 else Users.browse()
+
+    def _apply_to_calls(self):
+        """Переписати user_id у всіх дзвінках цих співробітників (і рядках зведення)."""
+        Daily = self.env['rayton.ringostat.call.daily'].sudo()
+        for rec in self:
+            self.env.cr.execute("""
+                SELECT id FROM rayton_ringostat_call
+                WHERE %s = %%s AND user_id IS DISTINCT FROM %%s
+            """ % (SQL_NAME_KEY % 'employee'), [rec.name_key, rec.user_id.id or None])
+            call_ids = [r[0] for r in self.env.cr.fetchall()]
+            if call_ids:
+                Daily._apply_calls(call_ids, sign=-1)
+                self.env.cr.execute("""
+                    UPDATE rayton_ringostat_call SET user_id = %s WHERE id = ANY(%s)
+                """, [rec.user_id.id or None, call_ids])
+                Daily._apply_calls(call_ids)
+                _logger.info('Ringostat: %s → %s, оновлено %d дзвінків',
+                             rec.name, rec.user_id.name or '—', len(call_ids))
+            self._apply_to_archive(rec)
+        self.env['rayton.ringostat.call'].invalidate_model(['user_id'])
+        self.env['rayton.ringostat.call.archive'].invalidate_model(['user_id'])
+
+    def _apply_to_archive(self, rec):
+        """Те саме для архівних дзвінків — щоб за ними перейшли і рядки зведення."""
+        Daily = self.env['rayton.ringostat.call.daily'].sudo()
+        self.env.cr.execute("""
+            SELECT id FROM rayton_ringostat_call_archive
+            WHERE %s = %%s AND user_id IS DISTINCT FROM %%s
+        """ % (SQL_NAME_KEY % 'employee'), [rec.name_key, rec.user_id.id or None])
+        archived_ids = [r[0] for r in self.env.cr.fetchall()]
+        if not archived_ids:
+            return
+        Daily._apply_calls(archived_ids, sign=-1, table='rayton_ringostat_call_archive')
+        self.env.cr.execute("""
+            UPDATE rayton_ringostat_call_archive SET user_id = %s WHERE id = ANY(%s)
+        """, [rec.user_id.id or None, archived_ids])
+        Daily._apply_calls(archived_ids, table='rayton_ringostat_call_archive')
+
+    # ── Кнопки ───────────────────────────────────────────────────────────── #
+
+    def action_auto_match(self):
+        for rec in self.filtered(lambda r: r.state == 'review'):
+            user = self._auto_match(rec.name)
+            if user:
+                rec.write({'user_id': user.id, 'state': 'auto'})
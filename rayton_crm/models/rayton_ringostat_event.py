@@ -0,0 +1,227 @@
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# Поля payload, з яких складається ключ, якщо Ringostat не передав ID дзвінка
+KEY_FIELDS = ('call_date', 'call_type', 'caller_number', 'call_destination', 'employee')
+# Можливі назви ID дзвінка в payload Ringostat / n8n
+CALL_ID_FIELDS = ('uniqueid', 'call_id', 'uid')
+
+
+class RaytonRingostatEvent(models.Model):
+    """Staging-черга webhook-ів Ringostat.
+
+    Контролер лише зберігає payload з детермінованим ключем ідемпотентності
+    і одразу відповідає 200. Повторна доставка того ж дзвінка (ретраї n8n)
+    впирається в унікальний індекс і нічого не створює. Cron обробляє чергу
+    через rayton.ringostat.call.create_from_webhook з лічильником спроб.
+    """
+    _name = 'rayton.ringostat.event'
+    _description = 'Подія Ringostat (черга webhook)'
+    _order = 'id desc'
+    _rec_name = 'idempotency_key'
+
+    idempotency_key = fields.Char('Ключ', required=True, readonly=True)
+    payload = fields.Text('Payload (JSON)', required=True, readonly=True)
+    call_date = fields.Char('Дата дзвінку', readonly=True)
+    employee = fields.Char('Співробітник', readonly=True)
+    state = fields.Selection([
+        ('pending', 'Очікує'),
+        ('done',    'Оброблено'),
+        ('skipped', 'Внутрішній'),
+        ('error',   'Помилка'),
+    ], string='Стан', default='pending', required=True, index=True)
+    call_id = fields.Many2one('rayton.ringostat.call', 'Дзвінок', readonly=True, ondelete='set null')
+    attempts = fields.Integer('Спроб', default=0, readonly=True)
+    next_attempt_at = fields.Datetime('Наступна спроба', readonly=True)
+    processed_at = fields.Datetime('Оброблено о', readonly=True)
+    last_error = fields.Text('Остання помилка', readonly=True)
+
+    def init(self):
+        self._cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS rayton_ringostat_event_key_uniq
+            ON rayton_ringostat_event (idempotency_key)
+        """)
+
+    # ── Прийом ───────────────────────────────────────────────────────────── #
+
+    @api.model
+    def _idempotency_key(self, payload):
+        """ID дзвінка Ringostat, якщо є, інакше хеш полів, що ідентифікують дзвінок."""
+        for fname in CALL_ID_FIELDS:
+            if payload.get(fname):
+                return 'id:%s' % payload[fname]
+        raw = '|'.join(str(payload.get(f) or '').strip() for f in KEY_FIELDS)
+        return 'sha1:%s' % hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    @api.model
+    def _enqueue(self, payload):
+        """Зберегти payload один раз на ключ ідемпотентності; повертає (key, is_new).
+
+        INSERT .. ON CONFLICT DO NOTHING: паралельні доставки одного дзвінка
+        не конфліктують, транзакція запиту не обривається і ніколи не чекає
+        на воркер, що обробляє оригінальну подію.
+        """
+        key = self._idempotency_key(payload)
+        self.env.cr.execute("""
+            INSERT INTO rayton_ringostat_event
+                (idempotency_key, payload, call_date, employee, state,
+                 attempts, create_uid, create_date, write_uid, write_date)
+            VALUES (%(key)s, %(payload)s, %(call_date)s, %(employee)s, 'pending',
+                    0, %(uid)s, now() AT TIME ZONE 'UTC', %(uid)s, now() AT TIME ZONE 'UTC')
+            ON CONFLICT (idempotency_key) DO NOTHING
+            RETURNING id
+        """, {
+            'key':       key,
+            'payload':   json.dumps(payload, ensure_ascii=False),
+            'call_date': payload.get('call_date') or None,
+            'employee':  payload.get('employee') or None,
+            'uid':       self.env.uid,
+        })
+        is_new = bool(self.env.cr.fetchone())
+        if is_new:
+            cron = self.env.ref('rayton_crm.ir_cron_ringostat_event_queue', raise_if_not_found=False)
+            if cron:
+                cron._trigger()
+        return key, is_new
+
+    # ── Обробка ──────────────────────────────────────────────────────────── #
+
+    @api.model
+    def _cron_process_queue(self):
+        self._process_pending(auto_commit=True)
+
+    @api.model
+    def _process_pending(self, limit=None, auto_commit=False):
+        """Обробити одну пачку подій, яким настав час; повертає їх кількість."""
+        cfg = self.env['ir.config_parameter'].sudo()
+        limit = limit or int(cfg.get_param('ringostat.queue.batch_size', 200))
+        now = fields.Datetime.now()
+        self.env.cr.execute("""
+            SELECT id FROM rayton_ringostat_event
+            WHERE state = 'pending' AND COALESCE(next_attempt_at, %s) <= %s
+            ORDER BY id
+            LIMIT %s
+        """, [now, now, limit])
+        ids = [r[0] for r in self.env.cr.fetchall()]
+        for event in self.browse(ids):
+            event._process(auto_commit=auto_commit)
+        if ids:
+            _logger.info('Ringostat queue: оброблено %d подій', len(ids))
+        if len(ids) == limit:
+            self.env.ref('rayton_crm.ir_cron_ringostat_event_queue')._trigger()
+        self._gc_done_events()
+        return len(ids)
+
+    def _process(self, auto_commit=False):
+        """Створити дзвінок цієї події під lock зовнішнього номера.
+
+        Lock завжди береться до першого запиту транзакції, що обробляє подію, —
+        другий дзвінок з того ж номера бачить контакт і лід, закомічені
+        першим. З cron (auto_commit) lock сесійний, і після його отримання
+        транзакція починається заново; інакше (кнопка, shell) подія
+        обробляється і комітиться в окремій транзакції, що починається з lock:
+        відкат транзакції, яка викликала _process, її вже не скасує.
+        """
+        self.ensure_one()
+        cr = self.env.cr
+        Call = self.env['rayton.ringostat.call']
+        lock = Call._phone_lock_key(Call._external_phone(json.loads(self.payload))[1])
+        if lock and not auto_commit:
+            with self.env.registry.cursor() as new_cr:
+                new_cr.execute("SELECT pg_advisory_xact_lock(hashtext(%s), %s)", lock)
+                self.with_env(self.env(cr=new_cr)).with_context(
+                    ringostat_phone_locked=True,
+                )._process_locked(False)
+            self.invalidate_recordset()
+            return
+        session_lock = bool(lock)
+        if session_lock:
+            cr.execute("SELECT pg_advisory_lock(hashtext(%s), %s)", lock)
+            cr.commit()  # новий знімок бази вже після отримання lock
+        try:
+            self.with_context(ringostat_phone_locked=session_lock)._process_locked(auto_commit)
+        except Exception:
+            if session_lock:
+                cr.rollback()
+            raise
+        finally:
+            if session_lock:
+                cr.execute("SELECT pg_advisory_unlock(hashtext(%s), %s)", lock)
+
+    def _process_locked(self, auto_commit):
+        cr = self.env.cr
+        cr.execute("""
+            SELECT id FROM rayton_ringostat_event
+            WHERE id = %s AND state = 'pending'
+            FOR UPDATE SKIP LOCKED
+        """, [self.id])
+        if not cr.fetchone():
+            return  # вже оброблено або взято іншим воркером
+
+        try:
+            with cr.savepoint():
+                call = self.env['rayton.ringostat.call'].create_from_webhook(
+                    json.loads(self.payload), idempotency_key=self.idempotency_key,
+                )
+        except Exception as e:
+            self._mark_failed(e)
+        else:
+            self.write({
+                'state':        'done' if call else 'skipped',
+                'call_id':      call.id if call else False,
+                'attempts':     self.attempts + 1,
+                'processed_at': fields.Datetime.now(),
+                'last_error':   False,
+            })
+        if auto_commit:
+            cr.commit()
+
+    def _mark_failed(self, error):
+        self.ensure_one()
+        cfg = self.env['ir.config_parameter'].sudo()
+        max_attempts = int(cfg.get_param('ringostat.queue.max_attempts', 5))
+        attempts = self.attempts + 1
+        _logger.error('Ringostat event %s (%s) спроба %d/%d: %s',
+                      self.id, self.idempotency_key, attempts, max_attempts, error, exc_info=True)
+        vals = {'attempts': attempts, 'last_error': str(error)}
+        if attempts >= max_attempts:
+            vals['state'] = 'error'
+        else:
+            # Експоненційна пауза: 2, 4, 8, 16 хв
+            vals['next_attempt_at'] = fields.Datetime.now() + timedelta(minutes=2 ** attempts)
+        self.write(vals)
+
+    @api.model
+    def _gc_done_events(self):
+        """Видалити оброблені події, старші за ringostat.queue.keep_days.
+
+        Ключ ідемпотентності лишається на rayton.ringostat.call, тож повтор,
+        що прийшов уже після видалення події, теж нічого не створює.
+        """
+        cfg = self.env['ir.config_parameter'].sudo()
+        keep_days = int(cfg.get_param('ringostat.queue.keep_days', 30))
+        self.env.cr.execute("""
+            DELETE FROM rayton_ringostat_event
+            WHERE state IN ('done', 'skipped') AND processed_at < %s
+        """, [fields.Datetime.now() - timedelta(days=keep_days)])
+
+    # ── Кнопки ───────────────────────────────────────────────────────────── #
+
+    def action_retry(self):
+        self.write({
+            'state':           'pending',
+            'attempts':        0,
+            'next_attempt_at': False,
+            'last_error':      False,
+        })
+        self.env.ref('rayton_crm.ir_cron_ringostat_event_queue')._trigger()
+
+    def action_process_now(self):
+        for event in self.filtered(lambda e: e.state == 'pending'):
+            event._process()
@@ -1,6 +1,8 @@
 import logging
 
-from odoo import api, fields, models
+from odoo import api, fields, models, tools
+
+from ..tools.phone import phone_suffix
 
 _logger = logging.getLogger(__name__)
 
@@ -14,29 +16,45 @@ class RaytonRingostatExcludedPhone(models.Model):
     phone = fields.Char('Номер телефону', required=True, index=True)
     employee_name = fields.Char('ПІБ / Примітка')
 
+    # Набір суфіксів кешується в ormcache процесу. Зміна номерів скидає кеш
+    # і піднімає cache-sequence реєстру — інші воркери скидають свій кеш на
+    # початку наступного запиту. Скидається весь ormcache, тож правка лише
+    # примітки (employee_name) кеш не чіпає.
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if records:
+            self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'phone' in vals:
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        if self:
+            self.env.registry.clear_cache()
+        return res
+
     @api.model
+    @tools.ormcache()
     def _get_excluded_set(self):
-        """Return a set of last-9-digit suffixes of all excluded phones.
+        """Return a frozenset of last-9-digit suffixes of all excluded phones.
 
         Calls where the external party's phone matches any suffix in this set
         are considered internal (employee-to-employee) and should be skipped.
+        The table is read once per process and cache invalidation.
         """
         self.env.cr.execute(
             "SELECT phone FROM rayton_ringostat_excluded_phone WHERE phone IS NOT NULL"
         )
-        result = set()
-        for (ph,) in self.env.cr.fetchall():
-            digits = ''.join(c for c in ph if c.isdigit())
-            if len(digits) >= 7:
-                result.add(digits[-9:])
-        return result
+        return frozenset(filter(None, (phone_suffix(ph) for (ph,) in self.env.cr.fetchall())))
 
     @api.model
     def is_internal(self, phone_number):
         """Return True if the given phone number belongs to an internal employee."""
-        if not phone_number:
-            return False
-        digits = ''.join(c for c in phone_number if c.isdigit())
-        if len(digits) < 7:
-            return False
-        return digits[-9:] in self._get_excluded_set()
+        suffix = phone_suffix(phone_number)
+        return bool(suffix) and suffix in self._get_excluded_set()
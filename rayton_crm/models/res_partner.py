@@ -1,6 +1,7 @@
-import re
 from odoo import models, fields, api
 
+from ..tools.phone import phone_digits
+
 PARTNER_STATUS = [
     ('target', 'Цільовий'),
     ('non_target', 'Не цільовий'),
@@ -50,6 +51,8 @@ class ResPartner(models.Model):
     director_name = fields.Char(string='Керівник')
     resource_link = fields.Char(string='Посилання з ресурсу')
     pipedrive_person_id = fields.Integer(string='Pipedrive Person ID', index=True)
+    # Замість пошуку xmlid 'pipedrive_org_%d' в ir.model.data (див. міграцію 17.0.1.1.0)
+    pipedrive_org_id = fields.Integer(string='Pipedrive Org ID', index=True, copy=False)
 
     has_open_lead = fields.Boolean(
         string='Є відкритий лід',
@@ -70,11 +73,11 @@ class ResPartner(models.Model):
         for vals in vals_list:
             for f in ('phone', 'mobile'):
                 if vals.get(f):
-                    vals[f] = re.sub(r'[^\d]', '', vals[f])
+                    vals[f] = phone_digits(vals[f])
         return super().create(vals_list)
 
     def write(self, vals):
         for f in ('phone', 'mobile'):
             if vals.get(f):
-                vals[f] = re.sub(r'[^\d]', '', vals[f])
+                vals[f] = phone_digits(vals[f])
         return super().write(vals)
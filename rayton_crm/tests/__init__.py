@@ -0,0 +1,7 @@
+from . import test_pipedrive_queue
+from . import test_pipedrive_webhook
+from . import test_pipedrive_mapping
+from . import test_pipedrive_sync
+from . import test_ringostat_call
+from . import test_ringostat_rollup
+from . import test_manager_kpi
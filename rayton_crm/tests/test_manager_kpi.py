@@ -0,0 +1,115 @@
+from datetime import date, datetime, timedelta
+
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+
+from ..models.rayton_manager_kpi import KPI_COLUMNS
+
+
+@tagged('post_install', '-at_install')
+class TestManagerKpiIncremental(TransactionCase):
+    """Перерахунок із журналу (_fold_dirty) == повний перерахунок (action_refresh_all)."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env['ir.config_parameter'].sudo().set_param('rayton.kpi.incremental', 1)
+        cls.Kpi = cls.env['rayton.manager.kpi']
+        groups = [cls.env.ref('base.group_user').id, cls.env.ref('rayton_crm.group_manager').id]
+        cls.manager_a, cls.manager_b = cls.env['res.users'].create([{
+            'name':      'Менеджер КПІ %s' % suffix,
+            'login':     'kpi_manager_%s' % suffix,
+            'groups_id': [(6, 0, groups)],
+        } for suffix in ('a', 'b')])
+        cls.stage = cls.env['crm.stage'].create({
+            'name':                'Переговори (КПІ)',
+            'is_manager_pipeline': True,
+        })
+        cls.lead_a, cls.lead_b = cls.env['crm.lead'].create([{
+            'name':     'Нагода КПІ %s' % user.name,
+            'type':     'opportunity',
+            'user_id':  user.id,
+            'stage_id': cls.stage.id,
+        } for user in (cls.manager_a, cls.manager_b)])
+        comm, meeting, auto, manual = cls.Kpi._get_kpi_activity_type_ids()
+        cls.call_type_id, cls.meeting_type_id = auto[0], meeting[0]
+        # Вихідний стан: повний перерахунок і порожній журнал
+        cls.Kpi.action_refresh_all()
+        cls.env.cr.execute("DELETE FROM rayton_manager_kpi_dirty")
+
+    def _snapshot(self):
+        rows = self.Kpi.search([
+            ('user_id', 'in', (self.manager_a | self.manager_b).ids),
+            ('period_start', '=', date.today().replace(day=1)),
+        ])
+        return sorted(tuple(row[c].id if c == 'user_id' else row[c] for c in KPI_COLUMNS) for row in rows)
+
+    def _log_size(self):
+        self.env.cr.execute("SELECT count(*) FROM rayton_manager_kpi_dirty")
+        return self.env.cr.fetchone()[0]
+
+    def _activity(self, lead, type_id):
+        return self.env['mail.message'].create({
+            'model':                 'crm.lead',
+            'res_id':                lead.id,
+            'message_type':          'comment',
+            'body':                  'Дзвінок',
+            'mail_activity_type_id': type_id,
+            'date':                  fields.Datetime.now(),
+            'author_id':             lead.user_id.partner_id.id,
+        })
+
+    def test_writers_only_append_to_the_log(self):
+        before = self._snapshot()
+        self.lead_a.write({'project_number': 'P-1'})
+        self._activity(self.lead_a, self.call_type_id)
+        self.assertTrue(self._log_size())
+        self.Kpi.invalidate_model()
+        self.assertEqual(self._snapshot(), before)
+
+    def test_fold_matches_full_refresh(self):
+        self.lead_a.write({'project_number': 'P-1', 'power_ses_kw': 30})
+        self.lead_b.write({'user_id': self.manager_a.id})
+        self.env['crm.lead'].create({
+            'name':                 'Нова нагода КПІ',
+            'type':                 'opportunity',
+            'user_id':              self.manager_b.id,
+            'stage_id':             self.stage.id,
+            'advance_planned_date': date.today(),
+        })
+        self._activity(self.lead_a, self.call_type_id)
+        meeting = self._activity(self.lead_b, self.meeting_type_id)
+        self._activity(self.lead_b, self.call_type_id).unlink()
+        meeting.write({'mail_activity_type_id': self.call_type_id})
+
+        self.assertEqual(self.Kpi._fold_dirty(), 2)
+        self.assertEqual(self._log_size(), 0)
+        folded = self._snapshot()
+
+        self.Kpi.action_refresh_all()
+        self.assertEqual(self._snapshot(), folded)
+
+    def test_non_kpi_fields_are_not_logged(self):
+        self.lead_a.write({'description': 'Примітка без впливу на КПІ'})
+        self.assertEqual(self._log_size(), 0)
+
+    def test_last_day_of_month_is_counted_whole(self):
+        # Минулий місяць: активність і дзвінок о 23:00 останнього дня
+        # рахуються, такі ж о 00:00 першого дня поточного — ні
+        last_day = date.today().replace(day=1) - timedelta(days=1)
+        period = last_day.replace(day=1)
+        late = datetime.combine(last_day, datetime.min.time()).replace(hour=23)
+        next_month = late + timedelta(hours=1)
+        for when in (late, next_month):
+            self._activity(self.lead_a, self.call_type_id).date = when
+            self.env['rayton.ringostat.call'].create({
+                'call_type':   'transitout',
+                'call_date':   when,
+                'call_status': 'ANSWERED',
+                'user_id':     self.manager_a.id,
+            })
+
+        self.Kpi.with_context(force_kpi_recompute=True).action_refresh_all(period)
+
+        row = self.Kpi.search([('user_id', '=', self.manager_a.id), ('period_start', '=', period)])
+        self.assertEqual((row.comm_auto, row.rs_total, row.rs_answered), (1, 1, 1))
@@ -0,0 +1,107 @@
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+from ..controllers.pipedrive_webhook import LABEL_OPTION_MAP, PipedriveWebhook
+from ..tools.pipedrive_client import PipedriveClient
+
+STAGES = [{'id': 9001, 'name': 'Тестова стадія PD', 'pipeline_name': 'Оператор'}]
+PIPELINES = [{'id': 9002, 'name': 'Оператор'}]
+USERS = [{'id': 9003, 'name': 'Невідомий у OWNER_MAP', 'email': 'pd.mapping.tester@example.com'}]
+DEAL_FIELDS = [
+    {'key': 'label', 'options': [
+        {'id': 9004, 'label': 'СЕС'},
+        {'id': 9005, 'label': 'Нова опція'},
+    ]},
+    {'key': 'stranger', 'options': [{'id': 9006, 'label': 'СЕС'}]},
+]
+
+
+@tagged('post_install', '-at_install')
+class TestPipedriveMappingSync(TransactionCase):
+    """action_sync_metadata проти заглушки API і резолвінг через маппінг."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Mapping = cls.env['rayton.pipedrive.mapping']
+        cls.webhook = PipedriveWebhook()
+        cfg = cls.env['ir.config_parameter'].sudo()
+        cfg.set_param('pipedrive.api.token', 'test-token')
+        cfg.set_param('pipedrive.field.label', 'label')
+        cls.stage = cls.env['crm.stage'].create({'name': 'Тестова стадія PD'})
+        cls.user = cls.env['res.users'].create({
+            'name':  'PD Mapping Tester',
+            'login': 'pd.mapping.tester@example.com',
+        })
+        cls.fixtures = {
+            'stages': STAGES, 'pipelines': PIPELINES,
+            'users': USERS, 'dealFields': DEAL_FIELDS,
+        }
+
+    def _sync(self, **overrides):
+        """Синхронізація зі stub-відповідями; повертає шляхи запитів до API."""
+        fixtures = dict(self.fixtures, **overrides)
+        paths = []
+
+        def get(client, path, params=None):
+            paths.append(path)
+            return {'success': True, 'data': fixtures[path],
+                    'additional_data': {'pagination': {'more_items_in_collection': False}}}
+
+        with patch.object(PipedriveClient, 'get', autospec=True, side_effect=get):
+            self.Mapping.action_sync_metadata()
+        return paths
+
+    def _row(self, kind, pd_id, field_key=False):
+        return self.Mapping.search([
+            ('kind', '=', kind), ('pd_id', '=', pd_id), ('field_key', '=', field_key),
+        ])
+
+    def test_sync_upserts_rows(self):
+        paths = self._sync()
+
+        self.assertCountEqual(paths, ['stages', 'pipelines', 'users', 'dealFields'])
+        self.assertEqual(self._row('stage', 9001).stage_id, self.stage)
+        self.assertEqual(self._row('stage', 9001).name, 'Оператор / Тестова стадія PD')
+        self.assertTrue(self._row('pipeline', 9002))
+        self.assertEqual(self._row('user', 9003).user_id, self.user)
+        self.assertEqual(self._row('option', 9004, 'label').value, 'ses')
+        self.assertFalse(self._row('option', 9005, 'label').value)
+        self.assertFalse(self._row('option', 9006, 'stranger'))
+
+        # Повторний запуск оновлює назви, а не додає рядки; ручні правки лишаються
+        self._row('option', 9005, 'label').value = 'uze'
+        self._sync(stages=[dict(STAGES[0], pipeline_name='Sales')])
+
+        self.assertEqual(self.Mapping.search_count([('pd_id', 'in', [9001, 9002, 9003, 9004, 9005])]), 5)
+        self.assertEqual(self._row('stage', 9001).name, 'Sales / Тестова стадія PD')
+        self.assertEqual(self._row('option', 9005, 'label').value, 'uze')
+
+    def test_lookup_cache_follows_mapping_changes(self):
+        self.assertIsNone(self.Mapping._lookup('option', 9005, 'label'))
+
+        self._sync()
+        self.assertEqual(self.Mapping._lookup('option', 9005, 'label'), (False, False))
+
+        self._row('option', 9005, 'label').value = 'uze'
+        self.assertEqual(self.Mapping._lookup('option', 9005, 'label'), (False, 'uze'))
+
+        self._row('option', 9005, 'label').unlink()
+        self.assertIsNone(self.Mapping._lookup('option', 9005, 'label'))
+
+    def test_unknown_ids_fall_back_to_hardcoded_maps(self):
+        option_id, value = next(iter(LABEL_OPTION_MAP.items()))
+        self.assertFalse(self.Mapping.search([('kind', '=', 'option'), ('pd_id', '=', option_id)]))
+
+        self.assertIsNone(self.webhook._map_pd_id(self.env, 'stage', 987654))
+        self.assertIsNone(self.webhook._map_pd_id(self.env, 'stage', '9001'))
+        self.assertEqual(self.webhook._map_option(self.env, 'label', option_id, LABEL_OPTION_MAP), value)
+        self.assertIsNone(self.webhook._map_option(self.env, 'label', 987654, LABEL_OPTION_MAP))
+
+        # Маппінг з порожнім value теж не перекриває словник
+        self.Mapping.create({'kind': 'option', 'pd_id': option_id, 'field_key': 'label'})
+        self.assertEqual(self.webhook._map_option(self.env, 'label', option_id, LABEL_OPTION_MAP), value)
+
+        self.Mapping.search([('kind', '=', 'option'), ('pd_id', '=', option_id)]).value = 'custom'
+        self.assertEqual(self.webhook._map_option(self.env, 'label', option_id, LABEL_OPTION_MAP), 'custom')
@@ -0,0 +1,86 @@
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+from ..models.rayton_pipedrive_event import RaytonPipedriveEvent
+
+
+@tagged('post_install', '-at_install')
+class TestPipedriveQueueCoalescing(TransactionCase):
+    """Згортання пачки подій одного об'єкта в _process_pending."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Event = cls.env['rayton.pipedrive.event']
+        # Без вікна згортання: події, створені в тесті, одразу "дозрілі"
+        cls.env['ir.config_parameter'].sudo().set_param('pipedrive.queue.coalesce_seconds', 0)
+
+    def _event(self, obj, pd_id, **current):
+        data = {
+            'meta': {'object': obj, 'action': 'updated', 'id': pd_id},
+            'current': dict(current, id=pd_id) if pd_id else current,
+            'previous': {},
+        }
+        return self.Event.create(self.Event._prepare_event_vals(data))
+
+    def _process_pending(self, **kwargs):
+        """Один прохід черги із заглушкою обробника; повертає id оброблених подій."""
+        dispatched = []
+        with patch.object(RaytonPipedriveEvent, '_dispatch', autospec=True,
+                          side_effect=lambda event: dispatched.append(event.id)):
+            self.Event._process_pending(**kwargs)
+        self.Event.invalidate_model()
+        return dispatched
+
+    def test_burst_of_one_deal_is_dispatched_once(self):
+        first = self._event('deal', 101, title='v1')
+        second = self._event('deal', 101, title='v2')
+        newest = self._event('deal', 101, title='v3')
+        other = self._event('deal', 202, title='інша угода')
+
+        dispatched = self._process_pending()
+
+        self.assertCountEqual(dispatched, [newest.id, other.id])
+        self.assertEqual(newest.state, 'done')
+        self.assertEqual(newest.merged_count, 2)
+        self.assertEqual((first | second).mapped('state'), ['merged', 'merged'])
+        self.assertEqual((first | second).merged_into_id, newest)
+        self.assertEqual(other.state, 'done')
+        self.assertEqual(other.merged_count, 0)
+
+    def test_same_id_of_different_entities_is_not_merged(self):
+        deal = self._event('deal', 303, title='угода')
+        person = self._event('person', 303, name='контакт')
+
+        dispatched = self._process_pending()
+
+        self.assertCountEqual(dispatched, [deal.id, person.id])
+        self.assertEqual((deal | person).mapped('state'), ['done', 'done'])
+
+    def test_events_without_id_are_never_merged(self):
+        first = self._event('deal', 0, title='без id')
+        second = self._event('deal', 0, title='без id')
+
+        dispatched = self._process_pending()
+
+        self.assertCountEqual(dispatched, [first.id, second.id])
+        self.assertFalse((first | second).merged_into_id)
+
+    def test_backoff_delays_the_whole_group(self):
+        older = self._event('deal', 404, title='v1')
+        newest = self._event('deal', 404, title='v2')
+        newest.next_attempt_at = '2999-01-01 00:00:00'
+        newest.flush_recordset()
+
+        self.assertEqual(self._process_pending(), [])
+        self.assertEqual((older | newest).mapped('state'), ['pending', 'pending'])
+
+    def test_shard_takes_only_its_own_events(self):
+        mine = self._event('deal', 505, title='v1')
+        foreign = self._event('deal', 506, title='v1')
+
+        dispatched = self._process_pending(shard=mine._shard())
+
+        self.assertEqual(dispatched, [mine.id])
+        self.assertEqual(foreign.state, 'pending')
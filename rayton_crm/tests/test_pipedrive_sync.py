@@ -0,0 +1,85 @@
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+from ..tools.pipedrive_client import PipedriveApiError, PipedriveClient
+
+SINCE = '2026-04-01 00:00:00'
+
+# Дві сторінки /recents?items=deal: start=0 і start=2
+PAGES = {
+    0: {
+        'data': [
+            {'item': 'deal', 'id': 9101, 'data': {'id': 9101, 'update_time': '2026-04-01 10:00:00'}},
+            {'item': 'deal', 'id': 9102, 'data': {'id': 9102, 'update_time': '2026-04-01 11:00:00'}},
+        ],
+        'additional_data': {
+            'last_timestamp_on_page': '2026-04-01 11:00:00',
+            'pagination': {'more_items_in_collection': True, 'next_start': 2},
+        },
+    },
+    2: {
+        'data': [
+            {'item': 'deal', 'id': 9103, 'data': {'id': 9103, 'update_time': '2026-04-01 12:00:00'}},
+        ],
+        'additional_data': {
+            'last_timestamp_on_page': '2026-04-01 12:00:00',
+            'pagination': {'more_items_in_collection': False},
+        },
+    },
+}
+
+
+@tagged('post_install', '-at_install')
+class TestPipedriveDeltaSync(TransactionCase):
+    """Курсор /recents зсувається лише після успішно поставленої в чергу сторінки."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Event = cls.env['rayton.pipedrive.event']
+        cls.cfg = cls.env['ir.config_parameter'].sudo()
+        cls.cfg.set_param('pipedrive.api.token', 'test-token')
+        cls.cfg.set_param('pipedrive.sync.since.deal', SINCE)
+
+    def _sync(self, fail_at=None):
+        """Синхронізація угод зі stub-сторінками; повертає параметри запитів."""
+        requests = []
+
+        def get(client, path, params=None):
+            self.assertEqual(path, 'recents')
+            requests.append(dict(params))
+            if params['start'] == fail_at:
+                raise PipedriveApiError('GET recents: HTTP 500')
+            return dict(PAGES[params['start']], success=True)
+
+        with patch.object(PipedriveClient, 'get', autospec=True, side_effect=get):
+            self.Event._sync_delta(entities=('deal',))
+        return requests
+
+    def _synced_ids(self):
+        return sorted(self.Event.search([('source', '=', 'sync'), ('entity', '=', 'deal')])
+                      .mapped('entity_id'))
+
+    def test_all_pages_are_read_and_cursor_moves_to_the_last_one(self):
+        requests = self._sync()
+
+        self.assertEqual([r['start'] for r in requests], [0, 2])
+        self.assertEqual({r['since_timestamp'] for r in requests}, {SINCE})
+        self.assertEqual({r['items'] for r in requests}, {'deal'})
+        self.assertEqual(self._synced_ids(), [9101, 9102, 9103])
+        self.assertEqual(self.cfg.get_param('pipedrive.sync.since.deal'), '2026-04-01 12:00:00')
+
+    def test_failed_page_keeps_the_cursor_of_the_last_good_one(self):
+        with self.assertRaises(PipedriveApiError):
+            self._sync(fail_at=2)
+
+        self.assertEqual(self._synced_ids(), [9101, 9102])
+        self.assertEqual(self.cfg.get_param('pipedrive.sync.since.deal'), '2026-04-01 11:00:00')
+
+    def test_api_error_on_first_page_leaves_the_cursor_unchanged(self):
+        with self.assertRaises(PipedriveApiError):
+            self._sync(fail_at=0)
+
+        self.assertEqual(self._synced_ids(), [])
+        self.assertEqual(self.cfg.get_param('pipedrive.sync.since.deal'), SINCE)
@@ -0,0 +1,53 @@
+from datetime import datetime
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+from ..controllers.pipedrive_webhook import PipedriveWebhook
+from ..models.crm_lead import CrmLead
+
+
+@tagged('post_install', '-at_install')
+class TestPipedriveDealEvents(TransactionCase):
+    """_on_deal: застарілі події і події без змін не пишуть у нагоду."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.webhook = PipedriveWebhook()
+        cls.lead = cls.env['crm.lead'].create({
+            'name':                  'Угода 700',
+            'type':                  'opportunity',
+            'pipedrive_deal_id':     700,
+            'pipedrive_update_time': datetime(2026, 3, 10, 12, 0, 0),
+        })
+        # Команда, яку _build_deal_vals підставить для угоди без воронки —
+        # щоб повтор поточного стану справді не містив змін
+        team = cls.webhook._get_team(cls.env, '')
+        if team:
+            cls.lead.team_id = team
+
+    def _on_deal(self, **current):
+        self.webhook._on_deal(self.env, 'updated', dict(current, id=700), {})
+        self.lead.invalidate_recordset()
+
+    def test_older_event_is_ignored(self):
+        self._on_deal(title='Стара назва', update_time='2026-03-10 11:59:59')
+        self.assertEqual(self.lead.name, 'Угода 700')
+        self.assertEqual(self.lead.pipedrive_update_time, datetime(2026, 3, 10, 12, 0, 0))
+
+    def test_newer_event_is_applied(self):
+        self._on_deal(title='Нова назва', update_time='2026-03-10T12:00:05Z')
+        self.assertEqual(self.lead.name, 'Нова назва')
+        self.assertEqual(self.lead.pipedrive_update_time, datetime(2026, 3, 10, 12, 0, 5))
+
+    def test_event_without_changes_only_moves_the_cursor(self):
+        with patch.object(CrmLead, 'write', autospec=True) as write:
+            self._on_deal(title='Угода 700', update_time='2026-03-10 12:01:00')
+        write.assert_not_called()
+        self.assertEqual(self.lead.pipedrive_update_time, datetime(2026, 3, 10, 12, 1, 0))
+
+    def test_deleted_unknown_deal_creates_nothing(self):
+        self.webhook._on_deal(self.env, 'deleted', {'id': 701, 'title': 'Невідома'}, {})
+        self.assertFalse(self.env['crm.lead'].with_context(active_test=False).search_count(
+            [('pipedrive_deal_id', '=', 701)]))
@@ -0,0 +1,218 @@
+import hashlib
+import os
+
+from markupsafe import Markup, escape
+
+from odoo.tests import TransactionCase, tagged
+
+PAYLOAD = {
+    'call_type':        'transitin',
+    'call_date':        '2026-04-02 10:15:00',
+    'caller_number':    '+38 (067) 700-11-22',
+    'call_destination': '0443334455',
+    'call_duration':    '42',
+    'call_status':      'ANSWERED',
+    'employee':         '',
+    'has_recording':    '0',
+}
+
+
+@tagged('post_install', '-at_install')
+class TestRingostatIdempotency(TransactionCase):
+    """Повторна доставка одного дзвінка нічого не створює вдруге."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Event = cls.env['rayton.ringostat.event']
+        # Lock номера бере cron / окрема транзакція; в тесті лишаємось у своїй
+        cls.Call = cls.env['rayton.ringostat.call'].with_context(ringostat_phone_locked=True)
+        cls.key = cls.Event._idempotency_key(PAYLOAD)
+
+    def _leads_for_phone(self):
+        return self.env['crm.lead'].search_count([('ringostat_phone_suffix', '=', '677001122')])
+
+    def test_enqueue_stores_a_payload_once(self):
+        key, is_new = self.Event._enqueue(PAYLOAD)
+        self.assertTrue(is_new)
+        self.assertEqual(self.Event._enqueue(dict(PAYLOAD)), (key, False))
+        self.assertEqual(self.Event.search_count([('idempotency_key', '=', key)]), 1)
+
+    def test_replayed_call_returns_the_first_record(self):
+        first = self.Call.create_from_webhook(dict(PAYLOAD), idempotency_key=self.key)
+        self.assertTrue(first)
+        self.assertEqual(self._leads_for_phone(), 1)
+
+        replay = self.Call.create_from_webhook(dict(PAYLOAD), idempotency_key=self.key)
+
+        self.assertEqual(replay, first)
+        self.assertEqual(self.Call.search_count([('idempotency_key', '=', self.key)]), 1)
+        self.assertEqual(self._leads_for_phone(), 1)
+        self.assertEqual(len(first.chatter_message_ids), 1)
+
+    def test_replay_of_an_archived_call_is_skipped(self):
+        self.env['rayton.ringostat.call.archive'].create({
+            'call_type':       'transitin',
+            'call_date':       '2025-01-02 10:15:00',
+            'idempotency_key': self.key,
+        })
+
+        self.assertIsNone(self.Call.create_from_webhook(dict(PAYLOAD), idempotency_key=self.key))
+        self.assertFalse(self.Call.search_count([('idempotency_key', '=', self.key)]))
+        self.assertEqual(self._leads_for_phone(), 0)
+
+
+@tagged('post_install', '-at_install')
+class TestRingostatPhoneSuffix(TransactionCase):
+    """Зіставлення номера дзвінка з контактом по суфіксу 9 цифр."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Call = cls.env['rayton.ringostat.call']
+        cls.partner = cls.env['res.partner'].create({'name': 'Клієнт з телефоном'})
+        cls.phone = cls.env['res.partner.phone'].create({
+            'partner_id': cls.partner.id,
+            'phone':      '067 700 33 44',
+        })
+
+    def test_suffix_is_stored_on_create_and_write(self):
+        self.assertEqual(self.phone.phone, '0677003344')
+        self.assertEqual(self.phone.phone_suffix9, '677003344')
+        self.phone.phone = '+38 (050) 111-22-33'
+        self.assertEqual(self.phone.phone_suffix9, '501112233')
+
+    def test_any_prefix_finds_the_partner(self):
+        for number in ('0677003344', '380677003344', '+38 (067) 700-33-44', '677003344'):
+            with self.subTest(number=number):
+                self.assertEqual(self.Call._find_partners_by_phone(number), self.partner)
+
+    def test_short_numbers_fall_back_to_substring_match(self):
+        for number in ('7003344', '77003344', '700-33-44'):
+            with self.subTest(number=number):
+                self.assertEqual(self.Call._find_partners_by_phone(number), self.partner)
+        self.assertFalse(self.Call._find_partners_by_phone('7003345'))
+
+    def test_short_known_number_posts_to_chatter_instead_of_a_new_lead(self):
+        payload = dict(PAYLOAD, caller_number='700-33-44')
+        Call = self.Call.with_context(ringostat_phone_locked=True)
+        leads_before = self.env['crm.lead'].search_count([])
+
+        call = Call.create_from_webhook(payload)
+
+        self.assertEqual(self.env['crm.lead'].search_count([]), leads_before)
+        self.assertEqual(call.chatter_message_ids.mapped('res_id'), [self.partner.id])
+
+    def test_other_or_short_numbers_find_nothing(self):
+        for number in ('0677003345', '112', '', False):
+            with self.subTest(number=number):
+                self.assertFalse(self.Call._find_partners_by_phone(number))
+
+
+@tagged('post_install', '-at_install')
+class TestRingostatRecording(TransactionCase):
+    """Збереження завантаженого запису і заміна посилання в чаттері."""
+
+    URL = 'https://api.ringostat.net/recordings/abc.ogg?token=1&sig=2'
+    CONTENT = b'OggS' + b'\x00' * 4096
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Call = cls.env['rayton.ringostat.call']
+        cls.partner = cls.env['res.partner'].create({'name': 'Клієнт з записом'})
+
+    def _migrated_call(self):
+        """Дзвінок, збережений до появи chatter_message_ids: пост є, зв'язку немає."""
+        call = self.Call.create({
+            'call_type':       'transitin',
+            'call_date':       '2026-04-02 10:15:00',
+            'has_recording':   True,
+            'recording_url':   self.URL,
+            'recording_state': 'pending',
+        })
+        message = self.partner.message_post(
+            body=Markup(self.Call._build_call_body(
+                'transitin', 'ANSWERED', '0677001122', 42, self.URL)),
+        )
+        message.date = call.call_date
+        self.assertFalse(call.chatter_message_ids)
+        return call, message
+
+    def _write_part(self, call):
+        with open(call._recording_part_path(), 'wb') as f:
+            f.write(self.CONTENT)
+        return hashlib.sha1(self.CONTENT).hexdigest()
+
+    def test_store_copies_the_file_and_removes_the_part(self):
+        call, _message = self._migrated_call()
+        checksum = self._write_part(call)
+
+        call._store_recording(checksum, len(self.CONTENT), 'audio/ogg')
+
+        attachment = call.recording_attachment_id
+        self.assertEqual(call.recording_state, 'done')
+        self.assertEqual(attachment.checksum, checksum)
+        self.assertEqual(attachment.file_size, len(self.CONTENT))
+        self.assertEqual(attachment.raw, self.CONTENT)
+        self.assertFalse(os.path.exists(call._recording_part_path()))
+
+    def test_migrated_call_relinks_messages_found_by_url(self):
+        call, message = self._migrated_call()
+        other = self.partner.message_post(body=Markup('<p>Інший дзвінок</p>'))
+        checksum = self._write_part(call)
+
+        call._store_recording(checksum, len(self.CONTENT), 'audio/ogg')
+
+        local_url = '/web/content/%d?access_token=' % call.recording_attachment_id.id
+        self.assertIn(str(escape(local_url)), str(message.body))
+        self.assertNotIn('api.ringostat.net', str(message.body))
+        self.assertEqual(str(other.body), '<p>Інший дзвінок</p>')
+
+
+@tagged('post_install', '-at_install')
+class TestRingostatPhoneLock(TransactionCase):
+    """Шлях без ringostat_phone_locked: окрема транзакція, що починається з lock.
+
+    У тестовому режимі registry.cursor() повертає курсор поверх транзакції
+    тесту, тож усе, що він закомітить, відкотиться разом з тестом.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Call = cls.env['rayton.ringostat.call']
+        cls.Event = cls.env['rayton.ringostat.event']
+
+    def _payload(self, call_date):
+        return dict(PAYLOAD, caller_number='+38 (093) 555-66-77', call_date=call_date)
+
+    def _counts(self):
+        return (
+            self.env['res.partner.phone'].search_count([('phone_suffix9', '=', '935556677')]),
+            self.env['crm.lead'].search_count([('ringostat_phone_suffix', '=', '935556677')]),
+        )
+
+    def test_calls_from_one_unknown_number_create_one_lead(self):
+        first = self.Call.create_from_webhook(self._payload('2026-04-02 10:15:00'))
+        second = self.Call.create_from_webhook(self._payload('2026-04-02 10:20:00'))
+
+        self.assertTrue(first and second)
+        self.assertNotEqual(first, second)
+        self.assertEqual(first.env.cr, self.env.cr)
+        self.assertEqual(second.lead_id, first.lead_id)
+        self.assertEqual(self._counts(), (1, 1))
+        self.assertEqual(self.env['mail.message'].search_count([
+            ('model', '=', 'crm.lead'), ('res_id', '=', first.lead_id.id),
+            ('message_type', '=', 'comment'),
+        ]), 2)
+
+    def test_process_outside_cron_goes_through_the_lock(self):
+        key, _is_new = self.Event._enqueue(self._payload('2026-04-02 11:00:00'))
+        event = self.Event.search([('idempotency_key', '=', key)])
+
+        event._process()
+
+        self.assertEqual(event.state, 'done')
+        self.assertEqual(self.Call.search_count([('idempotency_key', '=', key)]), 1)
+        self.assertEqual(self._counts(), (1, 1))
@@ -0,0 +1,72 @@
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestRingostatRollup(TransactionCase):
+    """Інкрементальне зведення (_apply_calls) == перебудова з сирих дзвінків (_rebuild)."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Call = cls.env['rayton.ringostat.call']
+        cls.Daily = cls.env['rayton.ringostat.call.daily']
+        cls.user_a = cls.env.ref('base.user_admin')
+        cls.user_b = cls.env['res.users'].create({
+            'name': 'Менеджер для зведення', 'login': 'rollup_manager',
+        })
+
+    def _snapshot(self):
+        rows = self.Daily.search([('day', '>=', '2020-01-01'), ('day', '<=', '2020-01-31')])
+        return sorted(
+            (r.user_id.id, r.day, r.call_type, r.call_status,
+             r.call_count, r.total_seconds, r.total_minutes)
+            for r in rows
+        )
+
+    def _call(self, user, call_date, call_type='transitin', status='ANSWERED', duration=60):
+        return self.Call.create({
+            'call_type':     call_type,
+            'call_date':     call_date,
+            'call_status':   status,
+            'call_duration': duration,
+            'user_id':       user.id if user else False,
+        })
+
+    def test_incremental_rollup_matches_rebuild(self):
+        calls = (
+            self._call(self.user_a, '2020-01-10 09:00:00', duration=61)
+            | self._call(self.user_a, '2020-01-10 11:30:00', duration=29)
+            | self._call(self.user_a, '2020-01-10 12:00:00', 'transitout', 'NO_ANSWER', 0)
+            | self._call(self.user_b, '2020-01-10 13:00:00', duration=300)
+            | self._call(self.user_b, '2020-01-11 08:00:00', 'transitout', duration=45)
+            | self._call(False, '2020-01-11 10:00:00', status='BUSY', duration=0)
+        )
+        # Зміни, що переносять дзвінок в інший рядок зведення, і видалення
+        calls[0].write({'call_status': 'BUSY', 'call_duration': 0})
+        calls[1].write({'user_id': self.user_b.id})
+        calls[3].write({'call_date': '2020-01-12 13:00:00'})
+        calls[4].unlink()
+        calls[5].write({'call_duration': 17})
+
+        incremental = self._snapshot()
+        self.assertTrue(incremental)
+        self.Daily._rebuild('2020-01-01', '2020-01-31')
+        self.assertEqual(self._snapshot(), incremental)
+
+    def test_rows_that_drop_to_zero_are_removed(self):
+        call = self._call(self.user_a, '2020-01-20 09:00:00')
+        call.unlink()
+        self.assertEqual(self._snapshot(), [])
+
+    def test_calls_without_status_share_the_empty_status_row(self):
+        self._call(self.user_a, '2020-01-21 09:00:00', status=False, duration=0)
+        self._call(self.user_a, '2020-01-21 10:00:00', status='', duration=0)
+        self._call(self.user_a, '2020-01-21 11:00:00', status='NO_ANSWER', duration=0)
+
+        incremental = self._snapshot()
+        self.assertEqual(
+            [(row[3], row[4]) for row in incremental],
+            [('', 2), ('NO_ANSWER', 1)],
+        )
+        self.Daily._rebuild('2020-01-01', '2020-01-31')
+        self.assertEqual(self._snapshot(), incremental)
@@ -0,0 +1,185 @@
+"""
+Легка інструментація HTTP-ендпоінтів інтеграцій (вебхуки, callback-и).
+
+Для кожного запиту до маршрутів з INSTRUMENTED_ROUTES фіксується тривалість,
+кількість SQL-запитів, статус і тип події з payload. Агрегати (гістограми
+латентності, частка помилок) ведуться по маршруту і по (маршрут, тип події);
+останні запити — в кільцевому буфері, з якого рахуються перцентилі.
+
+Дані живуть у пам'яті процесу: у multi-worker режимі кожен воркер віддає
+власну статистику (pid є у відповіді /rayton/metrics). Запис — O(1) під
+локом, без звернень до бази.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+INSTRUMENTED_ROUTES = (
+    '/pipedrive/webhook',
+    '/ringostat/webhook',
+    '/rayton/tg/webhook',
+    '/rayton/tg/post',
+    '/rayton/tg/promote',
+    '/rayton/kp/callback',
+)
+
+# Межі кошиків гістограми, мс (останній — все, що довше)
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+RING_SIZE = 2000
+SLOW_RING_SIZE = 200
+
+
+def _payload(httprequest):
+    """Розібране JSON-тіло запиту або {} (тіло кешує werkzeug)."""
+    try:
+        data = json.loads(httprequest.get_data(as_text=True) or '{}')
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    # JSON-RPC (type='json' маршрути, які викликає n8n) — корисне в params
+    return data.get('params') if isinstance(data.get('params'), dict) else data
+
+
+def _pipedrive_event(data):
+    meta = data.get('meta') or {}
+    obj = meta.get('entity') or meta.get('object') or '?'
+    current = data.get('data') or data.get('current') or {}
+    return '%s.%s' % (obj, meta.get('action') or '?'), current.get('id') or meta.get('id')
+
+
+def _ringostat_event(data):
+    call_id = data.get('uniqueid') or data.get('call_id') or '%s@%s' % (
+        data.get('caller_number', ''), data.get('call_date', ''))
+    return '%s/%s' % (data.get('call_type') or '?', data.get('call_status') or '?'), call_id
+
+
+def _tg_webhook_event(data):
+    kind = next((k for k in data if k != 'update_id'), '?')
+    return kind, data.get('update_id')
+
+
+EVENT_EXTRACTORS = {
+    '/pipedrive/webhook':  _pipedrive_event,
+    '/ringostat/webhook':  _ringostat_event,
+    '/rayton/tg/webhook':  _tg_webhook_event,
+    '/rayton/tg/post':     lambda d: ('post', d.get('tg_chat_id')),
+    '/rayton/tg/promote':  lambda d: ('promote', d.get('tg_chat_id')),
+    '/rayton/kp/callback': lambda d: ('kp', d.get('sale_order_id')),
+}
+
+
+def is_instrumented(path):
+    return path in EVENT_EXTRACTORS
+
+
+def describe(path, httprequest):
+    """(event_type, payload_id) для запиту до заміряного маршруту."""
+    try:
+        return EVENT_EXTRACTORS[path](_payload(httprequest))
+    except Exception:
+        return '?', None
+
+
+class _Series:
+    __slots__ = ('count', 'errors', 'total_ms', 'max_ms', 'sql', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.sql = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, ms, sql, error):
+        self.count += 1
+        self.errors += bool(error)
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.sql += sql
+        i = 0
+        while i < len(BUCKETS_MS) and ms > BUCKETS_MS[i]:
+            i += 1
+        self.buckets[i] += 1
+
+    def as_dict(self):
+        return {
+            'count':      self.count,
+            'errors':     self.errors,
+            'error_rate': round(self.errors / self.count, 4) if self.count else 0.0,
+            'avg_ms':     round(self.total_ms / self.count, 1) if self.count else 0.0,
+            'max_ms':     round(self.max_ms, 1),
+            'avg_sql':    round(self.sql / self.count, 1) if self.count else 0.0,
+            'histogram':  dict(zip(['<=%d' % b for b in BUCKETS_MS] + ['>%d' % BUCKETS_MS[-1]],
+                                   self.buckets)),
+        }
+
+
+class HttpMetrics:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.since = time.time()
+            self.routes = {}
+            self.events = {}
+            self.recent = deque(maxlen=RING_SIZE)
+            self.slow = deque(maxlen=SLOW_RING_SIZE)
+
+    def record(self, route, event, ms, sql, status, error, payload_id, slow_ms):
+        entry = {
+            'ts':         round(time.time(), 3),
+            'route':      route,
+            'event':      event,
+            'ms':         round(ms, 1),
+            'sql':        sql,
+            'status':     status,
+            'error':      bool(error),
+            'payload_id': payload_id,
+        }
+        with self.lock:
+            self.routes.setdefault(route, _Series()).add(ms, sql, error)
+            self.events.setdefault((route, event), _Series()).add(ms, sql, error)
+            self.recent.append(entry)
+            if ms >= slow_ms:
+                self.slow.append(entry)
+        return entry
+
+    def snapshot(self, recent=0):
+        with self.lock:
+            durations = {}
+            for entry in self.recent:
+                durations.setdefault(entry['route'], []).append(entry['ms'])
+            routes = {}
+            for route, series in self.routes.items():
+                data = series.as_dict()
+                data.update(_percentiles(durations.get(route, [])))
+                routes[route] = data
+            result = {
+                'pid':    os.getpid(),
+                'since':  self.since,
+                'routes': routes,
+                'events': {'%s %s' % key: s.as_dict() for key, s in self.events.items()},
+                'slow':   list(self.slow),
+            }
+            if recent:
+                result['recent'] = list(self.recent)[-recent:]
+        return result
+
+
+def _percentiles(values):
+    """p50/p95/p99 за вікно кільцевого буфера (не за весь час)."""
+    if not values:
+        return {}
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99), 'window': len(values)}
+
+
+METRICS = HttpMetrics()
@@ -0,0 +1,70 @@
+"""
+Індекси, що будуються через CREATE INDEX CONCURRENTLY — без блокування
+записів у великі таблиці (mail_message, crm_lead) під час оновлення модуля.
+
+CONCURRENTLY не працює всередині транзакції, тож init() моделі лише
+перевіряє індекс, а саму побудову відкладає на postcommit: окреме
+з'єднання psycopg2 в autocommit (не з пулу Odoo — стан пулу не змінюється),
+яке закривається одразу після побудови. Невалідний індекс
+(обірвана попередня побудова) видаляється і будується заново — кожне
+оновлення модуля доводить набір індексів до потрібного стану.
+
+  ensure_index_concurrently(cr, 'mail_message_crm_lead_activity_idx', 'mail_message',
+                            "(res_id, mail_activity_type_id, date) WHERE model = 'crm.lead'")
+  ensure_index_concurrently(cr, 'mail_message_pipedrive_note_id_uniq', 'mail_message',
+                            '(pipedrive_note_id) WHERE pipedrive_note_id != 0', unique=True)
+"""
+import logging
+import time
+
+import psycopg2
+
+from odoo.sql_db import connection_info_for
+
+_logger = logging.getLogger(__name__)
+
+
+def index_state(cr, name):
+    """None — індексу немає, True — валідний, False — невалідний (побудову обірвано)."""
+    cr.execute("""
+        SELECT i.indisvalid
+        FROM pg_class c
+        JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = %s AND c.relkind = 'i'
+    """, [name])
+    row = cr.fetchone()
+    return row[0] if row else None
+
+
+def ensure_index_concurrently(cr, name, table, definition, unique=False):
+    """Побудувати індекс `name` ON `table` `definition` конкурентно після коміту `cr`.
+
+    `definition` — усе після назви таблиці: колонки, за потреби USING / WHERE.
+    `unique` будує UNIQUE-індекс — дублі мають бути прибрані заздалегідь,
+    інакше побудова впаде і лишить невалідний індекс, який перебудується
+    при наступному оновленні. Якщо валідний індекс уже є — нічого не робить.
+    """
+    state = index_state(cr, name)
+    if state:
+        return
+    dbname = cr.dbname
+
+    def build():
+        started = time.perf_counter()
+        cnx = psycopg2.connect(**connection_info_for(dbname)[1])
+        try:
+            cnx.autocommit = True
+            with cnx.cursor() as icr:
+                if state is False:
+                    icr.execute('DROP INDEX CONCURRENTLY IF EXISTS "%s"' % name)
+                icr.execute('CREATE %sINDEX CONCURRENTLY IF NOT EXISTS "%s" ON "%s" %s'
+                            % ('UNIQUE ' if unique else '', name, table, definition))
+        except Exception:
+            _logger.exception('Індекс %s не створено — повториться при наступному оновленні модуля',
+                              name)
+            return
+        finally:
+            cnx.close()
+        _logger.info('Індекс %s на %s створено за %.1f с', name, table, time.perf_counter() - started)
+
+    cr.postcommit.add(build)
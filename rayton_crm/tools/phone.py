@@ -0,0 +1,34 @@
+"""
+Нормалізація телефонних номерів — одна реалізація для вебхуків, моделей і імпортів.
+
+  phone_digits('+38 (067) 123-45-67')    → '380671234567'  (як зберігається в базі)
+  normalize_phone('067 123 45 67')       → '380671234567'  (лише валідні UA-номери)
+  phone_suffix('+38 (067) 123-45-67')    → '671234567'     (ключ зіставлення дзвінків)
+"""
+import re
+
+_NON_DIGITS = re.compile(r'[^\d]')
+
+
+def phone_digits(raw):
+    """Залишає лише цифри; порожній рядок, якщо цифр немає."""
+    return _NON_DIGITS.sub('', str(raw or ''))
+
+
+def normalize_phone(raw):
+    """Український номер у форматі 380XXXXXXXXX або None, якщо номер не розпізнано."""
+    d = phone_digits(raw)
+    if len(d) == 10 and d.startswith('0'):
+        d = '380' + d[1:]
+    if d.startswith('380') and len(d) == 12:
+        return d
+    return None
+
+
+def phone_suffix(raw, length=9):
+    """Останні `length` цифр номера — ключ зіставлення незалежно від префікса
+    (0XX / 380XX / +380XX). None, якщо цифр менше 7 (внутрішні, сміття)."""
+    d = phone_digits(raw)
+    if len(d) < 7:
+        return None
+    return d[-length:]
@@ -0,0 +1,127 @@
+"""
+Мінімальний клієнт Pipedrive REST API v1 для cron-задач модуля.
+
+Налаштування (ir.config_parameter):
+  pipedrive.api.url    — базовий URL, за замовчуванням https://api.pipedrive.com/v1
+                         (для тестів — локальний stub, див. scripts/pipedrive_api_stub.py)
+  pipedrive.api.token  — API token
+  pipedrive.api.rate   — запитів на секунду в середньому (token bucket), за замовч. 8
+  pipedrive.api.burst  — скільки запитів можна зробити підряд без пауз, за замовч. 10
+"""
+import logging
+import threading
+import time
+
+import requests
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_API_URL = 'https://api.pipedrive.com/v1'
+PAGE_SIZE = 500  # максимум, який дозволяє Pipedrive
+MAX_429_RETRIES = 5
+
+
+class PipedriveApiError(Exception):
+    pass
+
+
+class TokenBucket:
+    """Token-bucket обмежувач: в середньому `rate` запитів/с, до `burst` підряд.
+
+    На відміну від фіксованого sleep між сторінками, короткі серії запитів
+    ідуть без затримки, а пауза з'являється лише коли бюджет вичерпано.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = max(float(burst), 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Чекає, доки з'явиться токен; повертає час очікування в секундах."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class PipedriveClient:
+
+    def __init__(self, base_url, api_token, timeout=30, rate=8, burst=10):
+        self.base_url = (base_url or DEFAULT_API_URL).rstrip('/')
+        self.api_token = api_token
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.limiter = TokenBucket(rate, burst)
+        self.requests_made = 0
+        self.throttled_seconds = 0.0
+
+    @classmethod
+    def from_env(cls, env):
+        cfg = env['ir.config_parameter'].sudo()
+        token = cfg.get_param('pipedrive.api.token', '')
+        if not token:
+            raise PipedriveApiError('Не задано pipedrive.api.token')
+        return cls(
+            cfg.get_param('pipedrive.api.url', DEFAULT_API_URL), token,
+            rate=float(cfg.get_param('pipedrive.api.rate', 8)),
+            burst=int(cfg.get_param('pipedrive.api.burst', 10)),
+        )
+
+    def get(self, path, params=None):
+        """GET один запит → повна JSON-відповідь (data + additional_data).
+
+        На HTTP 429 чекає Retry-After (або експоненційно) і повторює.
+        Мережеві помилки (таймаут, обрив з'єднання) і невалідний JSON
+        піднімаються як PipedriveApiError — cron-и ловлять лише його.
+        """
+        query = dict(params or {}, api_token=self.api_token)
+        for attempt in range(MAX_429_RETRIES + 1):
+            self.throttled_seconds += self.limiter.acquire()
+            self.requests_made += 1
+            try:
+                resp = self.session.get(f'{self.base_url}/{path.lstrip("/")}',
+                                        params=query, timeout=self.timeout)
+            except requests.RequestException as e:
+                raise PipedriveApiError(f'GET {path}: {e.__class__.__name__}: {e}') from e
+            if resp.status_code != 429 or attempt == MAX_429_RETRIES:
+                break
+            delay = float(resp.headers.get('Retry-After') or 2 ** attempt)
+            _logger.info('Pipedrive API 429 на %s, пауза %.1f с', path, delay)
+            time.sleep(delay)
+            self.throttled_seconds += delay
+        if resp.status_code != 200:
+            raise PipedriveApiError(f'GET {path}: HTTP {resp.status_code} {resp.text[:200]}')
+        try:
+            payload = resp.json()
+        except ValueError as e:
+            raise PipedriveApiError(f'GET {path}: невалідний JSON {resp.text[:200]}') from e
+        if not payload.get('success', True):
+            raise PipedriveApiError(f'GET {path}: {payload.get("error")}')
+        return payload
+
+    def iter_pages(self, path, params=None):
+        """Пагінує start/limit і віддає повні відповіді сторінок."""
+        start = 0
+        while True:
+            payload = self.get(path, dict(params or {}, start=start, limit=PAGE_SIZE))
+            yield payload
+            pagination = (payload.get('additional_data') or {}).get('pagination') or {}
+            if not pagination.get('more_items_in_collection'):
+                break
+            start = pagination.get('next_start', start + PAGE_SIZE)
+
+    def iter_all(self, path, params=None):
+        """Пагінує start/limit і віддає елементи data по одному."""
+        for payload in self.iter_pages(path, params):
+            yield from payload.get('data') or []
@@ -0,0 +1,93 @@
+"""
+Потокове завантаження записів дзвінків Ringostat у тимчасовий файл.
+
+Файл пишеться частинами по CHUNK_SIZE, тож запис будь-якої довжини не
+тримається в пам'яті. Недокачаний файл (*.part) лишається на диску: наступна
+спроба просить у сервера Range з поточного розміру і дописує хвіст; якщо
+сервер Range не підтримує (200 замість 206) — файл качається заново.
+Якщо файл уже докачано (416 на Range), тип визначається за вмістом: відповідь
+416 описує помилку, а не запис.
+
+Модуль не звертається до бази, тож download() можна викликати з пулу потоків.
+Для перевірки без Ringostat — scripts/ringostat_recording_stub.py.
+"""
+import hashlib
+import os
+
+import requests
+
+CHUNK_SIZE = 256 * 1024
+
+# Сигнатури аудіоформатів Ringostat: (зсув, байти, mimetype)
+AUDIO_SIGNATURES = (
+    (0, b'OggS', 'audio/ogg'),
+    (8, b'WAVE', 'audio/wav'),
+    (0, b'ID3', 'audio/mpeg'),
+    (0, b'\xff\xfb', 'audio/mpeg'),
+    (0, b'\xff\xf3', 'audio/mpeg'),
+)
+
+
+class RecordingGone(Exception):
+    """Ringostat більше не віддає запис (404/410) — повторювати немає сенсу."""
+
+
+class RecordingDownloadError(Exception):
+    """Тимчасова помилка — спробувати пізніше (частина файлу збережена)."""
+
+
+def sniff_mimetype(path):
+    """Mimetype аудіо за сигнатурою файлу або None."""
+    with open(path, 'rb') as f:
+        head = f.read(16)
+    for offset, magic, mimetype in AUDIO_SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return mimetype
+    return None
+
+
+def download(url, part_path, timeout=30, max_bytes=None, chunk_size=CHUNK_SIZE):
+    """Завантажити `url` у `part_path`, докачуючи попередню частину.
+
+    Повертає (sha1 hex, розмір у байтах, mimetype або None) повного файлу.
+    """
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {'Range': 'bytes=%d-' % offset} if offset else {}
+    mimetype = None
+    try:
+        with requests.get(url, headers=headers, stream=True, timeout=timeout) as resp:
+            if resp.status_code in (404, 410):
+                raise RecordingGone('HTTP %s' % resp.status_code)
+            if resp.status_code == 416 and offset:
+                pass  # частина вже містить увесь файл
+            elif resp.status_code in (200, 206):
+                mimetype = (resp.headers.get('Content-Type') or '').split(';')[0].strip() or None
+                if resp.status_code == 200:
+                    offset = 0  # Range проігноровано — починаємо з нуля
+                expected = resp.headers.get('Content-Length')
+                expected = offset + int(expected) if expected and expected.isdigit() else None
+                if max_bytes and expected and expected > max_bytes:
+                    raise RecordingGone('файл %d байт більший за ліміт %d' % (expected, max_bytes))
+                written = offset
+                with open(part_path, 'ab' if offset else 'wb') as f:
+                    for chunk in resp.iter_content(chunk_size):
+                        f.write(chunk)
+                        written += len(chunk)
+                        if max_bytes and written > max_bytes:
+                            raise RecordingGone('файл більший за ліміт %d байт' % max_bytes)
+                if expected is not None and written < expected:
+                    raise RecordingDownloadError(
+                        'обірвано на %d з %d байт' % (written, expected))
+            else:
+                raise RecordingDownloadError('HTTP %s' % resp.status_code)
+    except requests.RequestException as e:
+        raise RecordingDownloadError(str(e)) from e
+
+    sha1, size = hashlib.sha1(), 0
+    with open(part_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha1.update(chunk)
+            size += len(chunk)
+    if not size:
+        raise RecordingDownloadError('порожній файл')
+    return sha1.hexdigest(), size, mimetype or sniff_mimetype(part_path)
@@ -1,3 +1,4 @@
 from . import lead_transfer_wizard
 from . import lead_generate_wizard
 from . import kpi_period_wizard
+from . import ringostat_rollup_wizard
@@ -14,11 +14,10 @@ class RaytonKpiPeriodWizard(models.TransientModel):
     )
 
     def action_compute(self):
-        self.env['rayton.manager.kpi'].action_refresh_all(self.period_date)
-        return {
-            'type': 'ir.actions.act_window',
-            'name': 'КПІ Менеджерів',
-            'res_model': 'rayton.manager.kpi',
-            'view_mode': 'tree',
-            'view_id': self.env.ref('rayton_crm.view_rayton_manager_kpi_tree').id,
-        }
+        # Закритий місяць зі збереженим знімком відкривається одразу; інакше
+        # розрахунок — у фоні (cron під lock), wizard не чекає на нього
+        Kpi = self.env['rayton.manager.kpi']
+        period_start = self.period_date.replace(day=1)
+        if not Kpi.search_count([('period_start', '=', period_start), ('is_closed', '=', True)]):
+            Kpi.action_request_refresh(self.period_date)
+        return Kpi._action_open_period(period_start)
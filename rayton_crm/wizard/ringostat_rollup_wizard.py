@@ -0,0 +1,29 @@
+from datetime import date
+
+from odoo import fields, models
+
+
+class RaytonRingostatRollupWizard(models.TransientModel):
+    _name = 'rayton.ringostat.rollup.wizard'
+    _description = 'Перебудова зведення дзвінків Ringostat'
+
+    date_from = fields.Date(
+        string='З дати',
+        required=True,
+        default=lambda self: date.today().replace(day=1),
+    )
+    date_to = fields.Date(
+        string='По дату',
+        required=True,
+        default=lambda self: date.today(),
+    )
+
+    def action_rebuild(self):
+        self.env['rayton.ringostat.call.daily'].sudo()._rebuild(self.date_from, self.date_to)
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Статистика дзвінків',
+            'res_model': 'rayton.ringostat.call.daily',
+            'view_mode': 'pivot,graph,tree',
+            'domain': [('day', '>=', self.date_from), ('day', '<=', self.date_to)],
+        }
@@ -0,0 +1,138 @@
+"""
+Перевірка планів запитів КПІ / чаттера / Ringostat: чи використовуються індекси з
+rayton_crm (mail_message_crm_lead_activity_idx, crm_lead_user_opportunity_idx,
+rayton_ringostat_call_user_date_idx, rayton_ringostat_call_daily_user_day_idx).
+
+Для кожного запиту — EXPLAIN (ANALYZE, BUFFERS) на реальних даних поточного
+місяця: час, використані індекси і Seq Scan по великих таблицях. Запити лише
+читають дані; транзакція наприкінці відкочується.
+
+COMPARE_WITHOUT = True додатково виконує кожен запит після DROP INDEX у тій самій
+транзакції (потім rollback) — видно різницю "до/після". DROP INDEX бере
+ACCESS EXCLUSIVE на таблицю до кінця транзакції: лише на копії бази!
+
+Запуск:
+  cd /var/odoo/2xqjwr7pzvj.cloudpepper.site
+  sudo -u odoo venv/bin/python3 src/odoo-bin shell -c odoo.conf -d 2xqjwr7pzvj.cloudpepper.site \
+      --no-http < extra-addons/scripts/bench_kpi_indexes.py
+"""
+import json
+from datetime import date
+
+from odoo.addons.rayton_crm.models.rayton_manager_kpi import KPI_SQL
+
+COMPARE_WITHOUT = False
+SAMPLE_LEADS = 200
+BIG_TABLES = ('mail_message', 'crm_lead', 'rayton_ringostat_call')
+
+cr = env.cr
+KPI = env['rayton.manager.kpi'].sudo()
+
+print('=== Плани запитів КПІ / чаттера / Ringostat ===')
+
+# ── 1. Стан індексів ────────────────────────────────────────────────────── #
+INDEXES = {
+    'mail_message_crm_lead_activity_idx':       'mail_message',
+    'crm_lead_user_opportunity_idx':            'crm_lead',
+    'rayton_ringostat_call_user_date_idx':      'rayton_ringostat_call',
+    'rayton_ringostat_call_daily_user_day_idx': 'rayton_ringostat_call_daily',
+}
+cr.execute("""
+    SELECT c.relname, i.indisvalid, pg_size_pretty(pg_relation_size(c.oid))
+    FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+    WHERE c.relname = ANY(%s)
+""", [list(INDEXES)])
+state = {name: (valid, size) for name, valid, size in cr.fetchall()}
+for name, table in INDEXES.items():
+    valid, size = state.get(name, (None, '—'))
+    label = 'OK' if valid else ('НЕВАЛІДНИЙ' if valid is False else 'ВІДСУТНІЙ')
+    print(f'  {name:<42} {table:<28} {label:<10} {size}')
+
+# ── 2. Параметри з реальних даних ───────────────────────────────────────── #
+today = date.today()
+first_day = today.replace(day=1)
+params = KPI._kpi_params(first_day, today)
+managers = (env.ref('rayton_crm.group_manager').users - env.ref('rayton_crm.group_kc_head').users).ids or [0]
+cr.execute("""
+    SELECT id FROM crm_lead
+    WHERE user_id = ANY(%s) AND active AND type = 'opportunity'
+    ORDER BY id DESC LIMIT %s
+""", [managers, SAMPLE_LEADS])
+lead_ids = [r[0] for r in cr.fetchall()] or [0]
+cr.execute("""
+    SELECT user_id FROM rayton_ringostat_call
+    WHERE user_id IS NOT NULL GROUP BY user_id ORDER BY count(*) DESC LIMIT 1
+""")
+row = cr.fetchone()
+busy_user = row[0] if row else 0
+print(f'\n  Менеджерів: {len(managers)}, нагод у вибірці: {len(lead_ids)}, '
+      f'найактивніший користувач Ringostat: {busy_user}')
+
+QUERIES = [
+    ('КПІ: повний розрахунок (KPI_SQL)', KPI_SQL, dict(params, managers=managers),
+     {'mail_message_crm_lead_activity_idx', 'crm_lead_user_opportunity_idx',
+      'rayton_ringostat_call_daily_user_day_idx'}),
+    ('КПІ: перерахунок змінених менеджерів (журнал)', KPI_SQL, dict(params, managers=managers[:3]),
+     {'mail_message_crm_lead_activity_idx', 'crm_lead_user_opportunity_idx'}),
+    ('Активності нагод за місяць', """
+        SELECT COUNT(DISTINCT res_id) FROM mail_message
+        WHERE model = 'crm.lead' AND res_id = ANY(%(lead_ids)s)
+          AND mail_activity_type_id = ANY(%(comm)s)
+          AND date >= %(first_day)s AND date <= %(last_day)s
+     """, dict(params, lead_ids=lead_ids), {'mail_message_crm_lead_activity_idx'}),
+    ('Воронка менеджера', """
+        SELECT l.id FROM crm_lead l JOIN crm_stage s ON s.id = l.stage_id
+        WHERE l.user_id = %(user)s AND l.active AND l.type = 'opportunity'
+          AND s.is_manager_pipeline AND NOT s.is_won
+     """, {'user': managers[0]}, {'crm_lead_user_opportunity_idx'}),
+    ('Дзвінки користувача (список)', """
+        SELECT id, call_date, call_status FROM rayton_ringostat_call
+        WHERE user_id = %(user)s AND call_date >= %(first_day)s
+        ORDER BY call_date DESC LIMIT 80
+     """, dict(params, user=busy_user), {'rayton_ringostat_call_user_date_idx'}),
+    ('RS за місяць (денне зведення)', """
+        SELECT user_id, SUM(call_count) FROM rayton_ringostat_call_daily
+        WHERE user_id = ANY(%(managers)s) AND day >= %(first_day)s AND day <= %(last_day)s
+        GROUP BY user_id
+     """, dict(params, managers=managers), {'rayton_ringostat_call_daily_user_day_idx'}),
+]
+
+
+def walk(node, indexes, seq_scans):
+    if node.get('Index Name'):
+        indexes.add(node['Index Name'])
+    if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') in BIG_TABLES:
+        seq_scans.add(node['Relation Name'])
+    for child in node.get('Plans', []):
+        walk(child, indexes, seq_scans)
+
+
+def explain(sql, args):
+    cr.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql, args)
+    plan = cr.fetchone()[0]
+    plan = plan[0] if isinstance(plan, list) else json.loads(plan)[0]
+    indexes, seq_scans = set(), set()
+    walk(plan['Plan'], indexes, seq_scans)
+    return plan['Execution Time'], indexes, seq_scans
+
+
+# ── 3. Плани ────────────────────────────────────────────────────────────── #
+for title, sql, args, expected in QUERIES:
+    ms, indexes, seq_scans = explain(sql, args)
+    used = expected & indexes
+    print(f'\n  {title}: {ms:.1f} мс — {"✓" if used == expected else "✗"} '
+          f'{len(used)}/{len(expected)} очікуваних індексів')
+    print(f'    індекси: {", ".join(sorted(indexes)) or "—"}')
+    if seq_scans:
+        print(f'    Seq Scan: {", ".join(sorted(seq_scans))}')
+    if COMPARE_WITHOUT and used:
+        cr.execute('SAVEPOINT bench_indexes')
+        for name in used:
+            cr.execute('DROP INDEX "%s"' % name)
+        ms_without, _, seq_without = explain(sql, args)
+        cr.execute('ROLLBACK TO SAVEPOINT bench_indexes')
+        print(f'    без індексів: {ms_without:.1f} мс (×{ms_without / max(ms, 0.001):.1f}), '
+              f'Seq Scan: {", ".join(sorted(seq_without)) or "—"}')
+
+cr.rollback()
+print('\n=== Готово ===')
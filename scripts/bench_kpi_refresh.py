@@ -0,0 +1,190 @@
+"""
+Бенчмарк розрахунку КПІ менеджерів: цикл по менеджерах (було) vs один прохід з GROUP BY (стало).
+
+У транзакції створює MANAGERS тестових менеджерів, по LEADS_PER_MANAGER нагод
+на кожного, MESSAGES повідомлень-активностей у чаттерах цих нагод за поточний
+місяць і денне зведення дзвінків Ringostat. Далі міряє обидва варіанти на
+10 / 25 / 50 менеджерах. Наприкінці — rollback, реальні дані не змінюються.
+
+Запуск:
+  cd /var/odoo/2xqjwr7pzvj.cloudpepper.site
+  sudo -u odoo venv/bin/python3 src/odoo-bin shell -c odoo.conf -d 2xqjwr7pzvj.cloudpepper.site \
+      --no-http < extra-addons/scripts/bench_kpi_refresh.py
+"""
+import time
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+
+MANAGERS = 50
+LEADS_PER_MANAGER = 60
+MESSAGES = 100000
+SCALES = (10, 25, 50)
+REPEAT = 3
+
+cr = env.cr
+KPI = env['rayton.manager.kpi'].sudo()
+
+print(f'=== Бенчмарк КПІ: {MANAGERS} менеджерів, {MESSAGES:,} повідомлень ===')
+
+# ── 1. Тестові дані ─────────────────────────────────────────────────────── #
+t0 = time.perf_counter()
+manager_group = env.ref('rayton_crm.group_manager')
+users = env['res.users'].with_context(no_reset_password=True, mail_create_nolog=True).create([{
+    'name':      f'Bench Менеджер {i:02d}',
+    'login':     f'bench_kpi_{i:02d}@example.com',
+    'groups_id': [(6, 0, [env.ref('base.group_user').id, manager_group.id])],
+} for i in range(MANAGERS)])
+
+stage = env['crm.stage'].search([('is_manager_pipeline', '=', True), ('is_won', '=', False)], limit=1)
+leads = env['crm.lead'].with_context(tracking_disable=True, mail_create_nolog=True).create([{
+    'name':           f'Bench нагода {u.id}-{j}',
+    'type':           'opportunity',
+    'user_id':        u.id,
+    'stage_id':       stage.id,
+    'project_number': f'P-{j}' if j % 3 else False,
+    'power_ses_kw':   50 if j % 2 else 0,
+} for u in users for j in range(LEADS_PER_MANAGER)])
+
+type_ids = env['mail.activity.type'].search([('name', 'in', [
+    'Телефонний дзвінок Клієнту', 'Вихідний дзвінок', 'Вхідний дзвінок',
+    'Онлайн-зустріч', 'Офлайн-зустріч',
+])]).ids or [0]
+first_day = date.today().replace(day=1)
+cr.execute("""
+    INSERT INTO mail_message (model, res_id, message_type, body, author_id,
+                              mail_activity_type_id, date,
+                              create_uid, create_date, write_uid, write_date)
+    SELECT 'crm.lead',
+           (%(leads)s)[1 + g %% array_length(%(leads)s, 1)],
+           'comment', '<p>bench</p>', u.partner_id,
+           (%(types)s)[1 + g %% array_length(%(types)s, 1)],
+           %(first)s::timestamp + (g %% 27) * interval '1 day',
+           1, now(), 1, now()
+    FROM generate_series(1, %(n)s) g
+    JOIN res_users u ON u.id = (%(users)s)[1 + g %% array_length(%(users)s, 1)]
+""", {'leads': leads.ids, 'types': type_ids, 'users': users.ids, 'first': first_day, 'n': MESSAGES})
+cr.execute("""
+    INSERT INTO rayton_ringostat_call_daily
+        (user_id, day, call_type, call_status, call_count, total_seconds, total_minutes,
+         create_uid, create_date, write_uid, write_date)
+    SELECT u, %(first)s::date + d, t, s, 5, 600, 10, 1, now(), 1, now()
+    FROM unnest(%(users)s) u, generate_series(0, 26) d,
+         unnest(ARRAY['transitin', 'transitout']) t, unnest(ARRAY['ANSWERED', 'BUSY', 'NO_ANSWER']) s
+""", {'users': users.ids, 'first': first_day})
+cr.execute("ANALYZE mail_message")
+cr.execute("ANALYZE crm_lead")
+print(f'  Підготовка: {time.perf_counter() - t0:.1f} с')
+
+comm = type_ids
+params = {
+    'first_day': first_day,
+    'last_day':  first_day + relativedelta(months=1) - relativedelta(days=1),
+    'today':     date.today(),
+    'comm':      comm,
+    'meeting':   comm[-2:],
+    'auto':      comm[:2],
+    'manual':    comm[0],
+}
+
+
+# ── 2. Було: ~10 запитів + search/write на кожного менеджера ────────────── #
+def legacy_refresh(manager_ids):
+    queries = 0
+    for manager_id in manager_ids:
+        lead_ids = env['crm.lead'].search([
+            ('user_id', '=', manager_id),
+            ('active', '=', True),
+            ('stage_id.is_won', '=', False),
+            ('stage_id.is_manager_pipeline', '=', True),
+            ('type', '=', 'opportunity'),
+        ]).ids
+        for sql, args in (
+            ("""SELECT COUNT(DISTINCT res_id) FROM mail_message
+                WHERE model = 'crm.lead' AND res_id = ANY(%s) AND mail_activity_type_id = ANY(%s)
+                  AND date >= %s AND date <= %s""",
+             [lead_ids, params['comm'], params['first_day'], params['last_day']]),
+            ("SELECT COUNT(*) FROM crm_lead WHERE id = ANY(%s) AND pipedrive_next_activity_date IS NOT NULL",
+             [lead_ids]),
+            ("""SELECT COUNT(*) FROM crm_lead WHERE id = ANY(%s)
+                  AND pipedrive_next_activity_date IS NOT NULL AND pipedrive_next_activity_date < %s""",
+             [lead_ids, params['today']]),
+            ("""SELECT COUNT(DISTINCT l.id) FROM crm_lead l JOIN res_partner c ON c.parent_id = l.partner_id
+                WHERE l.id = ANY(%s) AND c.function IS NOT NULL AND c.function != ''""",
+             [lead_ids]),
+            ("""SELECT COUNT(CASE WHEN project_number IS NOT NULL AND project_number != '' THEN 1 END),
+                       COUNT(CASE WHEN advance_planned_date IS NOT NULL THEN 1 END),
+                       COUNT(CASE WHEN project_type IS NOT NULL THEN 1 END),
+                       COUNT(CASE WHEN power_ses_kw > 0 OR capacity_uze_kwh > 0 THEN 1 END)
+                FROM crm_lead WHERE id = ANY(%s)""",
+             [lead_ids]),
+            ("""SELECT COUNT(*) FROM mail_message
+                WHERE model = 'crm.lead' AND res_id = ANY(%s) AND mail_activity_type_id = ANY(%s)
+                  AND date >= %s AND date <= %s""",
+             [lead_ids, params['auto'], params['first_day'], params['last_day']]),
+            ("""SELECT COUNT(mm.id) FROM mail_message mm JOIN res_users u ON u.partner_id = mm.author_id
+                WHERE mm.model = 'crm.lead' AND mm.res_id = ANY(%s) AND mm.mail_activity_type_id = %s
+                  AND u.id = %s AND mm.date >= %s AND mm.date <= %s""",
+             [lead_ids, params['manual'], manager_id, params['first_day'], params['last_day']]),
+            ("""SELECT COUNT(*) FROM mail_message
+                WHERE model = 'crm.lead' AND res_id = ANY(%s) AND mail_activity_type_id = ANY(%s)
+                  AND date >= %s AND date <= %s""",
+             [lead_ids, params['meeting'], params['first_day'], params['last_day']]),
+            ("""SELECT COUNT(*), SUM(call_count) FROM rayton_ringostat_call_daily
+                WHERE user_id = %s AND day >= %s AND day <= %s""",
+             [manager_id, params['first_day'], params['last_day']]),
+        ):
+            cr.execute(sql, args)
+            cr.fetchall()
+            queries += 1
+        existing = KPI.search([('user_id', '=', manager_id), ('period_start', '=', first_day)], limit=1)
+        if existing:
+            existing.write({'lead_count': len(lead_ids), 'computed_at': fields.Datetime.now()})
+        else:
+            KPI.create({'user_id': manager_id, 'period_start': first_day, 'lead_count': len(lead_ids)})
+        KPI.flush_model()
+        queries += 3
+    return queries
+
+
+def set_based_refresh(manager_ids):
+    rows = KPI._compute_kpi_rows(manager_ids, params)
+    KPI._upsert_kpi_rows(rows, first_day)
+    return 2
+
+
+def measure(fn, manager_ids):
+    timings = []
+    for _ in range(REPEAT):
+        cr.execute('SAVEPOINT bench_kpi')
+        t = time.perf_counter()
+        queries = fn(manager_ids)
+        timings.append(time.perf_counter() - t)
+        cr.execute('ROLLBACK TO SAVEPOINT bench_kpi')
+        env.invalidate_all()
+    return min(timings), queries
+
+
+print(f'\n  {"менеджерів":>10} | {"було, с":>8} {"запитів":>8} | {"стало, с":>8} {"запитів":>8} | прискорення')
+for n in SCALES:
+    ids = users.ids[:n]
+    old_s, old_q = measure(legacy_refresh, ids)
+    new_s, new_q = measure(set_based_refresh, ids)
+    print(f'  {n:>10} | {old_s:>8.3f} {old_q:>8} | {new_s:>8.3f} {new_q:>8} | ×{old_s / max(new_s, 0.0001):.1f}')
+
+# Перевірка: обидва варіанти дають однакові числа (на найбільшому наборі)
+rows = {r['user_id']: r for r in KPI._compute_kpi_rows(users.ids, params)}
+sample = users[0]
+cr.execute("""
+    SELECT COUNT(DISTINCT mm.res_id)
+    FROM mail_message mm JOIN crm_lead l ON l.id = mm.res_id
+    WHERE mm.model = 'crm.lead' AND l.user_id = %s AND mm.mail_activity_type_id = ANY(%s)
+      AND mm.date >= %s AND mm.date <= %s
+""", [sample.id, params['comm'], params['first_day'], params['last_day']])
+print(f'\n  Контроль ({sample.name}): leads_with_comm {rows[sample.id]["leads_with_comm"]} '
+      f'= {cr.fetchone()[0]}, lead_count {rows[sample.id]["lead_count"]} = {LEADS_PER_MANAGER}')
+
+cr.rollback()
+print('\n=== Готово (тестові дані видалено) ===')
@@ -0,0 +1,73 @@
+"""
+Бенчмарк пошуку контакту за номером дзвінка: LIKE '%suffix%' vs phone_suffix9 = suffix.
+
+Генерує у тимчасовій таблиці N номерів (за замовч. 1 000 000) у форматі
+res_partner_phone, будує ті самі індекси, що й Odoo (btree на phone і на
+phone_suffix9), і міряє обидва варіанти запиту на випадкових номерах.
+Реальні дані не змінюються — таблиця TEMP і зникає разом з транзакцією.
+
+Запуск:
+  cd /var/odoo/2xqjwr7pzvj.cloudpepper.site
+  sudo -u odoo venv/bin/python3 src/odoo-bin shell -c odoo.conf -d 2xqjwr7pzvj.cloudpepper.site \
+      --no-http < extra-addons/scripts/bench_phone_suffix.py
+"""
+import random
+import time
+
+ROWS = 1000000
+LOOKUPS = 200
+
+cr = env.cr
+
+print(f'=== Бенчмарк пошуку за номером ({ROWS:,} номерів) ===')
+
+t0 = time.perf_counter()
+cr.execute("""
+    CREATE TEMP TABLE bench_partner_phone ON COMMIT DROP AS
+    SELECT g AS id,
+           g / 3 AS partner_id,
+           '380' || lpad((670000000 + g * 7 % 329999999)::text, 9, '0') AS phone
+    FROM generate_series(1, %s) g
+""", [ROWS])
+cr.execute("ALTER TABLE bench_partner_phone ADD COLUMN phone_suffix9 varchar(9)")
+cr.execute("UPDATE bench_partner_phone SET phone_suffix9 = right(phone, 9)")
+cr.execute("CREATE INDEX ON bench_partner_phone (phone)")
+cr.execute("CREATE INDEX ON bench_partner_phone (phone_suffix9)")
+cr.execute("ANALYZE bench_partner_phone")
+print(f'  Підготовка: {time.perf_counter() - t0:.1f} с')
+
+cr.execute("SELECT right(phone, 9) FROM bench_partner_phone ORDER BY random() LIMIT %s", [LOOKUPS // 2])
+suffixes = [r[0] for r in cr.fetchall()]
+# Половина — номери, яких немає в базі (типовий вхідний від нового клієнта)
+suffixes += ['%09d' % random.randint(0, 99999999) for _ in range(LOOKUPS - len(suffixes))]
+
+QUERIES = {
+    'LIKE %suffix% (було)':     "SELECT partner_id FROM bench_partner_phone WHERE phone LIKE %s",
+    'phone_suffix9 = (стало)':  "SELECT partner_id FROM bench_partner_phone WHERE phone_suffix9 = %s",
+}
+
+results = {}
+for label, sql in QUERIES.items():
+    param = (lambda s: '%' + s + '%') if 'LIKE' in sql else (lambda s: s)
+    timings = []
+    for suffix in suffixes:
+        t = time.perf_counter()
+        cr.execute(sql, [param(suffix)])
+        cr.fetchall()
+        timings.append((time.perf_counter() - t) * 1000)
+    timings.sort()
+    results[label] = timings
+    cr.execute('EXPLAIN ' + sql, [param(suffixes[0])])
+    plan = cr.fetchall()[0][0]
+    print(f'\n  {label}')
+    print(f'    план: {plan}')
+    print(f'    p50 {timings[len(timings) // 2]:.3f} мс, '
+          f'p95 {timings[int(len(timings) * 0.95)]:.3f} мс, '
+          f'max {timings[-1]:.3f} мс, '
+          f'всього {sum(timings):.0f} мс на {len(timings)} пошуків')
+
+old, new = (results[label] for label in QUERIES)
+print(f'\n  Прискорення (p50): ×{old[len(old) // 2] / max(new[len(new) // 2], 0.001):.0f}')
+
+cr.rollback()
+print('\n=== Готово (тимчасову таблицю видалено) ===')
@@ -61,22 +61,14 @@ print('Читаємо xlsx...')
 df = pd.read_excel(XLSX_PATH)
 print(f'Завантажено {len(df)} організацій')
 
-# Завантажуємо всі external IDs за один запит
-imd = env['ir.model.data'].search_read(
-    [('module', '=', '__import__'), ('model', '=', 'res.partner'),
-     ('name', 'like', 'pipedrive_org_')],
-    ['name', 'res_id']
-)
+# Завантажуємо всі організації з pipedrive_org_id за один запит
 # Будуємо словник: pipedrive_id -> odoo_partner_id
-pd_to_odoo = {}
-for rec in imd:
-    try:
-        pd_id = int(rec['name'].replace('pipedrive_org_', ''))
-        pd_to_odoo[pd_id] = rec['res_id']
-    except ValueError:
-        pass
-
-print(f'Знайдено {len(pd_to_odoo)} external IDs в Odoo')
+orgs = env['res.partner'].with_context(active_test=False).search_read(
+    [('pipedrive_org_id', '>', 0)], ['pipedrive_org_id']
+)
+pd_to_odoo = {r['pipedrive_org_id']: r['id'] for r in orgs}
+
+print(f'Знайдено {len(pd_to_odoo)} організацій Pipedrive в Odoo')
 
 updated = 0
 skipped = 0
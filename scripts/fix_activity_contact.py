@@ -19,13 +19,11 @@ print(f'  {len(df)} рядків в activities.xlsx')
 df_contact = df[df['Контактна особа'].notna() & (df['Контактна особа'].astype(str).str.strip() != '')].copy()
 print(f'  {len(df_contact)} рядків з контактною особою')
 
-# act_id → message_id через ir_model_data
-env.cr.execute("""
-    SELECT name, res_id FROM ir_model_data
-    WHERE module = '__import__'
-      AND model = 'mail.message'
-      AND name LIKE 'pipedrive_act_%'
-""")
+# act_id → message_id через mail_message.pipedrive_activity_id
+env.cr.execute(
+    "SELECT pipedrive_activity_id, id FROM mail_message WHERE pipedrive_activity_id = ANY(%s)",
+    [[int(x) for x in df_contact['Ідентифікатор']]],
+)
 ext_map = {r[0]: r[1] for r in env.cr.fetchall()}
 print(f'  {len(ext_map)} activity-повідомлень в Odoo')
 
@@ -42,7 +40,7 @@ updates = []  # (new_body, msg_id)
 
 for _, row in df_contact.iterrows():
     act_id = int(row['Ідентифікатор'])
-    msg_id = ext_map.get('pipedrive_act_%d' % act_id)
+    msg_id = ext_map.get(act_id)
     if not msg_id:
         not_found += 1
         continue
@@ -109,14 +109,12 @@ for _, row in df.iterrows():
 
 print(f'  {len(act_id_to_type)} активностей з відомим типом')
 
-# --- Крок 4: Завантажуємо ir_model_data ext IDs ---
-print('\n[2] Завантажуємо ir_model_data...')
-env.cr.execute("""
-    SELECT name, res_id FROM ir_model_data
-    WHERE module = '__import__'
-      AND model = 'mail.message'
-      AND name LIKE 'pipedrive_act_%'
-""")
+# --- Крок 4: Завантажуємо pipedrive_activity_id → message id ---
+print('\n[2] Завантажуємо activity-повідомлення...')
+env.cr.execute(
+    "SELECT pipedrive_activity_id, id FROM mail_message WHERE pipedrive_activity_id = ANY(%s)",
+    [list(act_id_to_type)],
+)
 ext_map = {r[0]: r[1] for r in env.cr.fetchall()}
 print(f'  {len(ext_map)} повідомлень в Odoo')
 
@@ -127,7 +125,7 @@ from collections import defaultdict
 by_type = defaultdict(list)  # type_id → [msg_id, ...]
 
 for act_id, type_id in act_id_to_type.items():
-    msg_id = ext_map.get('pipedrive_act_%d' % act_id)
+    msg_id = ext_map.get(act_id)
     if msg_id:
         by_type[type_id].append(msg_id)
 
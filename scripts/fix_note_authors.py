@@ -86,18 +86,11 @@ df = pd.read_excel(NOTES_PATH)
 print(f'  {len(df)} нотаток')
 
 # --- Завантажуємо маппінг pipedrive_note_id → mail.message.id ---
-print('Завантажуємо ir.model.data...')
-env.cr.execute("""
-    SELECT name, res_id
-    FROM ir_model_data
-    WHERE module = '__import__'
-      AND model = 'mail.message'
-      AND name LIKE 'pipedrive_note_%'
-""")
-note_id_to_msg_id = {
-    int(r[0].replace('pipedrive_note_', '')): r[1]
-    for r in env.cr.fetchall()
-}
+print('Завантажуємо нотатки (pipedrive_note_id)...')
+env.cr.execute(
+    "SELECT pipedrive_note_id, id FROM mail_message WHERE pipedrive_note_id IS NOT NULL"
+)
+note_id_to_msg_id = {r[0]: r[1] for r in env.cr.fetchall()}
 print(f'  {len(note_id_to_msg_id)} нотаток в системі')
 
 # --- Будуємо список виправлень: (message_id, correct_pid) ---
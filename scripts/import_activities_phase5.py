@@ -101,12 +101,9 @@ def get_author_pid(username):
 
 # --- Видаляємо старі імпортовані активності ---
 print('\n[1] Видалення старих activity messages...')
-env.cr.execute("""
-    SELECT res_id FROM ir_model_data
-    WHERE module = '__import__'
-      AND model = 'mail.message'
-      AND name LIKE 'pipedrive_act_%'
-""")
+env.cr.execute(
+    "SELECT id FROM mail_message WHERE pipedrive_activity_id IS NOT NULL"
+)
 old_msg_ids = [r[0] for r in env.cr.fetchall()]
 print(f'  Знайдено старих: {len(old_msg_ids)}')
 
@@ -116,12 +113,6 @@ if old_msg_ids:
     for i in range(0, len(old_msg_ids), batch):
         chunk = old_msg_ids[i:i+batch]
         env.cr.execute("DELETE FROM mail_message WHERE id = ANY(%s)", [chunk])
-    env.cr.execute("""
-        DELETE FROM ir_model_data
-        WHERE module = '__import__'
-          AND model = 'mail.message'
-          AND name LIKE 'pipedrive_act_%'
-    """)
     env.cr.commit()
     print(f'  ✓ Видалено {len(old_msg_ids)} повідомлень')
 
@@ -139,11 +130,10 @@ persons = env['res.partner'].search_read([('pipedrive_person_id', '>', 0)], ['pi
 person_to_partner = {r['pipedrive_person_id']: r['id'] for r in persons}
 print(f'  {len(person_to_partner)} контактів')
 
-imd = env['ir.model.data'].search_read(
-    [('module', '=', '__import__'), ('model', '=', 'res.partner'), ('name', 'like', 'pipedrive_org_')],
-    ['name', 'res_id']
+orgs = env['res.partner'].with_context(active_test=False).search_read(
+    [('pipedrive_org_id', '>', 0)], ['pipedrive_org_id']
 )
-org_to_partner = {int(r['name'].replace('pipedrive_org_', '')): r['res_id'] for r in imd}
+org_to_partner = {r['pipedrive_org_id']: r['id'] for r in orgs}
 print(f'  {len(org_to_partner)} організацій')
 
 # --- Читаємо Excel ---
@@ -238,21 +228,15 @@ for _, row in df.iterrows():
     body = '<p>' + '<br/>'.join(lines) + '</p>'
 
     try:
-        msg = env['mail.message'].sudo().create({
-            'res_id':       res_id,
-            'model':        res_model,
-            'body':         body,
-            'date':         date_str,
-            'author_id':    author_pid,
-            'message_type': 'comment',
-            'subtype_id':   mt_activities,   # виглядає як виконана дія (Дії в чаттері)
-        })
-
-        env['ir.model.data'].sudo().create({
-            'module':   '__import__',
-            'model':    'mail.message',
-            'name':     'pipedrive_act_%d' % act_id,
-            'res_id':   msg.id,
+        env['mail.message'].sudo().create({
+            'res_id':                res_id,
+            'model':                 res_model,
+            'body':                  body,
+            'date':                  date_str,
+            'author_id':             author_pid,
+            'message_type':          'comment',
+            'subtype_id':            mt_activities,   # виглядає як виконана дія (Дії в чаттері)
+            'pipedrive_activity_id': act_id,
         })
 
         created += 1
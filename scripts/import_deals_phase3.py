@@ -83,12 +83,10 @@ print(f'Завантажено {len(df)} нагод')
 
 # 1. pipedrive org_id → odoo partner_id
 print('Завантажуємо довідники...')
-imd = env['ir.model.data'].search_read(
-    [('module', '=', '__import__'), ('model', '=', 'res.partner'),
-     ('name', 'like', 'pipedrive_org_')],
-    ['name', 'res_id']
+orgs = env['res.partner'].with_context(active_test=False).search_read(
+    [('pipedrive_org_id', '>', 0)], ['pipedrive_org_id']
 )
-org_to_odoo = {int(r['name'].replace('pipedrive_org_', '')): r['res_id'] for r in imd}
+org_to_odoo = {r['pipedrive_org_id']: r['id'] for r in orgs}
 
 # 2. pipedrive person_id → odoo partner_id
 person_partners = env['res.partner'].search_read(
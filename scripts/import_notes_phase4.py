@@ -39,13 +39,11 @@ persons = env['res.partner'].search_read(
 person_to_partner = {r['pipedrive_person_id']: r['id'] for r in persons}
 print(f'  {len(person_to_partner)} контактів в системі')
 
-# 3. pipedrive org_id → res.partner.id (через ir.model.data)
-imd = env['ir.model.data'].search_read(
-    [('module', '=', '__import__'), ('model', '=', 'res.partner'),
-     ('name', 'like', 'pipedrive_org_')],
-    ['name', 'res_id']
+# 3. pipedrive org_id → res.partner.id (індексоване поле pipedrive_org_id)
+orgs = env['res.partner'].with_context(active_test=False).search_read(
+    [('pipedrive_org_id', '>', 0)], ['pipedrive_org_id']
 )
-org_to_partner = {int(r['name'].replace('pipedrive_org_', '')): r['res_id'] for r in imd}
+org_to_partner = {r['pipedrive_org_id']: r['id'] for r in orgs}
 print(f'  {len(org_to_partner)} організацій в системі')
 
 # 4. Користувачі за іменем → partner_id
@@ -71,21 +69,13 @@ def find_author(username):
 # 5. Subtype для внутрішньої нотатки
 mt_note = env.ref('mail.mt_note').id
 
-# 6. Вже імпортовані (за pipedrive_note_id якщо є, або skip дублі по content+date)
-# Зберігаємо в пам'яті set вже оброблених IDs через custom field або просто не перевіряємо
-# (скрипт ідемпотентний — якщо запустити двічі, дублі нотаток з'являться)
-# Тому перевіряємо через ir.model.data
-existing_notes = set()
-imd_notes = env['ir.model.data'].search_read(
-    [('module', '=', '__import__'), ('model', '=', 'mail.message'),
-     ('name', 'like', 'pipedrive_note_')],
-    ['name']
+# 6. Вже імпортовані — лише ID з цього файлу, один запит по унікальному
+# індексу mail_message.pipedrive_note_id (без завантаження всієї історії)
+env.cr.execute(
+    "SELECT pipedrive_note_id FROM mail_message WHERE pipedrive_note_id = ANY(%s)",
+    [[int(x) for x in df['Ідентифікатор'].dropna().unique()]],
 )
-for r in imd_notes:
-    try:
-        existing_notes.add(int(r['name'].replace('pipedrive_note_', '')))
-    except ValueError:
-        pass
+existing_notes = {r[0] for r in env.cr.fetchall()}
 print(f'  {len(existing_notes)} вже імпортованих нотаток')
 
 # --- Основний цикл ---
@@ -151,22 +141,16 @@ for _, row in df.iterrows():
     body = f'<p>{content}</p>'
 
     try:
-        msg = env['mail.message'].sudo().create({
-            'res_id':       res_id,
-            'model':        res_model,
-            'body':         body,
-            'date':         date_str,
-            'author_id':    author_pid,
-            'message_type': 'comment',
-            'subtype_id':   mt_note,
-        })
-
-        # Зберігаємо external ID щоб уникнути дублів при повторному запуску
-        env['ir.model.data'].sudo().create({
-            'module':   '__import__',
-            'model':    'mail.message',
-            'name':     f'pipedrive_note_{note_id}',
-            'res_id':   msg.id,
+        # pipedrive_note_id — щоб уникнути дублів при повторному запуску
+        env['mail.message'].sudo().create({
+            'res_id':            res_id,
+            'model':             res_model,
+            'body':              body,
+            'date':              date_str,
+            'author_id':         author_pid,
+            'message_type':      'comment',
+            'subtype_id':        mt_note,
+            'pipedrive_note_id': note_id,
         })
 
         created += 1
@@ -48,20 +48,12 @@ print(f'Завантажено {len(df)} контактів')
 # --- Будуємо словники для швидкого пошуку ---
 
 # 1. pipedrive org_id → odoo partner_id
-print('Завантажуємо external IDs...')
-imd = env['ir.model.data'].search_read(
-    [('module', '=', '__import__'), ('model', '=', 'res.partner'),
-     ('name', 'like', 'pipedrive_org_')],
-    ['name', 'res_id']
+print('Завантажуємо організації (pipedrive_org_id)...')
+orgs = env['res.partner'].with_context(active_test=False).search_read(
+    [('pipedrive_org_id', '>', 0)], ['pipedrive_org_id']
 )
-org_to_odoo = {}
-for rec in imd:
-    try:
-        pd_org_id = int(rec['name'].replace('pipedrive_org_', ''))
-        org_to_odoo[pd_org_id] = rec['res_id']
-    except ValueError:
-        pass
-print(f'  {len(org_to_odoo)} org external IDs')
+org_to_odoo = {r['pipedrive_org_id']: r['id'] for r in orgs}
+print(f'  {len(org_to_odoo)} організацій')
 
 # 2. Вже імпортовані pipedrive_person_id → skip
 existing_person_ids = set(
@@ -88,20 +88,12 @@ if not cf_key_примітка:
 
 # ── Load Odoo lookups ──────────────────────────────────────────────────────────
 
-print('Завантажуємо org external IDs (ir.model.data)...')
-imd_rows = env['ir.model.data'].search_read(
-    [('module', '=', '__import__'), ('model', '=', 'res.partner'),
-     ('name', 'like', 'pipedrive_org_')],
-    ['name', 'res_id'],
+print('Завантажуємо організації (pipedrive_org_id)...')
+orgs = env['res.partner'].with_context(active_test=False).search_read(
+    [('pipedrive_org_id', '>', 0)], ['pipedrive_org_id']
 )
-org_to_odoo = {}
-for rec in imd_rows:
-    try:
-        pd_org_id = int(rec['name'].replace('pipedrive_org_', ''))
-        org_to_odoo[pd_org_id] = rec['res_id']
-    except ValueError:
-        pass
-print(f'  {len(org_to_odoo)} org external IDs завантажено')
+org_to_odoo = {r['pipedrive_org_id']: r['id'] for r in orgs}
+print(f'  {len(org_to_odoo)} організацій завантажено')
 
 print('Завантажуємо вже імпортовані person IDs...')
 rows_existing = env['res.partner'].search_read(
@@ -61,12 +61,10 @@ existing_ids = set(
 print(f'  Вже імпортовано: {len(existing_ids)}')
 
 # 3. org_id → odoo partner_id
-imd = env['ir.model.data'].search_read(
-    [('module', '=', '__import__'), ('model', '=', 'res.partner'),
-     ('name', 'like', 'pipedrive_org_')],
-    ['name', 'res_id']
+orgs = env['res.partner'].with_context(active_test=False).search_read(
+    [('pipedrive_org_id', '>', 0)], ['pipedrive_org_id']
 )
-org_to_odoo = {int(r['name'].replace('pipedrive_org_', '')): r['res_id'] for r in imd}
+org_to_odoo = {r['pipedrive_org_id']: r['id'] for r in orgs}
 
 # 4. Існуючі телефони
 existing_phones = {}
@@ -0,0 +1,261 @@
+"""
+Масовий імпорт історії дзвінків Ringostat (CSV / JSON Lines експорт) → rayton.ringostat.call.
+
+Замість create_from_webhook по одному дзвінку:
+  - файл читається потоково частинами по CHUNK рядків (pandas chunksize);
+  - внутрішні номери відсікаються і телефони зіставляються векторно
+    (суфікс 9 цифр → словник suffix → partner_ids, завантажений один раз);
+  - дзвінки і повідомлення в чаттер створюються multi-create пачками,
+    commit кожні COMMIT_EVERY рядків — перерваний імпорт можна просто
+    запустити ще раз: вже імпортовані дзвінки відсіюються по idempotency_key.
+
+Невідомі номери НЕ створюють контакт і лід (на відміну від webhook) —
+для історичних дзвінків це були б сотні мертвих лідів; дзвінок зберігається
+без ліда. Змінити можна через CREATE_MESSAGES / SKIP_UNKNOWN.
+Lock номера (rayton.ringostat.phone) імпорт не бере: він не створює контакти
+і ліди, тож дублів з webhook-обробкою, що йде паралельно, бути не може.
+
+DRY_RUN = True — все зіставлення і звіт, але без запису в базу: нові
+співробітники Ringostat лише зіставляються, в таблицю відповідностей не додаються.
+
+Запуск на сервері:
+  cd /var/odoo/2xqjwr7pzvj.cloudpepper.site
+  sudo -u odoo venv/bin/python3 src/odoo-bin shell -c odoo.conf -d 2xqjwr7pzvj.cloudpepper.site \
+      --no-http < extra-addons/scripts/import_ringostat_history.py
+"""
+import json
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import pandas as pd
+
+EXPORT_PATH = '/var/odoo/2xqjwr7pzvj.cloudpepper.site/extra-addons/scripts/ringostat_export.csv'
+DRY_RUN = True
+CHUNK = 5000            # рядків на одну порцію читання / multi-create
+COMMIT_EVERY = 20000    # commit після стількох прочитаних рядків
+CREATE_MESSAGES = True  # постити дзвінок у чаттер контакту / компанії / нагод
+SKIP_UNKNOWN = False    # True — дзвінки з невідомих номерів не зберігати взагалі
+ARCHIVE_RECORDINGS = False  # True — поставити записи в чергу архівації (старі посилання часто вже мертві)
+
+# Колонка експорту → ключ payload webhook-а (як у create_from_webhook)
+COLUMN_MAP = {
+    'call_date':        'call_date',
+    'call_type':        'call_type',
+    'caller_number':    'caller_number',
+    'call_destination': 'call_destination',
+    'employee':         'employee',
+    'department':       'department',
+    'call_status':      'call_status',
+    'call_duration':    'call_duration',
+    'internal_number':  'internal_number',
+    'has_recording':    'has_recording',
+    'recording':        'recording',
+    'recording_wav':    'recording_wav',
+    'uniqueid':         'uniqueid',
+}
+
+Call = env['rayton.ringostat.call'].sudo().with_context(tracking_disable=True)
+Msg = env['mail.message'].sudo()
+Event = env['rayton.ringostat.event']
+Employee = env['rayton.ringostat.employee'].sudo()
+
+print('=== Імпорт історії дзвінків Ringostat ===')
+print(f'  Файл: {EXPORT_PATH}  {"(DRY RUN)" if DRY_RUN else ""}')
+
+# ── 1. Довідники в пам'ять ──────────────────────────────────────────────── #
+t0 = time.perf_counter()
+print('Завантажуємо довідники...')
+
+excluded = env['rayton.ringostat.excluded.phone']._get_excluded_set()
+
+env.cr.execute("""
+    SELECT p.phone_suffix9, p.partner_id
+    FROM res_partner_phone p
+    JOIN res_partner rp ON rp.id = p.partner_id AND rp.active
+    WHERE p.phone_suffix9 IS NOT NULL
+""")
+suffix_partners = defaultdict(list)
+for suffix, partner_id in env.cr.fetchall():
+    suffix_partners[suffix].append(partner_id)
+suffix_partners = dict(suffix_partners)  # без __missing__ — інакше Series.map створює ключі
+
+env.cr.execute("SELECT id, parent_id FROM res_partner WHERE parent_id IS NOT NULL")
+parent_of = dict(env.cr.fetchall())
+
+env.cr.execute("""
+    SELECT l.partner_id, l.id
+    FROM crm_lead l
+    JOIN crm_stage s ON s.id = l.stage_id
+    WHERE l.active AND l.type = 'opportunity' AND NOT s.is_won AND l.partner_id IS NOT NULL
+""")
+leads_of = defaultdict(list)
+for partner_id, lead_id in env.cr.fetchall():
+    leads_of[partner_id].append(lead_id)
+
+subtype_id, root_partner_id = Call._get_chatter_ids()
+activity_type_ids = {ct: Call._get_activity_type_id(ct) for ct in ('transitin', 'transitout')}
+env.cr.execute("SELECT id, partner_id FROM res_users WHERE NOT share")
+user_partner = dict(env.cr.fetchall())
+user_by_employee = {}
+
+print(f'  {len(suffix_partners)} номерів, {len(leads_of)} контактів з відкритими нагодами, '
+      f'{len(excluded)} внутрішніх номерів ({time.perf_counter() - t0:.1f} с)')
+
+
+# ── 2. Потокове читання ─────────────────────────────────────────────────── #
+def read_chunks(path):
+    if path.endswith('.jsonl') or path.endswith('.ndjson'):
+        return pd.read_json(path, lines=True, chunksize=CHUNK, dtype=False)
+    sep = ';' if path.endswith('.txt') else ','
+    return pd.read_csv(path, chunksize=CHUNK, dtype=str, sep=sep, keep_default_na=False)
+
+
+def digits_suffix(series):
+    """Векторно: рядок номера → останні 9 цифр (None, якщо цифр < 7)."""
+    digits = series.fillna('').astype(str).str.replace(r'\D', '', regex=True)
+    return digits.str[-9:].where(digits.str.len() >= 7)
+
+
+stats = defaultdict(int)
+since_commit = 0
+started = time.perf_counter()
+
+for chunk in read_chunks(EXPORT_PATH):
+    chunk = chunk.rename(columns=COLUMN_MAP)
+    for col in COLUMN_MAP.values():
+        if col not in chunk:
+            chunk[col] = ''
+    chunk = chunk.fillna('').astype(str)
+    stats['read'] += len(chunk)
+
+    chunk['call_type'] = chunk['call_type'].where(
+        chunk['call_type'].isin(['transitin', 'transitout']), 'transitin')
+    ext = chunk['caller_number'].where(chunk['call_type'] == 'transitin', chunk['call_destination'])
+    chunk['ext_phone'] = ext
+    chunk['suffix'] = digits_suffix(ext)
+
+    # Внутрішні дзвінки
+    internal = chunk['suffix'].isin(excluded)
+    stats['internal'] += int(internal.sum())
+    chunk = chunk[~internal].copy()
+
+    # Ключі ідемпотентності + відсів вже імпортованих (і дублів у файлі)
+    chunk['key'] = [Event._idempotency_key(row) for row in chunk[list(COLUMN_MAP.values())].to_dict('records')]
+    dup_in_file = chunk['key'].duplicated()
+    stats['duplicate'] += int(dup_in_file.sum())
+    chunk = chunk[~dup_in_file]
+    env.cr.execute("""
+        SELECT idempotency_key FROM rayton_ringostat_call WHERE idempotency_key = ANY(%(keys)s)
+        UNION ALL
+        SELECT idempotency_key FROM rayton_ringostat_call_archive WHERE idempotency_key = ANY(%(keys)s)
+    """, {'keys': chunk['key'].tolist()})
+    existing = {r[0] for r in env.cr.fetchall()}
+    already = chunk['key'].isin(existing)
+    stats['duplicate'] += int(already.sum())
+    chunk = chunk[~already].copy()
+
+    # Векторне зіставлення з контактами
+    chunk['partners'] = chunk['suffix'].map(suffix_partners)
+    known = chunk['partners'].notna()
+    stats['matched'] += int(known.sum())
+    stats['unknown'] += int((~known).sum())
+    if SKIP_UNKNOWN:
+        chunk = chunk[known]
+
+    call_vals, msg_vals, msg_counts = [], [], []
+    for row in chunk.itertuples(index=False):
+        employee = row.employee
+        if employee not in user_by_employee:
+            user_by_employee[employee] = Employee._resolve_user(employee, register=not DRY_RUN).id
+        user_id = user_by_employee[employee]
+
+        try:
+            call_date = datetime.strptime(row.call_date, '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            stats['bad_date'] += 1
+            continue
+        try:
+            duration = int(float(row.call_duration or 0))
+        except ValueError:
+            duration = 0
+
+        partner_ids = row.partners if isinstance(row.partners, list) else []
+        targets = list(dict.fromkeys(partner_ids + [parent_of[p] for p in partner_ids if p in parent_of]))
+        lead_ids = list(dict.fromkeys(l for p in targets for l in leads_of.get(p, ())))
+
+        call_vals.append({
+            'call_type':        row.call_type,
+            'call_date':        call_date,
+            'department':       row.department,
+            'call_status':      row.call_status,
+            'employee':         employee,
+            'internal_number':  row.internal_number,
+            'caller_number':    row.caller_number,
+            'call_destination': row.call_destination,
+            'call_duration':    duration,
+            'has_recording':    row.has_recording == '1',
+            'recording_url':    row.recording,
+            'recording_wav':    row.recording_wav,
+            'user_id':          user_id or False,
+            'lead_id':          lead_ids[0] if lead_ids else False,
+            'idempotency_key':  row.key,
+        })
+        if not ARCHIVE_RECORDINGS:
+            call_vals[-1]['recording_state'] = 'none'
+
+        n_before = len(msg_vals)
+        if CREATE_MESSAGES and targets:
+            body = Call._build_call_body(row.call_type, row.call_status, row.ext_phone,
+                                         duration, row.recording)
+            author_id = user_partner.get(user_id) or root_partner_id
+            at_id = activity_type_ids[row.call_type]
+            msg_vals += [
+                Call._make_message_vals('res.partner', pid, body, author_id, at_id, call_date, subtype_id)
+                for pid in targets
+            ] + [
+                Call._make_message_vals('crm.lead', lid, body, author_id, at_id, call_date, subtype_id)
+                for lid in lead_ids
+            ]
+        msg_counts.append(len(msg_vals) - n_before)
+
+    stats['calls'] += len(call_vals)
+    stats['messages'] += len(msg_vals)
+    if not DRY_RUN:
+        # Спочатку повідомлення — їхні id прив'язуються до дзвінка, щоб після
+        # архівації запису посилання в чаттері перемкнулось на локальну копію
+        msg_ids = Msg.create(msg_vals).ids if msg_vals else []
+        pos = 0
+        for vals, count in zip(call_vals, msg_counts):
+            vals['chatter_message_ids'] = [(6, 0, msg_ids[pos:pos + count])]
+            pos += count
+        Call.create(call_vals)
+        since_commit += len(chunk)
+        if since_commit >= COMMIT_EVERY:
+            env.cr.commit()
+            since_commit = 0
+
+    elapsed = time.perf_counter() - started
+    print(f'  Прочитано {stats["read"]:,}, дзвінків {stats["calls"]:,}, повідомлень {stats["messages"]:,} '
+          f'— {stats["read"] / max(elapsed, 0.001):,.0f} рядків/с')
+
+if DRY_RUN:
+    env.cr.rollback()
+else:
+    env.cr.commit()
+
+elapsed = time.perf_counter() - started
+print('\n=== Готово' + (' (DRY RUN, нічого не записано)' if DRY_RUN else '') + ' ===')
+print(f'Прочитано рядків:      {stats["read"]:,}')
+print(f'Внутрішні (пропущено): {stats["internal"]:,}')
+print(f'Дублі / вже в базі:    {stats["duplicate"]:,}')
+print(f'Невірна дата:          {stats["bad_date"]:,}')
+print(f'Відомі номери:         {stats["matched"]:,}')
+print(f'Невідомі номери:       {stats["unknown"]:,}')
+print(f'Дзвінків створено:     {stats["calls"]:,}')
+print(f'Повідомлень у чаттер:  {stats["messages"]:,}')
+print(f'Час: {elapsed:.1f} с — {stats["read"] / max(elapsed, 0.001):,.0f} рядків/с, '
+      f'{stats["calls"] / max(elapsed, 0.001):,.0f} дзвінків/с')
+print('Співробітники без користувача: '
+      + (', '.join(sorted(e for e, u in user_by_employee.items() if not u)) or '—'))
+print(json.dumps(dict(stats), ensure_ascii=False))
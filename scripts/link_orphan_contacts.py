@@ -51,11 +51,10 @@ orphans = {r[1]: r[0] for r in env.cr.fetchall()}  # pd_person_id → partner_id
 print(f'  {len(orphans)} orphan контактів в Odoo')
 
 # --- Маппінг pd_org_id → res.partner.id ---
-imd = env['ir.model.data'].search_read(
-    [('module', '=', '__import__'), ('model', '=', 'res.partner'), ('name', 'like', 'pipedrive_org_')],
-    ['name', 'res_id']
+orgs = env['res.partner'].with_context(active_test=False).search_read(
+    [('pipedrive_org_id', '>', 0)], ['pipedrive_org_id']
 )
-org_to_partner = {int(r['name'].replace('pipedrive_org_', '')): r['res_id'] for r in imd}
+org_to_partner = {r['pipedrive_org_id']: r['id'] for r in orgs}
 
 persons = env['res.partner'].search_read([('pipedrive_person_id', '>', 0)], ['pipedrive_person_id', 'id'])
 person_odoo = {r['pipedrive_person_id']: r['id'] for r in persons}
@@ -0,0 +1,176 @@
+"""
+Локальний stub Pipedrive REST API v1 — для перевірки синхронізації без реального акаунту.
+
+Віддає фіксовані метадані (/stages, /pipelines, /users, /dealFields) у форматі
+Pipedrive, з пагінацією start/limit. Токен не перевіряється.
+
+/recents?since_timestamp=..&items=deal|person|organization|activity віддає
+згенеровані зміни (--recents N на кожен тип, update_time рівномірно за останні
+--hours годин) — для перевірки дельта-синхронізації після "простою".
+З --rate R stub відповідає 429 + Retry-After, якщо запитів більше R/с —
+так видно, що token bucket клієнта тримає темп.
+
+Запуск:
+  python3 scripts/pipedrive_api_stub.py --port 8765 --recents 2000 --hours 6 --rate 10
+
+Далі в Odoo shell:
+  env['ir.config_parameter'].set_param('pipedrive.api.url', 'http://127.0.0.1:8765/v1')
+  env['ir.config_parameter'].set_param('pipedrive.api.token', 'stub')
+  env['rayton.pipedrive.mapping'].action_sync_metadata()
+  env['ir.config_parameter'].set_param('pipedrive.sync.initial_hours', 6)
+  env['rayton.pipedrive.event']._sync_delta()
+  env.cr.commit()
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES = {
+    'stages': [
+        {'id': 1, 'name': 'Новий лід',        'pipeline_id': 1, 'pipeline_name': 'Оператори'},
+        {'id': 2, 'name': 'Кваліфікація',     'pipeline_id': 1, 'pipeline_name': 'Оператори'},
+        {'id': 7, 'name': 'Первинні розрахунки', 'pipeline_id': 2, 'pipeline_name': 'Менеджери'},
+        {'id': 8, 'name': 'Заміри',           'pipeline_id': 2, 'pipeline_name': 'Менеджери'},
+    ],
+    'pipelines': [
+        {'id': 1, 'name': 'Оператори'},
+        {'id': 2, 'name': 'Менеджери з продажу'},
+        {'id': 3, 'name': 'Відділ кредитування'},
+    ],
+    'users': [
+        {'id': 101, 'name': 'Наталія Гадайчук', 'email': 'gadaichuk@example.com'},
+        {'id': 102, 'name': 'Сергій Толочко',   'email': 'tolochko@example.com'},
+        {'id': 103, 'name': 'Ігор Бєлік',       'email': 'belik@example.com'},
+    ],
+    'dealFields': [
+        {'id': 12, 'key': 'label', 'name': 'Мітка', 'options': [
+            {'id': 137, 'label': 'УЗЕ'},
+            {'id': 138, 'label': 'СЕС'},
+            {'id': 139, 'label': 'СЕС + УЗЕ'},
+        ]},
+        {'id': 40, 'key': 'financing_hash', 'name': 'Тип фінансування', 'options': [
+            {'id': 227, 'label': 'Власні'},
+            {'id': 228, 'label': 'Кредитні'},
+            {'id': 229, 'label': 'Власні (аванс)/Кредитні'},
+        ]},
+        {'id': 41, 'key': 'credit_hash', 'name': 'Кредитний спеціаліст', 'options': [
+            {'id': 230, 'label': 'Оксана Коваленко'},
+            {'id': 231, 'label': 'Олександр Коростіль'},
+            {'id': 265, 'label': 'Владислав Карась'},
+        ]},
+    ],
+}
+
+
+RECENTS = []          # [{'item': 'deal', 'id': .., 'data': {...}}], за зростанням update_time
+RATE_LIMIT = None     # запитів/с, None — без обмеження
+_hits = []
+_hits_lock = threading.Lock()
+
+
+def build_recents(per_entity, hours):
+    """Generate `per_entity` changed objects of each type over the last `hours`."""
+    now = datetime.utcnow()
+    step = timedelta(hours=hours) / max(per_entity, 1)
+    items = []
+    for i in range(per_entity):
+        ts = (now - timedelta(hours=hours) + step * (i + 1)).strftime('%Y-%m-%d %H:%M:%S')
+        n = i + 1
+        items += [
+            {'item': 'deal', 'id': 900000 + n, 'data': {
+                'id': 900000 + n, 'title': 'Stub угода %d' % n, 'value': 1000 * n,
+                'status': 'open', 'stage_id': 7, 'pipeline_id': 2, 'user_id': 101,
+                'person_id': 800000 + n, 'org_id': 700000 + n, 'update_time': ts,
+            }},
+            {'item': 'person', 'id': 800000 + n, 'data': {
+                'id': 800000 + n, 'name': 'Stub Особа %d' % n,
+                'phone': [{'value': '+38067%07d' % n, 'primary': True}],
+                'email': [{'value': 'stub%d@example.com' % n}], 'update_time': ts,
+            }},
+            {'item': 'organization', 'id': 700000 + n, 'data': {
+                'id': 700000 + n, 'name': 'ТОВ Stub %d' % n, 'update_time': ts,
+            }},
+            {'item': 'activity', 'id': 600000 + n, 'data': {
+                'id': 600000 + n, 'type': 'call', 'subject': 'Дзвінок %d' % n,
+                'done': True, 'deal_id': 900000 + n, 'user_id': 101,
+                'marked_as_done_time': ts, 'update_time': ts,
+            }},
+        ]
+    items.sort(key=lambda r: r['data']['update_time'])
+    return items
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self._rate_limited():
+            return self._send(429, {'success': False, 'error': 'Rate limit exceeded'},
+                              headers={'Retry-After': '1'})
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        resource = url.path.rstrip('/').rsplit('/', 1)[-1]
+        if resource == 'recents':
+            since = query.get('since_timestamp', [''])[0]
+            kinds = set(query.get('items', [''])[0].split(',')) - {''}
+            items = [r for r in RECENTS
+                     if r['data']['update_time'] >= since and (not kinds or r['item'] in kinds)]
+        else:
+            items = FIXTURES.get(resource)
+        if items is None:
+            return self._send(404, {'success': False, 'error': 'Unknown resource %s' % resource})
+
+        start = int(query.get('start', ['0'])[0])
+        limit = int(query.get('limit', ['100'])[0])
+        page = items[start:start + limit]
+        more = start + limit < len(items)
+        additional = {'pagination': {
+            'start': start, 'limit': limit,
+            'more_items_in_collection': more,
+            'next_start': start + limit if more else None,
+        }}
+        if resource == 'recents':
+            additional['last_timestamp_on_page'] = page[-1]['data']['update_time'] if page else None
+        self._send(200, {'success': True, 'data': page, 'additional_data': additional})
+
+    def _rate_limited(self):
+        if not RATE_LIMIT:
+            return False
+        now = time.monotonic()
+        with _hits_lock:
+            while _hits and _hits[0] < now - 1:
+                _hits.pop(0)
+            if len(_hits) >= RATE_LIMIT:
+                return True
+            _hits.append(now)
+        return False
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--recents', type=int, default=50,
+                        help='скільки змінених об\'єктів кожного типу віддає /recents')
+    parser.add_argument('--hours', type=float, default=6,
+                        help='за скільки останніх годин розподілені зміни')
+    parser.add_argument('--rate', type=int, default=0,
+                        help='ліміт запитів/с, понад який stub відповідає 429 (0 — без ліміту)')
+    args = parser.parse_args()
+    RECENTS[:] = build_recents(args.recents, args.hours)
+    RATE_LIMIT = args.rate or None
+    print(f'Pipedrive stub: http://{args.host}:{args.port}/v1')
+    ThreadingHTTPServer((args.host, args.port), StubHandler).serve_forever()
@@ -0,0 +1,99 @@
+"""
+Локальний stub сервера записів Ringostat — для перевірки архівації без реальних посилань.
+
+GET /rec/<id>.ogg віддає детермінований "запис" розміром --size КБ (однаковий id →
+однаковий вміст, тож видно дедуплікацію по checksum). Підтримує Range (206),
+тож видно дозавантаження після обриву. Спецвипадки:
+  /rec/gone-<id>.ogg  → 404 (запис видалено на боці Ringostat)
+  з --drop P          → з ймовірністю P з'єднання рветься на середині файлу
+  з --delay S         → пауза S секунд перед відповіддю (видно паралельність пулу)
+
+Запуск:
+  python3 scripts/ringostat_recording_stub.py --port 8766 --size 2048 --drop 0.3
+
+Далі в Odoo shell:
+  calls = env['rayton.ringostat.call'].search([], limit=50)
+  for c in calls:
+      c.recording_url = 'http://127.0.0.1:8766/rec/%d.ogg' % (c.id % 10)
+  calls.action_archive_recording()
+  env['rayton.ringostat.call']._archive_pending_recordings()
+  env.cr.commit()
+"""
+import argparse
+import hashlib
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SIZE = 2048 * 1024
+DROP = 0.0
+DELAY = 0.0
+
+PATH_RE = re.compile(r'^/rec/(gone-)?([\w-]+)\.(ogg|wav)$')
+
+
+def build_body(rec_id, size):
+    """Псевдовипадкові байти, що залежать лише від id і розміру."""
+    seed = hashlib.sha256(rec_id.encode()).digest()
+    return (seed * (size // len(seed) + 1))[:size]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        match = PATH_RE.match(self.path.split('?')[0])
+        if not match:
+            return self._send_status(404)
+        gone, rec_id, ext = match.groups()
+        if gone:
+            return self._send_status(404)
+        if DELAY:
+            time.sleep(DELAY)
+
+        body = build_body(rec_id, SIZE)
+        start = 0
+        range_header = self.headers.get('Range', '')
+        range_match = re.match(r'bytes=(\d+)-$', range_header)
+        if range_match:
+            start = int(range_match.group(1))
+            if start >= len(body):
+                return self._send_status(416)
+        chunk = body[start:]
+
+        self.send_response(206 if start else 200)
+        self.send_header('Content-Type', 'audio/ogg' if ext == 'ogg' else 'audio/wav')
+        self.send_header('Content-Length', str(len(chunk)))
+        self.send_header('Accept-Ranges', 'bytes')
+        if start:
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, len(body) - 1, len(body)))
+        self.end_headers()
+
+        if DROP and random.random() < DROP:
+            # Обрив на середині: клієнт отримає менше, ніж Content-Length
+            self.wfile.write(chunk[:len(chunk) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(chunk)
+
+    def _send_status(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--size', type=int, default=2048, help='розмір запису, КБ')
+    parser.add_argument('--drop', type=float, default=0.0,
+                        help='ймовірність обриву з\'єднання на середині файлу')
+    parser.add_argument('--delay', type=float, default=0.0, help='пауза перед відповіддю, с')
+    args = parser.parse_args()
+    SIZE = args.size * 1024
+    DROP = args.drop
+    DELAY = args.delay
+    print(f'Ringostat recording stub: http://{args.host}:{args.port}/rec/<id>.ogg')
+    ThreadingHTTPServer((args.host, args.port), StubHandler).serve_forever()